@@ -0,0 +1,165 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Optional
+
+from langgraph.checkpoint.memory import MemorySaver
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Config import get_setting, resolve_path
+from Storage.shared_state import abandon_connection, get_shared_state, reconnect_after_fork
+from Storage.draft_store import get_draft_store
+
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+    SQLITE_CHECKPOINT_AVAILABLE = True
+except ImportError:
+    SqliteSaver = object
+    SQLITE_CHECKPOINT_AVAILABLE = False
+
+
+class SessionCheckpointer(SqliteSaver):
+    """
+    SQLite checkpointer keyed by session_id (the LangGraph thread_id).
+
+    Each session keeps its newest checkpoints up to `max_bytes` of stored
+    checkpoint and pending-write data (and at most `max_checkpoints` of them);
+    the newest checkpoint is always kept. Sessions that have not been touched
+    for `timeout_hours` are purged, at most once per `purge_interval_seconds`.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, max_checkpoints: int = 20, timeout_hours: float = 24,
+                 max_bytes: int = 8 * 1024 * 1024, purge_interval_seconds: float = 600):
+        super().__init__(conn)
+        self.max_checkpoints = max_checkpoints
+        self.max_bytes = max_bytes
+        self.timeout_hours = timeout_hours
+        self.purge_interval_seconds = purge_interval_seconds
+        self._last_purge = 0.0
+        self.db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+        reconnect_after_fork(self)
+
+    def _reconnect(self):
+        # Forked API workers each need their own connection to the same database
+        abandon_connection(self.conn)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+
+    def setup(self) -> None:
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS session_activity (
+                thread_id TEXT PRIMARY KEY,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        self._prune_thread(str(config['configurable']['thread_id']))
+        return result
+
+    def _prune_thread(self, thread_id: str):
+        """Drop the checkpoints past the thread's byte and count budgets, oldest first, and record activity"""
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO session_activity (thread_id, updated_at) VALUES (?, ?)",
+                (thread_id, time.time()),
+            )
+            # checkpoint ids are time-ordered, so the running total goes from the newest back
+            cur.execute(
+                """
+                SELECT checkpoint_id FROM (
+                    SELECT c.checkpoint_id,
+                           ROW_NUMBER() OVER newest_first AS position,
+                           SUM(LENGTH(c.checkpoint) + LENGTH(c.metadata) + COALESCE(w.bytes, 0)) OVER newest_first AS total
+                    FROM checkpoints c
+                    LEFT JOIN (
+                        SELECT checkpoint_id, SUM(LENGTH(value)) AS bytes FROM writes
+                        WHERE thread_id = ? AND checkpoint_ns = '' GROUP BY checkpoint_id
+                    ) w ON w.checkpoint_id = c.checkpoint_id
+                    WHERE c.thread_id = ? AND c.checkpoint_ns = ''
+                    WINDOW newest_first AS (ORDER BY c.checkpoint_id DESC)
+                )
+                WHERE position > 1 AND (position > ? OR total > ?)
+                """,
+                (thread_id, thread_id, self.max_checkpoints, self.max_bytes),
+            )
+            stale = [(thread_id, row[0]) for row in cur.fetchall()]
+            if stale:
+                cur.executemany("DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id = ?", stale)
+                cur.executemany("DELETE FROM writes WHERE thread_id = ? AND checkpoint_id = ?", stale)
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM session_activity WHERE thread_id = ?", (str(thread_id),))
+
+    def purge_expired(self, force: bool = True) -> int:
+        """
+        Delete every session idle for longer than `timeout_hours`. Returns the number purged.
+
+        Unless `force` is set this runs at most once per `purge_interval_seconds`
+        across all workers sharing the database, so it is cheap to call per run.
+        """
+        now = time.time()
+        if not force:
+            if now - self._last_purge < self.purge_interval_seconds:
+                return 0
+            self._last_purge = now
+            if not get_shared_state().claim(f"checkpoint_purge:{self.db_path}", self.purge_interval_seconds):
+                return 0
+        cutoff = now - self.timeout_hours * 3600
+        with self.cursor() as cur:
+            cur.execute("SELECT thread_id FROM session_activity WHERE updated_at < ?", (cutoff,))
+            expired = [row[0] for row in cur.fetchall()]
+        for thread_id in expired:
+            self.delete_thread(thread_id)
+        return len(expired)
+
+
+def create_checkpointer():
+    """
+    Build the checkpointer configured in Config/config.json.
+
+    Returns None when checkpointing is disabled, and falls back to an
+    in-memory saver when langgraph-checkpoint-sqlite is not installed.
+    """
+    if not get_setting('session_config', 'enable_checkpointing', False):
+        return None
+
+    if not SQLITE_CHECKPOINT_AVAILABLE:
+        print("Warning: langgraph-checkpoint-sqlite not installed, checkpoints will not survive restarts")
+        return MemorySaver()
+
+    db_path = resolve_path(get_setting('files', 'checkpoint_db', 'Generated/checkpoints.sqlite'))
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    checkpointer = SessionCheckpointer(
+        conn,
+        max_checkpoints=get_setting('session_config', 'max_checkpoints_per_session', 20),
+        timeout_hours=get_setting('session_config', 'session_timeout_hours', 24),
+        max_bytes=int(get_setting('session_config', 'max_checkpoint_mb_per_session', 8) * 1024 * 1024),
+        purge_interval_seconds=get_setting('session_config', 'purge_interval_seconds', 600),
+    )
+    checkpointer.purge_expired()
+    return checkpointer
+
+
+def purge_expired_sessions(checkpointer: Optional[object]) -> int:
+    """
+    Garbage-collect expired sessions (and the drafts their pruned histories point to) if supported.
+    Throttled: a sweep runs at most once per purge interval, whichever worker calls first.
+    """
+    if get_setting('history', 'policy', 'summarize') == 'reference':
+        get_draft_store().purge_expired()
+    if isinstance(checkpointer, SessionCheckpointer):
+        return checkpointer.purge_expired(force=False)
+    return 0
@@ -62,5 +62,40 @@ Your output **must** be valid JSON with exactly these keys:
   • suggestions (array of strings): 1–3 actionable recommendations to improve the code or workflow.
 
 Do **not** include any other keys, commentary, or formatting—output raw JSON only.
+If `performance.big_o.regressions` is non-empty, name each affected function and its old and new Big-O class in change_summary, and make fixing it one of the suggestions.
+If `syntax_recovery` is present, say in change_summary which lines of which file do not parse and that the analysis covers only the rest, and make fixing them the first suggestion.
 
-"""
\ No newline at end of file
+"""
+REUSE_REFINEMENT_PROMPT = '''
+You are given Python code that was written for a closely related request. Adapt it so it exactly fulfills the new request.
+
+**Instructions:**
+1.  Keep the existing structure, names and style wherever they still fit; change only what the new request requires (values, limits, inputs, small behavioural differences).
+2.  Keep the code simple enough for a programming fresher, as in the original.
+3.  If the existing code already fulfills the new request, return it unchanged.
+
+**Output Format:**
+Provide only the final, complete Python code block, with no explanations outside it.
+'''
+
+# User-message templates sent after the (stable, cacheable) system prompts above
+GENERATION_REQUEST = '''User Request: {query}
+
+Generate clean, simple Python code for this request, suitable for a programming fresher.'''
+
+REFINEMENT_REQUEST = '''User Request: {query}
+Previous Attempt Feedback: {feedback}
+
+Please generate improved, simpler code based on the feedback. Focus on reducing complexity for a fresher, while maintaining full functionality and correctness.'''
+
+COMPLEXITY_REQUEST = '''Code to evaluate:
+
+{code}
+
+
+Is this code simple enough for a programming fresher?'''
+
+REUSE_REQUEST = '''New Request: {query}
+Existing code (written for: {matched_query}):
+
+{code}'''
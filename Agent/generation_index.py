@@ -0,0 +1,271 @@
+import ast
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Config import get_setting, resolve_path
+from Storage.shared_state import abandon_connection, reconnect_after_fork
+from Difference_Analyzer.ast_features import parse_source
+from Difference_Analyzer.clone_detector import normalized_tokens
+
+# Hashing-trick vector size for normalized queries (no vocabulary to store)
+VECTOR_DIMS = 1 << 20
+# Candidate retrieval uses only the rarest query terms, whose postings are short
+RARE_TERMS = 3
+MAX_CANDIDATES = 200
+
+STOPWORDS = frozenset('''
+a an and are as be by can code create for from function generate give how i in into is it
+me make my of on or please program python script show that the this to using want with write you
+'''.split())
+
+
+def normalize_query(query: str) -> List[str]:
+    """Lowercase word terms without stopwords, with plural 's' stripped"""
+    terms = []
+    for word in re.findall(r'[a-z0-9]+', query.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def query_vector(terms: List[str]) -> Dict[int, float]:
+    """L2-normalized hashed vector of unigrams and bigrams (sublinear term frequency)"""
+    counts = {}
+    for feature in terms + [f"{a} {b}" for a, b in zip(terms, terms[1:])]:
+        digest = zlib.crc32(feature.encode('utf-8'))
+        index = digest % VECTOR_DIMS
+        sign = 1.0 if digest & 0x80000000 else -1.0
+        counts[index] = counts.get(index, 0.0) + sign
+    vector = {i: math.copysign(1 + math.log(abs(v)), v) for i, v in counts.items() if v}
+    norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+    return {i: v / norm for i, v in vector.items()}
+
+
+def numeric_terms(terms: List[str]) -> set:
+    return {term for term in terms if term.isdigit()}
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(i, 0.0) for i, v in a.items())
+
+
+def _pack_vector(vector: Dict[int, float]) -> bytes:
+    items = sorted(vector.items())
+    return struct.pack(f'<{len(items)}I{len(items)}f', *(i for i, _ in items), *(v for _, v in items))
+
+
+def _unpack_vector(blob: bytes) -> Dict[int, float]:
+    n = len(blob) // 8
+    values = struct.unpack(f'<{n}I{n}f', blob)
+    return dict(zip(values[:n], values[n:]))
+
+
+def code_hashes(code: str) -> Optional[Tuple[str, str]]:
+    """
+    (code_hash, structure_hash) of a program, or None if it doesn't parse.
+
+    code_hash covers the full AST, names and literals included, so it only
+    ignores formatting and comments: it identifies the code. structure_hash
+    covers the normalized token stream, which drops names and literals: it
+    groups code of the same shape, e.g. is_even and is_odd.
+    """
+    try:
+        tree = parse_source(code)
+    except SyntaxError:
+        return None
+    tokens, _, _ = normalized_tokens(tree)
+    return (hashlib.blake2b(ast.dump(tree).encode('utf-8'), digest_size=16).hexdigest(),
+            hashlib.blake2b(tokens.tobytes(), digest_size=16).hexdigest())
+
+
+class GenerationIndex:
+    """
+    SQLite index of finished generations, for serving repeat queries without the LLM.
+
+    Each entry stores the normalized query, its hashed TF vector and a link to
+    the generated code; identical code (same AST, whatever the formatting) is
+    stored once, and code of the same shape shares a structure_hash. Lookups fetch candidates through an FTS5 index restricted to
+    the query's rarest terms, then rank them by exact cosine similarity, so the
+    cost depends on posting-list length rather than the number of entries.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or resolve_path(get_setting('files', 'generation_index', 'Generated/generation_index.sqlite'))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._connect()
+        with self._lock, self.conn:
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(codes)")]
+            if columns and 'code_hash' not in columns:
+                # Indexes written before code_hash keyed code by shape alone, so some entries point at
+                # the wrong program; they are only a cache of finished generations, so start over
+                print("Warning: rebuilding the generation index, entries from before code_hash are dropped")
+                self.conn.executescript(
+                    "DROP TABLE IF EXISTS entries; DROP TABLE IF EXISTS codes; "
+                    "DROP TABLE IF EXISTS entry_terms; DROP TABLE IF EXISTS term_stats;"
+                )
+            self.conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS codes (
+                    id INTEGER PRIMARY KEY,
+                    code_hash TEXT UNIQUE NOT NULL,
+                    structure_hash TEXT NOT NULL,
+                    final_code TEXT NOT NULL,
+                    generations INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS codes_structure ON codes (structure_hash);
+                CREATE TABLE IF NOT EXISTS entries (
+                    id INTEGER PRIMARY KEY,
+                    query TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    code_id INTEGER NOT NULL REFERENCES codes(id),
+                    created_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS entries_code ON entries (code_id);
+                CREATE VIRTUAL TABLE IF NOT EXISTS entry_terms USING fts5(terms, detail=none);
+                CREATE TABLE IF NOT EXISTS term_stats (term TEXT PRIMARY KEY, docs INTEGER NOT NULL) WITHOUT ROWID;
+                """
+            )
+        reconnect_after_fork(self)
+
+    def _connect(self):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL keeps the per-lookup hit counter update from forcing a full sync
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+    def _reconnect(self):
+        # Forked API workers each need their own connection
+        abandon_connection(self.conn)
+        self._connect()
+
+    def _insert(self, query: str, final_code: str, hashes: Optional[Tuple[str, str]] = None) -> Optional[int]:
+        terms = normalize_query(query)
+        hashes = hashes or code_hashes(final_code)
+        if not terms or hashes is None:
+            return None
+        self.conn.execute(
+            "INSERT OR IGNORE INTO codes (code_hash, structure_hash, final_code) VALUES (?, ?, ?)",
+            (*hashes, final_code),
+        )
+        code_id = self.conn.execute(
+            "UPDATE codes SET generations = generations + 1 WHERE code_hash = ? RETURNING id", (hashes[0],)
+        ).fetchone()[0]
+        cursor = self.conn.execute(
+            "INSERT INTO entries (query, vector, code_id, created_at) VALUES (?, ?, ?, ?)",
+            (query, _pack_vector(query_vector(terms)), code_id, time.time()),
+        )
+        self.conn.execute("INSERT INTO entry_terms (rowid, terms) VALUES (?, ?)", (cursor.lastrowid, ' '.join(terms)))
+        # Document frequencies are kept alongside: fts5vocab would count them by scanning postings
+        self.conn.executemany(
+            "INSERT INTO term_stats (term, docs) VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET docs = docs + 1",
+            [(term,) for term in set(terms)],
+        )
+        return cursor.lastrowid
+
+    def add(self, query: str, final_code: str) -> Optional[int]:
+        """Store a finished generation. Returns the entry id, or None if the code doesn't parse."""
+        with self._lock, self.conn:
+            return self._insert(query, final_code)
+
+    def add_many(self, generations) -> int:
+        """Store (query, final_code) pairs in one transaction. Returns how many were stored."""
+        stored, hashes = 0, {}
+        with self._lock, self.conn:
+            for query, final_code in generations:
+                if final_code not in hashes:
+                    hashes[final_code] = code_hashes(final_code)
+                stored += self._insert(query, final_code, hashes[final_code]) is not None
+        return stored
+
+    def _candidates(self, terms: List[str]) -> List[int]:
+        # Document frequency of each distinct term; unseen terms can't match anything
+        unique = sorted(set(terms))
+        frequencies = [
+            (docs, term) for term, docs in self.conn.execute(
+                f"SELECT term, docs FROM term_stats WHERE term IN ({','.join('?' * len(unique))})", unique
+            )
+        ]
+        if not frequencies:
+            return []
+        rare = [f'"{term}"' for _, term in sorted(frequencies)[:RARE_TERMS]]
+        # All of the rarest terms first; fall back to any of them if that finds nothing
+        for operator in (' AND ', ' OR '):
+            rows = self.conn.execute(
+                "SELECT rowid FROM entry_terms WHERE entry_terms MATCH ? LIMIT ?",
+                (operator.join(rare), MAX_CANDIDATES),
+            ).fetchall()
+            if rows:
+                return [row[0] for row in rows]
+        return []
+
+    def lookup(self, query: str, min_similarity: float = 0.75) -> Optional[Dict]:
+        """Best stored generation for a similar query, or None below `min_similarity`"""
+        terms = normalize_query(query)
+        if not terms:
+            return None
+        vector = query_vector(terms)
+        with self._lock:
+            ids = self._candidates(terms)
+            if not ids:
+                return None
+            placeholders = ','.join('?' * len(ids))
+            rows = self.conn.execute(
+                f"SELECT id, query, vector, code_id FROM entries WHERE id IN ({placeholders})", ids
+            ).fetchall()
+            best, best_score = None, min_similarity
+            for entry_id, stored_query, blob, code_id in rows:
+                score = cosine(vector, _unpack_vector(blob))
+                if score >= best_score:
+                    best, best_score = (entry_id, stored_query, code_id), score
+            if best is None:
+                return None
+            entry_id, stored_query, code_id = best
+            with self.conn:
+                self.conn.execute("UPDATE entries SET hits = hits + 1 WHERE id = ?", (entry_id,))
+            final_code, digest = self.conn.execute(
+                "SELECT final_code, structure_hash FROM codes WHERE id = ?", (code_id,)
+            ).fetchone()
+            equivalent = self.conn.execute(
+                "SELECT SUM(generations) FROM codes WHERE structure_hash = ?", (digest,)
+            ).fetchone()[0]
+        return {
+            'entry_id': entry_id,
+            'matched_query': stored_query,
+            'similarity': round(best_score, 4),
+            # Sizes/counts in the query ("first 10 primes") must agree for the code to be reusable as is
+            'numbers_match': numeric_terms(normalize_query(stored_query)) == numeric_terms(terms),
+            'final_code': final_code,
+            'structure_hash': digest,
+            # How many stored queries produced this same code structure
+            'equivalent_generations': equivalent,
+        }
+
+
+def create_generation_index() -> Optional[GenerationIndex]:
+    """Index configured in generation_index, or None when disabled"""
+    if not get_setting('generation_index', 'enabled', True):
+        return None
+    try:
+        return GenerationIndex()
+    except sqlite3.OperationalError as e:
+        # e.g. SQLite built without FTS5
+        print(f"Warning: generation index unavailable, every query will run the LLM: {e}")
+        return None
@@ -0,0 +1,180 @@
+import ast
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessageChunk
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Agent.prompt_cache import PromptPrefix, stream_with_prefix
+from Config import get_setting
+from Storage.shared_state import reconnect_after_fork
+
+# Column-0 lines that continue the statement before them instead of starting a new one
+_CONTINUATIONS = ('else', 'elif', 'except', 'finally', ')', ']', '}', '#')
+
+
+def pipeline_enabled() -> bool:
+    return get_setting('generation_pipeline', 'enabled', True)
+
+
+def code_digest(code: str) -> str:
+    return hashlib.sha256((code or '').encode('utf-8')).hexdigest()
+
+
+class StreamingPrecheck:
+    """
+    Local AST pre-check that runs while a draft is still streaming in.
+
+    Lines are collected into top-level segments (a function, a class, a run of
+    imports...); each time a new statement starts at column 0, the segment
+    before it is parsed, so complete functions are checked while later ones
+    are still being generated and only the last segment is left when the
+    stream ends. A segment that doesn't parse yet (an open bracket or string)
+    keeps growing until it does.
+    """
+
+    def __init__(self):
+        self._started = time.perf_counter()
+        self._partial = ''
+        self._segment: List[str] = []
+        self.segments = 0
+        self.functions: List[str] = []
+        self.first_function_seconds: Optional[float] = None
+
+    def feed(self, text: str):
+        lines = (self._partial + text).split('\n')
+        self._partial = lines.pop()
+        for line in lines:
+            self._add_line(line)
+
+    def _add_line(self, line: str):
+        if line.lstrip().startswith('```'):
+            line = ''  # fence markers, stripped from the final code as well
+        starts_statement = line[:1] not in ('', ' ', '\t') and not line.startswith(_CONTINUATIONS)
+        if starts_statement and self._segment and self._parse('\n'.join(self._segment)):
+            self._segment = []
+        self._segment.append(line)
+
+    def _parse(self, source: str) -> bool:
+        if not source.strip():
+            return True
+        try:
+            tree = ast.parse(source)
+        except SyntaxError:
+            return False
+        self.segments += 1
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                self.functions.append(node.name)
+                if self.first_function_seconds is None:
+                    self.first_function_seconds = round(time.perf_counter() - self._started, 4)
+        return True
+
+    def finish(self, code: str) -> Dict:
+        """
+        Result for the whole draft once the stream has ended. `code` is the
+        cleaned draft; it is only parsed again when the streamed segments
+        didn't all parse (e.g. prose around the code block).
+        """
+        if self._partial:
+            self._add_line(self._partial)
+            self._partial = ''
+        syntax_error = None
+        if not self._parse('\n'.join(self._segment)):
+            try:
+                ast.parse(code)
+            except SyntaxError as e:
+                syntax_error = f"{e.msg} (line {e.lineno})"
+        return {
+            'syntax_error': syntax_error,
+            'segments': self.segments,
+            'functions': self.functions,
+            'first_function_seconds': self.first_function_seconds,
+            'stream_seconds': round(time.perf_counter() - self._started, 4),
+        }
+
+
+def stream_draft(prefix: PromptPrefix, llm, user_text: str) -> Tuple[AIMessageChunk, StreamingPrecheck]:
+    """Stream one generation, feeding the pre-check as chunks arrive; returns the merged response"""
+    precheck = StreamingPrecheck()
+    response = None
+    for chunk in stream_with_prefix(prefix, llm, user_text):
+        response = chunk if response is None else response + chunk
+        precheck.feed(chunk.text)
+    return response if response is not None else AIMessageChunk(content=''), precheck
+
+
+class SpeculativeRunner:
+    """
+    Work started ahead of the graph node that needs it, keyed by what it is for.
+
+    The generate node submits the complexity check (and a sandbox run of the
+    draft) as soon as its stream ends; the check and verify nodes take the
+    futures instead of starting the same work again. Nodes that find nothing
+    (a resumed run, pipelining disabled) just do the work themselves.
+    Unclaimed entries beyond `max_pending` are cancelled, oldest first.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: int = 64):
+        self.max_workers = max_workers or get_setting('generation_pipeline', 'workers', 4)
+        self.max_pending = max_pending
+        self._reset()
+        reconnect_after_fork(self, '_reset')
+
+    def _reset(self):
+        # Executor threads don't survive fork; forked workers start with their own
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending: 'OrderedDict[Tuple[str, str], Future]' = OrderedDict()
+
+    def submit(self, kind: str, key: str, fn, *args, **kwargs) -> Future:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='speculative')
+        return self.track(kind, key, self._executor.submit(fn, *args, **kwargs))
+
+    def track(self, kind: str, key: str, future: Future) -> Future:
+        """Register a future started elsewhere (e.g. on the sandbox pool)"""
+        with self._lock:
+            previous = self._pending.pop((kind, key), None)
+            if previous is not None:
+                previous.cancel()
+            self._pending[(kind, key)] = future
+            while len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)[1].cancel()
+        return future
+
+    def resolved(self, kind: str, key: str, value) -> Future:
+        """Register a result that is already known"""
+        future = Future()
+        future.set_result(value)
+        return self.track(kind, key, future)
+
+    def take(self, kind: str, key: str) -> Optional[Future]:
+        with self._lock:
+            return self._pending.pop((kind, key), None)
+
+    def discard(self, kind: str, key: str):
+        """Drop work that is no longer needed (cancelled if it hasn't started)"""
+        future = self.take(kind, key)
+        if future is not None:
+            future.cancel()
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_speculative_runner() -> SpeculativeRunner:
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = SpeculativeRunner()
+        return _runner
@@ -2,10 +2,11 @@ from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langgraph.checkpoint.memory import MemorySaver
 LANGGRAPH_AVAILABLE = True
+import json
 import sys
 import os
 from pydantic import BaseModel, Field
-from typing import TypedDict, Literal, Optional
+from typing import Callable, TypedDict, Literal, Optional
 try:
     from typing import Annotated
 except ImportError:
@@ -17,8 +18,19 @@ from langchain_core.messages import BaseMessage, HumanMessage
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from Agent.client import Client
-from Agent.custom_prompt import SYSTEM_PROMPT, COMPLEXITY_SYSTEM_PROMPT
-from Agent.markdown_remover import clean_code_output
+from Agent.custom_prompt import (
+    SYSTEM_PROMPT, COMPLEXITY_SYSTEM_PROMPT, REUSE_REFINEMENT_PROMPT,
+    GENERATION_REQUEST, REFINEMENT_REQUEST, COMPLEXITY_REQUEST, REUSE_REQUEST,
+)
+from Agent.prompt_cache import PromptPrefix, add_prompt_usage, invoke_with_prefix
+from Agent.generation_pipeline import code_digest, get_speculative_runner, pipeline_enabled, stream_draft
+from Agent.markdown_remover import extract_code
+from Agent.checkpointer import create_checkpointer, purge_expired_sessions
+from Agent.generation_index import create_generation_index
+from Agent.sandbox import get_sandbox_pool, verify_code
+from Agent.refinement_controller import create_refinement_stats, draft_metrics, query_category, stop_reason
+from Agent.history_policy import bounded_history
+from Config import get_setting, resolve_path
 
 # Initialize the LLM client
 google_llm = Client().load_google_llm()
@@ -30,9 +42,15 @@ class CodeGenerationState(TypedDict):
     complexity_status: Literal["simple", "complex"]
     feedback: str
     loop_count: int
-    # conversation_history will accumulate messages from the LLM interactions
-    conversation_history: Annotated[list[HumanMessage], add_messages]
+    # conversation_history accumulates messages from the LLM interactions, bounded by the history policy
+    conversation_history: Annotated[list[HumanMessage], bounded_history]
     final_code: Optional[str] # This will hold the final, simplified code string
+    reused_generation: Optional[dict] # Set when an earlier session's code was served instead
+    execution_report: Optional[dict] # Sandboxed run of final_code (status, wall time, peak memory)
+    refinement: Optional[dict] # Query category, loop budget, per-round verdicts/metrics and why the loop stopped
+    prompt_usage: Optional[dict] # Estimated input tokens per LLM call, split into cacheable prefix and dynamic part
+    draft_precheck: Optional[dict] # Streaming AST pre-check of generated_code (pipelined mode only)
+    clarification: Optional[list[str]] # Questions the LLM asked instead of writing code; ends the run
 
 # Pydantic model for structured output from the complexity checker LLM
 class CodeEvaluation(BaseModel):
@@ -46,6 +64,14 @@ class CodeEvaluation(BaseModel):
 # Configure the LLM to return structured output based on CodeEvaluation
 structured_google_llm = google_llm.with_structured_output(CodeEvaluation)
 
+# System prompts, compiled once; every request starts with the same prefix so the provider can cache it
+GENERATION_PREFIX = PromptPrefix('generation', SYSTEM_PROMPT)
+COMPLEXITY_PREFIX = PromptPrefix('complexity', COMPLEXITY_SYSTEM_PROMPT)
+REUSE_PREFIX = PromptPrefix('reuse', REUSE_REFINEMENT_PROMPT)
+
+# Per-category loop budgets learned from earlier runs (None when adaptive budgets are disabled)
+refinement_stats = create_refinement_stats()
+
 # Node: Code Generation
 def code_creation(state: CodeGenerationState) -> dict:
     """
@@ -54,38 +80,77 @@ def code_creation(state: CodeGenerationState) -> dict:
     query = state['user_query']
     current_loop = state.get('loop_count', 0)
 
-    # Build prompt based on whether it's the first attempt or a refinement
+    # Only the user message changes between rounds; the system prefix is shared
     if current_loop > 0 and state.get('feedback'):
-        prompt = f"""
-{SYSTEM_PROMPT}
-
-User Request: {query}
-Previous Attempt Feedback: {state['feedback']}
-
-Please generate improved, simpler code based on the feedback. Focus on reducing complexity for a fresher, while maintaining full functionality and correctness.
-"""
+        user_text = REFINEMENT_REQUEST.format(query=query, feedback=state['feedback'])
     else:
-        prompt = f"""
-{SYSTEM_PROMPT}
-
-User Request: {query}
-
-Generate clean, simple Python code for this request, suitable for a programming fresher.
-"""
-
-    # Invoke the LLM to generate code
-    response = google_llm.invoke([HumanMessage(content=prompt)])
-
-    # Clean the generated code to remove markdown markers
-    cleaned_code = clean_code_output(response.content)
+        user_text = GENERATION_REQUEST.format(query=query)
+
+    pipelined = pipeline_enabled()
+    if pipelined:
+        # A rejected draft's speculative sandbox run is no longer needed
+        if current_loop > 0:
+            get_speculative_runner().discard('verify', code_digest(state.get('generated_code')))
+        # Stream the draft through the local pre-check; the complexity check starts as soon as it ends
+        response, precheck = stream_draft(GENERATION_PREFIX, google_llm, user_text)
+    else:
+        # Invoke the LLM to generate code
+        response = invoke_with_prefix(GENERATION_PREFIX, google_llm, user_text)
+
+    # Pull the program out of the markdown and prose around it
+    _capture_response(query, response.content)
+    extraction = extract_code(response.content)
+    usage = add_prompt_usage(state.get('prompt_usage'), GENERATION_PREFIX, user_text, response)
+    if extraction.kind == 'clarification':
+        # The request is ambiguous: hand the questions back instead of checking or refining prose
+        return {
+            'generated_code': '',
+            'clarification': extraction.questions,
+            'conversation_history': [HumanMessage(content=f"Clarification needed (Loop {current_loop + 1}):\n" + '\n'.join(extraction.questions))],
+            'loop_count': current_loop + 1,
+            'prompt_usage': usage,
+        }
+    cleaned_code = extraction.code
+    draft_precheck = _speculate(cleaned_code, precheck.finish(cleaned_code)) if pipelined else None
 
     # Return updated state
     return {
         'generated_code': cleaned_code,
+        'draft_precheck': draft_precheck,
         'conversation_history': [HumanMessage(content=f"Generated Code (Loop {current_loop + 1}):\n{cleaned_code}")],
-        'loop_count': current_loop + 1
+        'loop_count': current_loop + 1,
+        'prompt_usage': usage,
     }
 
+def _capture_response(query: str, text) -> None:
+    """Append the raw response to the response corpus (for experiments/bench_code_extraction.py), if enabled"""
+    if not get_setting('llm_output', 'capture_responses', False):
+        return
+    path = resolve_path(get_setting('files', 'response_corpus', 'Generated/llm_responses.jsonl'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'query': query, 'response': text}) + '\n')
+
+def _speculate(code: str, precheck: dict) -> dict:
+    """
+    Start the next nodes' work on a fresh draft while the graph checkpoints and
+    moves on: the LLM complexity check and, if enabled, the sandbox run that
+    verify_execution needs should this draft be accepted. A draft that doesn't
+    parse is sent back with the syntax error instead of being checked by the LLM.
+    """
+    runner, key = get_speculative_runner(), code_digest(code)
+    if precheck['syntax_error'] and get_setting('generation_pipeline', 'skip_check_on_syntax_error', True):
+        runner.resolved('check', key, CodeEvaluation(
+            complexity_status='complex',
+            feedback=f"The code does not parse: {precheck['syntax_error']}. Return only complete, valid Python code.",
+        ))
+        return {**precheck, 'check_skipped': True}
+    runner.submit('check', key, invoke_with_prefix, COMPLEXITY_PREFIX, structured_google_llm,
+                  COMPLEXITY_REQUEST.format(code=code), base_llm=google_llm, schema=CodeEvaluation)
+    if VERIFY_EXECUTION and not precheck['syntax_error'] and get_setting('generation_pipeline', 'speculative_verify', True):
+        runner.track('verify', key, get_sandbox_pool().submit(code, 'verify'))
+    return precheck
+
 # Node: Complexity Checker
 def complexity_checker(state: CodeGenerationState) -> dict:
     """
@@ -93,53 +158,95 @@ def complexity_checker(state: CodeGenerationState) -> dict:
     """
     code = state['generated_code']
 
-    prompt = f"""
-{COMPLEXITY_SYSTEM_PROMPT}
-
-Code to evaluate:
-
-{code}
-
-
-Is this code simple enough for a programming fresher?
-"""
-
-    # Invoke the structured LLM for complexity evaluation
-    response = structured_google_llm.invoke([HumanMessage(content=prompt)])
+    user_text = COMPLEXITY_REQUEST.format(code=code)
+    # Started by code_creation in pipelined mode; otherwise (or on a resumed run) checked here
+    speculative = get_speculative_runner().take('check', code_digest(code)) if pipeline_enabled() else None
+
+    # Record this round's verdict and draft metrics; the budget is fixed on the first round
+    refinement = state.get('refinement') or {}
+    if not refinement:
+        category = query_category(state['user_query'])
+        refinement = {
+            'category': category,
+            'budget': refinement_stats.budget(category) if refinement_stats else None,
+            'trace': [],
+        }
+    metrics = draft_metrics(code)
+
+    if speculative is not None:
+        response = speculative.result()
+    else:
+        # Invoke the structured LLM for complexity evaluation
+        response = invoke_with_prefix(COMPLEXITY_PREFIX, structured_google_llm, user_text,
+                                      base_llm=google_llm, schema=CodeEvaluation)
+    llm_checked = speculative is None or not (state.get('draft_precheck') or {}).get('check_skipped')
+
+    refinement = {**refinement, 'trace': refinement['trace'] + [{
+        'loop': state.get('loop_count', 0),
+        'verdict': response.complexity_status,
+        'score': metrics['score'] if metrics else None,
+        'metrics': metrics,
+    }]}
 
     # Return updated state with complexity status and feedback
     return {
         'complexity_status': response.complexity_status,
         'feedback': response.feedback,
+        'refinement': refinement,
+        'prompt_usage': add_prompt_usage(state.get('prompt_usage'), COMPLEXITY_PREFIX, user_text) if llm_checked else state.get('prompt_usage'),
         'conversation_history': [HumanMessage(content=f"Complexity Check: {response.complexity_status}. Feedback: {response.feedback}")]
     }
 
+# Conditional Edge: a request for clarification ends the run without a complexity check
+def route_draft(state: CodeGenerationState) -> str:
+    return 'clarify' if state.get('clarification') else 'check'
+
 # Conditional Edge: Route based on complexity and loop count
 def route_eval(state: CodeGenerationState) -> str:
     """
     Determines the next step in the workflow: end, or refine.
-    """
-    # Check if we've hit the maximum number of refinement loops
-    if state.get('loop_count', 0) >= 5:
-        return 'end'
 
-    # Check the complexity status
-    if state.get('complexity_status') == 'simple':
+    Ends when the code is simple, the loop hits max_refinement_loops or the
+    category's learned budget, or successive drafts stop getting simpler.
+    """
+    if stop_reason(state.get('loop_count', 0), state.get('complexity_status'), state.get('refinement')):
         return 'end'
-    else:
-        # If complex and within loop limit, refine the code
-        return 'refine'
+    # If complex and within budget, refine the code
+    return 'refine'
 
 # Node: Finalize Code
 def finalize_code(state: CodeGenerationState) -> dict:
     """
     Sets the final generated code into the state.
     """
+    refinement = state.get('refinement') or {}
+    loops = state.get('loop_count', 0)
+    reason = stop_reason(loops, state.get('complexity_status'), refinement)
+    if refinement:
+        refinement = {**refinement, 'stop_reason': reason}
+        if refinement_stats is not None:
+            refinement_stats.record(refinement['category'], loops, reason == 'simple', reason, refinement['trace'])
     return {
         'final_code': state['generated_code'],
-        'conversation_history': [HumanMessage(content="Code generation workflow completed.")]
+        'refinement': refinement,
+        'conversation_history': [HumanMessage(content=f"Code generation workflow completed after {loops} rounds ({reason}).")]
+    }
+
+# Node: Execution Verification (optional, after finalize)
+def verify_execution(state: CodeGenerationState) -> dict:
+    """
+    Runs the final code in a resource-limited subprocess on the bounded sandbox pool,
+    confirming it imports and runs its __main__ path, and records wall time and peak memory.
+    """
+    speculative = get_speculative_runner().take('verify', code_digest(state['final_code'])) if pipeline_enabled() else None
+    report = speculative.result() if speculative is not None else verify_code(state['final_code'])
+    return {
+        'execution_report': report,
+        'conversation_history': [HumanMessage(content=f"Execution check: {report['status']} ({report.get('wall_seconds')}s, {report.get('peak_memory_mb')} MB peak)")]
     }
 
+VERIFY_EXECUTION = get_setting('sandbox', 'enabled', True)
+
 # Graph Creation
 graph = StateGraph(CodeGenerationState)
 
@@ -147,10 +254,12 @@ graph = StateGraph(CodeGenerationState)
 graph.add_node('generate', code_creation)
 graph.add_node('check', complexity_checker)
 graph.add_node('finalize', finalize_code)
+if VERIFY_EXECUTION:
+    graph.add_node('verify', verify_execution)
 
 # Define the workflow edges
 graph.add_edge(START, 'generate')
-graph.add_edge('generate', 'check')
+graph.add_conditional_edges('generate', route_draft, {'check': 'check', 'clarify': END})
 
 # Conditional routing from the 'check' node
 graph.add_conditional_edges(
@@ -161,10 +270,111 @@ graph.add_conditional_edges(
         'refine': 'generate' # If complex and within loop limit, go back to generate
     }
 )
-graph.add_edge('finalize', END) # End the workflow after finalizing
+if VERIFY_EXECUTION:
+    graph.add_edge('finalize', 'verify')
+    graph.add_edge('verify', END)
+else:
+    graph.add_edge('finalize', END) # End the workflow after finalizing
+
+# Compile the workflow for execution. With checkpointing enabled every node's
+# output is persisted per session, so an interrupted run can be resumed.
+checkpointer = create_checkpointer()
+workflow = graph.compile(checkpointer=checkpointer)
+
+# Finished generations from every session, so near-duplicate queries skip the LLM loop
+generation_index = create_generation_index()
+
+def reuse_generation(initial_state: CodeGenerationState) -> Optional[dict]:
+    """
+    Serve code from an earlier session whose query is a near duplicate.
+
+    Close matches with the same numbers are returned as is; weaker matches get
+    one light LLM refinement pass (if enabled) instead of the full loop.
+    """
+    if generation_index is None:
+        return None
+    query = initial_state['user_query']
+    match = generation_index.lookup(query, min_similarity=get_setting('generation_index', 'refine_similarity', 0.6))
+    if match is None:
+        return None
+
+    reused = {key: match[key] for key in ('matched_query', 'similarity', 'structure_hash', 'equivalent_generations')}
+    if match['similarity'] >= get_setting('generation_index', 'serve_similarity', 0.9) and match['numbers_match']:
+        code, reused['refined'] = match['final_code'], False
+    elif get_setting('generation_index', 'refine_near_matches', True):
+        user_text = REUSE_REQUEST.format(query=query, matched_query=match['matched_query'], code=match['final_code'])
+        response = invoke_with_prefix(REUSE_PREFIX, google_llm, user_text)
+        extraction = extract_code(response.content)
+        if not extraction.valid:
+            # Not usable as is; run the full loop instead
+            return None
+        code, reused['refined'] = extraction.code, True
+        generation_index.add(query, code)
+    else:
+        return None
+
+    result = {
+        **initial_state,
+        'generated_code': code,
+        'final_code': code,
+        'complexity_status': 'simple',
+        'reused_generation': reused,
+        'conversation_history': [HumanMessage(content=f"Reused generation for similar query: {match['matched_query']}")],
+    }
+    if VERIFY_EXECUTION:
+        result['execution_report'] = verify_code(code)
+    return result
+
+def _index_result(result: dict) -> dict:
+    if generation_index is not None and result.get('final_code'):
+        generation_index.add(result['user_query'], result['final_code'])
+    return result
+
+def _run_workflow(graph_input, config: Optional[dict] = None, progress: Optional[Callable[[str], None]] = None) -> dict:
+    """workflow.invoke, reporting each finished node name to `progress` when given"""
+    if progress is None:
+        return workflow.invoke(graph_input, config)
+    result = None
+    for mode, chunk in workflow.stream(graph_input, config, stream_mode=['updates', 'values']):
+        if mode == 'updates':
+            for node in chunk:
+                progress(node)
+        else:
+            result = chunk
+    return result
+
+def run_generation(initial_state: CodeGenerationState, session_id: str,
+                   progress: Optional[Callable[[str], None]] = None) -> dict:
+    """
+    Run the code generation workflow for a session.
+
+    If a previous run of the same session was interrupted, it resumes from the
+    last completed node instead of starting over. A finished run for the same
+    query is returned as is, without calling the LLM again. New queries that
+    nearly duplicate one from any earlier session are served from the
+    generation index (see reuse_generation), and finished runs are added to it.
+
+    `progress`, if given, is called with each workflow node's name as it finishes.
+    """
+    if checkpointer is None:
+        return reuse_generation(initial_state) or _index_result(_run_workflow(initial_state, progress=progress))
+
+    purge_expired_sessions(checkpointer)
+    config = {'configurable': {'thread_id': session_id}}
+    snapshot = workflow.get_state(config)
+
+    if snapshot.values and snapshot.values.get('user_query') == initial_state['user_query']:
+        if snapshot.next:
+            # Interrupted run: continue from the last checkpoint
+            return _index_result(_run_workflow(None, config, progress))
+        if snapshot.values.get('final_code') is not None:
+            return snapshot.values
+
+    if snapshot.values:
+        # Different query for an existing session: start from a clean thread
+        checkpointer.delete_thread(session_id)
 
-# Compile the workflow for execution
-workflow = graph.compile()
+    return reuse_generation(initial_state) or _index_result(_run_workflow(initial_state, config, progress))
 
 # initial_state = {
 #         'user_query':'create a fibbonacci series upto 5 places.',
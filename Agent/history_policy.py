@@ -0,0 +1,100 @@
+import os
+import re
+import sys
+from typing import List, Optional
+
+from langchain_core.messages import BaseMessage, SystemMessage
+from langgraph.graph.message import add_messages
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Config import get_setting
+from Storage.draft_store import get_draft_store
+
+HISTORY_POLICIES = ('keep_all', 'keep_last', 'summarize', 'reference')
+SUMMARY_ID = 'history-summary'
+REFERENCE_PREFIX = 'draft:sha256:'
+REFERENCE_PATTERN = re.compile(r'^\[' + re.escape(REFERENCE_PREFIX) + r'([0-9a-f]{64})\]')
+
+
+def _kind(message: BaseMessage) -> str:
+    # e.g. 'Generated Code', 'Complexity Check', 'AST parsing'
+    return ' '.join(str(message.content).split(':', 1)[0].split()[:2]) or 'message'
+
+
+def _first_line(message: BaseMessage, limit: int = 80) -> str:
+    line = str(message.content).strip().split('\n', 1)[0]
+    return line if len(line) <= limit else line[:limit - 3] + '...'
+
+
+def _summarize(older: List[BaseMessage]) -> SystemMessage:
+    """Fold older messages (and any earlier summary) into one message of constant size"""
+    kinds, count, last = {}, 0, ''
+    for message in older:
+        if message.id == SUMMARY_ID:
+            count += message.additional_kwargs.get('summarized', 0)
+            for kind, n in message.additional_kwargs.get('kinds', {}).items():
+                kinds[kind] = kinds.get(kind, 0) + n
+            last = message.additional_kwargs.get('last', last)
+            continue
+        kind = _kind(message)
+        kinds[kind] = kinds.get(kind, 0) + 1
+        count += 1
+        last = _first_line(message)
+    breakdown = ', '.join(f"{n} x {kind}" for kind, n in sorted(kinds.items()))
+    return SystemMessage(
+        id=SUMMARY_ID,
+        content=f"{count} earlier messages summarized ({breakdown}). Most recent: {last}",
+        additional_kwargs={'summarized': count, 'kinds': kinds, 'last': last},
+    )
+
+
+def _reference(message: BaseMessage, min_chars: int) -> BaseMessage:
+    """Swap a large body for a content-hash reference into the draft store"""
+    content = message.content
+    if not isinstance(content, str) or len(content) < min_chars or REFERENCE_PATTERN.match(content):
+        return message
+    digest = get_draft_store().put(content)
+    return message.model_copy(update={
+        'content': f"[{REFERENCE_PREFIX}{digest}] {_first_line(message)} ({len(content)} chars)"
+    })
+
+
+def apply_history_policy(messages: List[BaseMessage], policy: Optional[str] = None,
+                         keep_last: Optional[int] = None) -> List[BaseMessage]:
+    """
+    Bound a message history according to the `history` config:
+
+    keep_all   unchanged (grows with every loop)
+    keep_last  only the newest `keep_last` messages
+    summarize  the newest `keep_last` messages plus one constant-size summary of the rest
+    reference  every message, but bodies of `reference_min_chars` or more outside the
+               newest `keep_last` are stored by content hash (see expand_reference)
+    """
+    policy = policy or get_setting('history', 'policy', 'summarize')
+    keep_last = keep_last or get_setting('history', 'keep_last', 6)
+    if policy == 'keep_all':
+        return messages
+    if policy == 'reference':
+        min_chars = get_setting('history', 'reference_min_chars', 512)
+        cutoff = max(0, len(messages) - keep_last)
+        return [_reference(m, min_chars) for m in messages[:cutoff]] + messages[cutoff:]
+    if len(messages) <= keep_last:
+        return messages
+    recent = messages[-keep_last:]
+    if policy == 'keep_last':
+        return recent
+    return [_summarize(messages[:-keep_last])] + recent
+
+
+def bounded_history(left, right):
+    """LangGraph reducer: add_messages, then apply the configured history policy"""
+    return apply_history_policy(add_messages(left, right))
+
+
+def expand_reference(content: str) -> str:
+    """The full body behind a draft reference (or `content` itself if it isn't one or has expired)"""
+    match = REFERENCE_PATTERN.match(content or '')
+    if not match:
+        return content
+    return get_draft_store().get(match.group(1)) or content
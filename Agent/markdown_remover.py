@@ -1,22 +1,155 @@
+import ast
+import re
+import textwrap
+from typing import List, NamedTuple, Optional
+
+# Opening or closing fence: up to 3 spaces, 3+ backticks or tildes, optional info string
+FENCE = re.compile(r'^( {0,3})(`{3,}|~{3,})[ \t]*([^`\s]*)[^`]*$')
+PYTHON_LANGUAGES = ('', 'python', 'python3', 'py', 'py3')
+# Lines a bare (unfenced) Python answer usually starts with, after any leading prose
+CODE_START = re.compile(r'^(?:def |async def |class |import |from \S+ import |@|if __name__)')
+LIST_MARKER = re.compile(r'^\s*(?:[-*+]|\d+[.)])\s+')
+MAX_TRIM_ATTEMPTS = 20
+
+
+class CodeBlock(NamedTuple):
+    language: str
+    code: str
+    line: int  # 1-based line of the opening fence
+    closed: bool  # False when the response was cut off inside the block
+
+
+class Extraction(NamedTuple):
+    kind: str  # 'code', 'clarification' or 'empty'
+    code: str
+    valid: bool  # code parses
+    blocks: int  # fenced blocks found in the response
+    questions: List[str]  # questions asked outside code blocks
+
+
+def find_code_blocks(text: str) -> List[CodeBlock]:
+    """
+    Fenced code blocks of a markdown response, in one pass over its lines.
+
+    A block closes at a fence of the same character that is at least as long
+    as the opening one and has no info string; a block still open at the end
+    (a truncated response) is returned with closed=False.
+    """
+    blocks, opening, body = [], None, []
+    for number, line in enumerate(text.split('\n'), 1):
+        stripped = line.lstrip(' ')
+        if not stripped.startswith(('```', '~~~')):
+            if opening is not None:
+                body.append(line)
+            continue
+        match = FENCE.match(line)
+        if match is None:
+            if opening is not None:
+                body.append(line)
+        elif opening is None:
+            opening = (match.group(2), match.group(3).lower(), number)
+        elif match.group(2)[0] == opening[0][0] and len(match.group(2)) >= len(opening[0]) and not match.group(3):
+            blocks.append(CodeBlock(opening[1], textwrap.dedent('\n'.join(body)).strip('\n'), opening[2], True))
+            opening, body = None, []
+        else:
+            body.append(line)
+    if opening is not None:
+        blocks.append(CodeBlock(opening[1], textwrap.dedent('\n'.join(body)).strip('\n'), opening[2], False))
+    return blocks
+
+
+def _parses(code: str) -> bool:
+    try:
+        ast.parse(code)
+    except (SyntaxError, ValueError):
+        return False
+    return True
+
+
+def _prose_lines(text: str, blocks: List[CodeBlock]) -> List[str]:
+    if not blocks:
+        return text.split('\n')
+    inside, lines, fence = False, [], None
+    for line in text.split('\n'):
+        match = FENCE.match(line) if line.lstrip(' ').startswith(('```', '~~~')) else None
+        if match is not None and (not inside or (match.group(2)[0] == fence[0] and not match.group(3))):
+            inside, fence = not inside, match.group(2)
+            continue
+        if not inside:
+            lines.append(line)
+    return lines
+
+
+def _questions(lines: List[str]) -> List[str]:
+    questions = []
+    for line in lines:
+        line = LIST_MARKER.sub('', line).strip().strip('*_').strip()
+        if line.endswith('?') and not line.startswith('#'):
+            questions.append(line)
+    return questions
+
+
+def _trim_prose(text: str) -> Optional[str]:
+    """Largest parseable span of an unfenced answer: from its first code-like line, minus trailing prose"""
+    lines = text.split('\n')
+    start = next((i for i, line in enumerate(lines) if CODE_START.match(line)), None)
+    if start is None:
+        return None
+    end = len(lines)
+    for _ in range(MAX_TRIM_ATTEMPTS):
+        code = '\n'.join(lines[start:end]).strip()
+        if code and _parses(code):
+            return code
+        # Drop the last unindented line (prose after the code), with any blank lines before it
+        end = next((i for i in range(end - 1, start, -1) if lines[i][:1] not in ('', ' ', '\t')), start)
+        if end <= start:
+            return None
+    return None
+
+
+def extract_code(text: str) -> Extraction:
+    """
+    The Python program in an LLM response.
+
+    Fenced Python (or untagged) blocks are preferred over other languages;
+    among them a block that parses wins, then the longest. An unfenced
+    response is taken whole if it parses, else from its first code-like line
+    with trailing prose trimmed. A response with no parseable code that asks
+    questions is a request for clarification.
+    """
+    text = (text or '').replace('\r\n', '\n').strip()
+    if not text:
+        return Extraction('empty', '', False, 0, [])
+    blocks = find_code_blocks(text)
+
+    if blocks:
+        candidates = [b for b in blocks if b.language in PYTHON_LANGUAGES] or blocks
+        ranked = [(_parses(b.code), len(b.code), -index, b) for index, b in enumerate(candidates)]
+        valid, _, _, best = max(ranked, key=lambda entry: entry[:3])
+        code = best.code
+    else:
+        code = text
+        valid = _parses(code)
+        if not valid:
+            trimmed = _trim_prose(text)
+            if trimmed is not None:
+                code, valid = trimmed, True
+
+    if not valid:
+        questions = _questions(_prose_lines(text, blocks))
+        if questions:
+            return Extraction('clarification', '', False, len(blocks), questions)
+    return Extraction('code', code, valid, len(blocks), [])
+
+
 def clean_code_output(code: str) -> str:
     """
-    Removes markdown code block markers from the generated code.
-    
+    Removes markdown and surrounding prose from a generated response.
+
     Args:
-        code (str): Code that may contain markdown code block markers
-        
+        code (str): LLM response that may wrap the code in markdown code blocks
+
     Returns:
-        str: Clean code without markdown markers
+        str: The extracted Python code (see extract_code)
     """
-    # Remove ```python at the beginning
-    if code.startswith('```python'):
-        code = code[9:]  # Remove '```python'
-    elif code.startswith('```'):
-        code = code[3:]   # Remove '```'
-    
-    # Remove ``` at the end
-    if code.endswith('```'):
-        code = code[:-3]
-    
-    # Remove leading/trailing whitespace
-    return code.strip() 
\ No newline at end of file
+    return extract_code(code).code
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Config import get_setting
+
+# Letter runs, digits (the Gemini tokenizer splits numbers digit by digit), single symbols, line breaks
+_PIECES = re.compile(r"[A-Za-z]+|\d|\n[ \t]*|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local estimate of how many input tokens `text` costs, without a count_tokens
+    round trip: one token per word of up to 8 letters (one more per further 8),
+    per digit, per symbol and per line break with its indentation.
+    Good to within ~15% on prose and Python; use it for comparisons, not billing.
+    """
+    tokens = 0
+    for piece in _PIECES.findall(text or ''):
+        tokens += 1 + (len(piece) - 1) // 8 if piece[0].isalpha() else 1
+    return tokens
+
+
+class PromptPrefix:
+    """
+    A system prompt compiled once into the stable head of every request that uses it.
+
+    Requests are sent as [system, user] with the system message first and
+    byte-identical across calls, so the provider's implicit prefix caching can
+    reuse it; only the user message varies. With prompt_cache.explicit, the
+    prefix is also uploaded once as Gemini cached content and requests carry
+    just the user message.
+    """
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.message = SystemMessage(content=text.strip())
+        self.tokens = estimate_tokens(self.message.content)
+        self.digest = hashlib.sha256(self.message.content.encode('utf-8')).hexdigest()[:16]
+        self._lock = threading.Lock()
+        self._caches = {}  # model -> (cached content name, expires_at)
+        self._retry_at = 0.0
+
+    def messages(self, user_text: str) -> List[BaseMessage]:
+        return [self.message, HumanMessage(content=user_text)]
+
+    def _cacheable(self, llm) -> bool:
+        if not get_setting('prompt_cache', 'explicit', False):
+            return False
+        if self.tokens < get_setting('prompt_cache', 'min_prefix_tokens', 1024):
+            return False  # below the provider's minimum for cached content
+        return hasattr(llm, 'cached_content') and hasattr(llm, 'google_api_key')
+
+    def _create_cache(self, llm, ttl: int) -> str:
+        from google import genai
+        from google.genai import types
+
+        client = genai.Client(api_key=llm.google_api_key.get_secret_value())
+        cache = client.caches.create(model=llm.model, config=types.CreateCachedContentConfig(
+            display_name=f"prompt-{self.name}-{self.digest}",
+            system_instruction=self.message.content,
+            ttl=f"{ttl}s",
+        ))
+        return cache.name
+
+    def cached_content(self, llm) -> Optional[str]:
+        """Name of this prefix's cached content for `llm`'s model, created on first use; None if not cacheable"""
+        if not self._cacheable(llm):
+            return None
+        ttl = int(get_setting('prompt_cache', 'ttl_seconds', 3600))
+        now = time.time()
+        with self._lock:
+            name, expires_at = self._caches.get(llm.model, (None, 0.0))
+            # Renew a minute early so no request races the expiry
+            if name and now < expires_at - 60:
+                return name
+            if now < self._retry_at:
+                return None
+            try:
+                name = self._create_cache(llm, ttl)
+            except Exception as e:
+                print(f"Warning: Could not cache prompt prefix '{self.name}', sending it inline: {e}")
+                self._retry_at = now + ttl
+                return None
+            self._caches[llm.model] = (name, now + ttl)
+            return name
+
+
+def _prefixed(prefix: PromptPrefix, llm, user_text: str, base_llm=None, schema=None):
+    """The runnable and messages for one request, through the prefix's cached content when explicit caching applies"""
+    base_llm = base_llm if base_llm is not None else llm
+    name = prefix.cached_content(base_llm)
+    if name is None:
+        return llm, prefix.messages(user_text)
+    cached_llm = base_llm.model_copy(update={'cached_content': name})
+    if schema is not None:
+        cached_llm = cached_llm.with_structured_output(schema)
+    return cached_llm, [HumanMessage(content=user_text)]
+
+
+def invoke_with_prefix(prefix: PromptPrefix, llm, user_text: str, base_llm=None, schema=None):
+    """
+    Invoke `llm` (a chat model, or a structured-output runnable built from
+    `base_llm` with `schema`) on `prefix` + `user_text`.
+    """
+    runnable, messages = _prefixed(prefix, llm, user_text, base_llm, schema)
+    return runnable.invoke(messages)
+
+
+def stream_with_prefix(prefix: PromptPrefix, llm, user_text: str):
+    """Like invoke_with_prefix for a plain chat model, yielding the response chunks as they arrive"""
+    runnable, messages = _prefixed(prefix, llm, user_text)
+    return runnable.stream(messages)
+
+
+def add_prompt_usage(usage: Optional[Dict], prefix: PromptPrefix, user_text: str, response=None) -> Dict:
+    """
+    Running input-token account of one generation: estimated prefix and
+    dynamic tokens per call, plus the provider's reported cache hits when the
+    response carries usage metadata.
+    """
+    usage = dict(usage or {'calls': 0, 'prefix_tokens': 0, 'dynamic_tokens': 0, 'cache_read_tokens': 0})
+    usage['calls'] += 1
+    usage['prefix_tokens'] += prefix.tokens
+    usage['dynamic_tokens'] += estimate_tokens(user_text)
+    metadata = getattr(response, 'usage_metadata', None) or {}
+    usage['cache_read_tokens'] += (metadata.get('input_token_details') or {}).get('cache_read', 0)
+    return usage
@@ -0,0 +1,195 @@
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Config import get_setting, load_config, resolve_path
+from Storage.shared_state import abandon_connection, reconnect_after_fork
+from Difference_Analyzer.ast_features import extract_features
+
+# Keyword buckets for query categories, checked in order; the first hit wins
+CATEGORY_KEYWORDS = (
+    ('web', ('http', 'api', 'request', 'scrape', 'url', 'flask', 'fastapi', 'server', 'website')),
+    ('io', ('file', 'csv', 'json', 'read', 'write', 'directory', 'folder', 'log')),
+    ('data_structure', ('stack', 'queue', 'linked', 'tree', 'graph', 'heap', 'hash', 'matrix', 'trie')),
+    ('oop', ('class', 'object', 'inherit', 'bank', 'account', 'inventory', 'library', 'management')),
+    ('algorithm', ('sort', 'search', 'binary', 'fibonacci', 'fibbonacci', 'prime', 'recursion', 'recursive',
+                   'dynamic', 'path', 'permutation', 'combination')),
+    ('string', ('string', 'text', 'word', 'palindrome', 'vowel', 'character', 'anagram', 'reverse')),
+    ('math', ('calculate', 'sum', 'factorial', 'number', 'average', 'square', 'even', 'odd', 'calculator')),
+)
+
+
+def query_category(query: str) -> str:
+    """Coarse category of a generation query, the unit loop budgets are learned for"""
+    words = set(re.findall(r'[a-z]+', query.lower()))
+    for category, keywords in CATEGORY_KEYWORDS:
+        if any(keyword in words or any(word.startswith(keyword) for word in words) for keyword in keywords):
+            return category
+    return 'general'
+
+
+def max_refinement_loops() -> int:
+    return int(load_config().get('max_refinement_loops', 5))
+
+
+def draft_metrics(code: str) -> Optional[Dict]:
+    """AST metrics of one draft plus a single complexity score (lower is simpler); None if it doesn't parse"""
+    features = extract_features(code or '', 'draft.py')
+    if not features or 'error' in features:
+        return None
+    metrics = dict(features['complexity_metrics'])
+    # Branches and loops weigh more than raw size: they are what a fresher has to trace
+    metrics['score'] = metrics['total_nodes'] + 10 * (metrics['if_statements'] + metrics['loops'])
+    return metrics
+
+
+def is_stalled(trace: List[Dict], patience: int, min_improvement: float) -> bool:
+    """
+    True when none of the last `patience` drafts cut the complexity score by at
+    least `min_improvement` (a fraction) relative to the best draft before it.
+    Drafts that don't parse count as no improvement.
+    """
+    if len(trace) <= patience:
+        return False
+    for index in range(len(trace) - patience, len(trace)):
+        earlier = [entry['score'] for entry in trace[:index] if entry.get('score') is not None]
+        score = trace[index].get('score')
+        if earlier and score is not None and score <= min(earlier) * (1 - min_improvement):
+            return False
+    return True
+
+
+def stop_reason(loop_count: int, complexity_status: str, refinement: Optional[Dict]) -> Optional[str]:
+    """Why the refinement loop should end now ('simple', 'budget', 'stalled', 'max_loops'), or None to refine"""
+    if complexity_status == 'simple':
+        return 'simple'
+    if loop_count >= max_refinement_loops():
+        return 'max_loops'
+    if not refinement:
+        return None
+    if loop_count >= (refinement.get('budget') or max_refinement_loops()):
+        return 'budget'
+    stalled = is_stalled(refinement.get('trace', []), get_setting('refinement', 'stall_patience', 1),
+                         get_setting('refinement', 'min_improvement', 0.05))
+    if stalled and get_setting('refinement', 'adaptive', True):
+        return 'stalled'
+    return None
+
+
+class RefinementStats:
+    """
+    SQLite history of finished refinement loops, for learning loop budgets per query category.
+
+    Each run records its category, how many generate/check rounds it used,
+    whether the checker accepted the code, and the per-round verdicts and
+    metrics. Budgets come from the per-round acceptance rates (see budget), so
+    categories that converge early, or rarely converge at all, stop paying for
+    rounds that don't help.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or resolve_path(get_setting('files', 'refinement_stats', 'Generated/refinement_stats.sqlite'))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._connect()
+        with self._lock, self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY,
+                    category TEXT NOT NULL,
+                    loops INTEGER NOT NULL,
+                    converged INTEGER NOT NULL,
+                    stop_reason TEXT,
+                    trace TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS runs_category ON runs (category, id)")
+        reconnect_after_fork(self)
+
+    def _connect(self):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+
+    def _reconnect(self):
+        # Forked API workers each need their own connection
+        abandon_connection(self.conn)
+        self._connect()
+
+    def record(self, category: str, loops: int, converged: bool, reason: Optional[str], trace: List[Dict]):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO runs (category, loops, converged, stop_reason, trace, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (category, loops, int(converged), reason, json.dumps(trace), time.time()),
+            )
+
+    def summary(self, category: str) -> Dict:
+        """
+        Per-round convergence over the category's recent history: how many runs
+        reached each round and how many of those were accepted in it.
+        """
+        limit = get_setting('refinement', 'history_limit', 200)
+        ceiling = max_refinement_loops()
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT loops, converged, stop_reason FROM runs WHERE category = ? ORDER BY id DESC LIMIT ?",
+                (category, limit),
+            ).fetchall()
+        # A stalled run is taken as evidence that the remaining rounds would not have helped either;
+        # a run cut off by its budget says nothing about the rounds it skipped
+        reach = [ceiling if reason == 'stalled' else loops for loops, _, reason in rows]
+        return {
+            'runs': len(rows),
+            'convergence_rate': round(sum(ok for _, ok, _ in rows) / len(rows), 3) if rows else None,
+            'reached': [sum(r >= round_ for r in reach) for round_ in range(1, ceiling + 1)],
+            'converged': [sum(1 for loops, ok, _ in rows if ok and loops == round_) for round_ in range(1, ceiling + 1)],
+        }
+
+    def budget(self, category: str) -> int:
+        """
+        Learned round budget for a category: the first round after which the
+        chance of the checker still accepting a later draft (product of the
+        per-round acceptance rates of runs that got that far) falls below
+        min_convergence_gain. A round seen by fewer than min_samples runs is
+        unknown and keeps the budget above it, so budgets only shrink on
+        evidence; the configured maximum applies until there is enough history.
+        """
+        ceiling = max_refinement_loops()
+        stats = self.summary(category)
+        min_samples = get_setting('refinement', 'min_samples', 5)
+        if stats['runs'] < min_samples:
+            return ceiling
+        # Now and then run the full budget, so rounds past the budget keep getting observed
+        if random.random() < get_setting('refinement', 'explore_rate', 0.1):
+            return ceiling
+        hazards = [converged / reached if reached >= min_samples else None
+                   for reached, converged in zip(stats['reached'], stats['converged'])]
+        min_gain = get_setting('refinement', 'min_convergence_gain', 0.2)
+        for budget in range(get_setting('refinement', 'min_budget', 1), ceiling):
+            later = hazards[budget:]
+            if None in later:
+                continue
+            never = 1.0
+            for hazard in later:
+                never *= 1 - hazard
+            if 1 - never < min_gain:
+                return budget
+        return ceiling
+
+
+def create_refinement_stats() -> Optional[RefinementStats]:
+    """History configured in refinement, or None when adaptive budgets are disabled"""
+    if not get_setting('refinement', 'adaptive', True):
+        return None
+    return RefinementStats()
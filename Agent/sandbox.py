@@ -0,0 +1,156 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Config import get_setting
+
+try:
+    import resource
+except ImportError:
+    resource = None
+    print("Warning: resource module not available, sandboxed code runs without CPU/memory limits")
+
+RUNNER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sandbox_runner.py')
+
+
+def run_sandboxed(code: str, mode: str = 'verify', args: Optional[List[str]] = None,
+                  timeout: Optional[float] = None, cpu_seconds: Optional[int] = None,
+                  memory_mb: Optional[int] = None, files: Optional[Dict[str, str]] = None) -> Dict:
+    """
+    Run `code` through sandbox_runner in a fresh, isolated Python subprocess.
+
+    The child gets an empty temp directory as cwd, `python -I` (no user site,
+    no PYTHON* variables), a minimal environment, no stdin, and CPU, address
+    space, file size and process count limits. It is killed on wall timeout.
+    This is process-level isolation only: it doesn't block network access.
+    `files` are extra files written next to the code; runner args may name them.
+    The runner reports over a pipe rather than a file in the shared working
+    directory, so files the code writes can't replace its result.
+    """
+    timeout = timeout or get_setting('sandbox', 'timeout_seconds', 10)
+    cpu_seconds = cpu_seconds or get_setting('sandbox', 'cpu_seconds', 5)
+    memory_mb = memory_mb or get_setting('sandbox', 'memory_mb', 512)
+    max_output = get_setting('sandbox', 'max_output_chars', 2000)
+
+    workdir = tempfile.mkdtemp(prefix='sandbox_')
+    try:
+        code_path = os.path.join(workdir, 'candidate.py')
+        with open(code_path, 'w', encoding='utf-8') as f:
+            f.write(code)
+        for name, content in (files or {}).items():
+            with open(os.path.join(workdir, os.path.basename(name)), 'w', encoding='utf-8') as f:
+                f.write(content)
+
+        env = {'PATH': os.environ.get('PATH', '/usr/bin:/bin'), 'PYTHONHASHSEED': '0', 'PYTHONDONTWRITEBYTECODE': '1',
+               # The runner sets its own rlimits on startup: a preexec_fn can deadlock a threaded parent
+               'SANDBOX_LIMITS': json.dumps({'cpu_seconds': cpu_seconds, 'memory_mb': memory_mb})}
+        result_read, result_write = os.pipe()
+        # Drained on a thread: a large result must not block the runner while communicate() reads stdout/stderr
+        chunks = []
+        reader = threading.Thread(target=_drain, args=(result_read, chunks), name='sandbox-result', daemon=True)
+        reader.start()
+        start = time.perf_counter()
+        try:
+            process = subprocess.Popen(
+                [sys.executable, '-I', RUNNER, mode, code_path, str(result_write), *(args or [])],
+                cwd=workdir, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                start_new_session=True,  # its own process group, so the whole group can be killed
+                pass_fds=(result_write,),
+            )
+        finally:
+            os.close(result_write)
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+            timed_out = False
+        except subprocess.TimeoutExpired:
+            _kill(process)
+            stdout, stderr = process.communicate()
+            timed_out = True
+        elapsed = time.perf_counter() - start
+
+        reader.join(timeout=1)
+        try:
+            result = json.loads(b''.join(chunks))
+        except ValueError:
+            result = {}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if timed_out:
+        result.update(status='timeout', error={'type': 'Timeout', 'message': f'Exceeded {timeout}s wall time', 'line': None})
+    elif 'status' not in result:
+        # Killed before it could report: a signal from the CPU/memory limits, or a crash
+        stderr_text = stderr.decode('utf-8', 'replace')
+        status = 'cpu_limit' if process.returncode == -24 else (
+            'memory_limit' if 'MemoryError' in stderr_text else 'error')
+        result.update(status=status, error={'type': 'Crash', 'message': stderr_text[-500:], 'line': None})
+
+    result.update(
+        exit_code=process.returncode,
+        process_seconds=round(elapsed, 6),
+        stdout_tail=stdout.decode('utf-8', 'replace')[-max_output:],
+        stderr_tail=stderr.decode('utf-8', 'replace')[-max_output:],
+        limits={'timeout_seconds': timeout, 'cpu_seconds': cpu_seconds, 'memory_mb': memory_mb},
+    )
+    return result
+
+
+def _drain(fd: int, chunks: List[bytes]):
+    with os.fdopen(fd, 'rb') as pipe:
+        for chunk in iter(lambda: pipe.read(1 << 16), b''):
+            chunks.append(chunk)
+
+
+def _kill(process: subprocess.Popen):
+    try:
+        if resource is not None:
+            os.killpg(process.pid, 9)
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        process.kill()
+
+
+class SandboxPool:
+    """
+    Bounded pool for sandboxed runs.
+
+    Each task spends its time waiting on a child process, so threads are
+    enough; `max_workers` caps how many sandboxes run at once.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or get_setting('sandbox', 'max_workers', 2)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='sandbox')
+
+    def submit(self, code: str, mode: str = 'verify', args: Optional[List[str]] = None, **options) -> Future:
+        return self._executor.submit(run_sandboxed, code, mode, args, **options)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool()
+        return _pool
+
+
+def verify_code(code: str) -> Dict:
+    """Import and run `code` as __main__ in the sandbox; returns status, wall time and peak memory"""
+    return get_sandbox_pool().submit(code, 'verify').result()
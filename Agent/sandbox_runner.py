@@ -0,0 +1,276 @@
+"""
+Child-side entry point for sandboxed execution (see Agent/sandbox.py).
+
+Runs with `python -I` inside a throwaway directory, so it must only use the
+standard library. Usage:
+
+    python -I sandbox_runner.py verify <code_path> <result_fd>
+    python -I sandbox_runner.py compare <code_path> <result_fd> <baseline_path> <spec_path>
+
+The result is written as JSON to `result_fd`, a pipe inherited from the parent.
+"""
+import contextlib
+import copy
+import importlib.util
+import inspect
+import itertools
+import json
+import os
+import runpy
+import signal
+import sys
+import time
+import traceback
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def apply_limits():
+    """CPU, address space, file size and process limits from SANDBOX_LIMITS, before any candidate code runs"""
+    limits = json.loads(os.environ.pop('SANDBOX_LIMITS', '{}'))
+    if resource is None or not limits:
+        return
+    memory = limits['memory_mb'] * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_CPU, (limits['cpu_seconds'], limits['cpu_seconds'] + 1))
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    resource.setrlimit(resource.RLIMIT_FSIZE, (16 * 1024 * 1024, 16 * 1024 * 1024))
+    resource.setrlimit(resource.RLIMIT_NPROC, (64, 64))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+def peak_memory_mb() -> float:
+    # VmHWM belongs to this executable's address space; ru_maxrss would also
+    # carry over the forking parent's high-water mark on Linux
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def failure_status(exc: BaseException) -> str:
+    if isinstance(exc, EOFError):
+        # input() with no stdin: the code runs but expects an interactive user
+        return 'needs_input'
+    return 'memory_limit' if isinstance(exc, MemoryError) else 'error'
+
+
+def describe_error(exc: BaseException) -> dict:
+    frames = traceback.extract_tb(exc.__traceback__)
+    line = next((f.lineno for f in reversed(frames) if f.filename.endswith('candidate.py')), None)
+    return {'type': type(exc).__name__, 'message': str(exc)[:500], 'line': line}
+
+
+def verify(code_path: str) -> dict:
+    """Run the code once as __main__, timing it"""
+    result = {'ran_main': False}
+    start = time.perf_counter()
+    try:
+        runpy.run_path(code_path, run_name='__main__')
+        result.update(status='ok', ran_main=True)
+    except SystemExit as exc:
+        ok = exc.code in (None, 0)
+        result.update(status='ok' if ok else 'error', ran_main=ok)
+        if not ok:
+            result['error'] = {'type': 'SystemExit', 'message': str(exc.code), 'line': None}
+    except BaseException as exc:
+        result.update(status=failure_status(exc), error=describe_error(exc))
+    finally:
+        result['main_seconds'] = round(time.perf_counter() - start, 6)
+    return result
+
+
+class TrialTimeout(Exception):
+    pass
+
+
+@contextlib.contextmanager
+def time_limit(seconds: float):
+    """Abort the block after `seconds` of wall time (main thread, POSIX only)"""
+    if not hasattr(signal, 'setitimer'):
+        yield
+        return
+
+    def expire(signum, frame):
+        raise TrialTimeout(f"call took longer than {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def load_module(path: str, name: str):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+TYPE_NAMES = {'int': 'int', 'float': 'float', 'str': 'str', 'list': 'list', 'List': 'list', 'dict': 'dict',
+              'Dict': 'dict', 'tuple': 'tuple', 'Tuple': 'tuple', 'set': 'set', 'bool': 'bool'}
+NAME_HINTS = (
+    (('n', 'num', 'number', 'count', 'size', 'limit', 'k', 'places', 'terms', 'length', 'x', 'y', 'a', 'b'), 'int'),
+    (('s', 'text', 'string', 'word', 'name', 'sentence', 'line', 'char'), 'str'),
+    (('lst', 'arr', 'array', 'nums', 'numbers', 'items', 'values', 'data', 'elements', 'seq', 'sequence'), 'list'),
+)
+
+
+def sample_value(kind: str, size: int):
+    if kind == 'int':
+        return size
+    if kind == 'float':
+        return size + 0.5
+    if kind == 'str':
+        return ('racecar level noon ' * size)[:size * 5]
+    if kind == 'list':
+        return list(range(size * 5, 0, -1))
+    if kind == 'dict':
+        return {f"key{i}": i for i in range(size * 5)}
+    if kind == 'tuple':
+        return tuple(range(size * 5, 0, -1))
+    if kind == 'set':
+        return set(range(size * 5))
+    return True
+
+
+def candidate_kinds(parameter: inspect.Parameter) -> list:
+    annotation = parameter.annotation
+    if annotation is not inspect.Parameter.empty:
+        label = annotation if isinstance(annotation, str) else getattr(annotation, '__name__', str(annotation))
+        kind = TYPE_NAMES.get(label.split('[')[0].replace('typing.', ''))
+        if kind:
+            return [kind]
+    name = parameter.name.lower()
+    for names, kind in NAME_HINTS:
+        if name in names or any(name.startswith(hint) for hint in names if len(hint) > 2):
+            return [kind] + [k for k in ('int', 'list', 'str') if k != kind]
+    return ['int', 'list', 'str']
+
+
+def auto_inputs(original, modified, size: int, trial_seconds: float):
+    """First argument list built from the signature that both versions accept"""
+    try:
+        parameters = [
+            p for p in inspect.signature(original).parameters.values()
+            if p.default is inspect.Parameter.empty and p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)
+        ]
+    except (TypeError, ValueError):
+        return None
+    for kinds in itertools.islice(itertools.product(*(candidate_kinds(p) for p in parameters)), 8):
+        args = [sample_value(kind, size) for kind in kinds]
+        try:
+            with open(os.devnull, 'w') as sink, contextlib.redirect_stdout(sink), time_limit(trial_seconds):
+                original(*copy.deepcopy(args))
+                modified(*copy.deepcopy(args))
+            return args
+        except BaseException:
+            continue
+    return None
+
+
+def time_calls(function, args, number: int, sink) -> float:
+    """Seconds per call over `number` calls, each on a fresh copy of the arguments"""
+    copies = [copy.deepcopy(args) for _ in range(number)]
+    with contextlib.redirect_stdout(sink):
+        start = time.perf_counter()
+        for call_args in copies:
+            function(*call_args)
+        return (time.perf_counter() - start) / number
+
+
+def benchmark_pair(original, modified, args, repeat: int, target_seconds: float, sink) -> dict:
+    # Calibrate the loop count on the original, timeit.autorange style
+    number = 1
+    while number < 1000000:
+        if time_calls(original, args, number, sink) * number >= target_seconds:
+            break
+        number *= 2
+    original_times, modified_times = [], []
+    # Interleave the two versions so drift (thermal, other load) hits both equally
+    for _ in range(repeat):
+        original_times.append(time_calls(original, args, number, sink))
+        modified_times.append(time_calls(modified, args, number, sink))
+    return {'number': number, 'original_times': original_times, 'modified_times': modified_times}
+
+
+def same_output(original, modified, args, sink):
+    try:
+        with contextlib.redirect_stdout(sink):
+            return original(*copy.deepcopy(args)) == modified(*copy.deepcopy(args))
+    except BaseException:
+        return None
+
+
+def compare(code_path: str, baseline_path: str, spec_path: str) -> dict:
+    """Benchmark same-named top-level functions of the baseline (original) and the code (modified)"""
+    with open(spec_path, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    try:
+        with open(os.devnull, 'w') as sink, contextlib.redirect_stdout(sink):
+            original_module = load_module(baseline_path, 'original')
+            modified_module = load_module(code_path, 'candidate')
+    except BaseException as exc:
+        return {'status': failure_status(exc), 'error': describe_error(exc), 'functions': []}
+
+    functions = []
+    with open(os.devnull, 'w') as sink:
+        for entry in spec['functions']:
+            name = entry['name']
+            original, modified = getattr(original_module, name, None), getattr(modified_module, name, None)
+            if not callable(original) or not callable(modified):
+                functions.append({'function': name, 'status': 'skipped', 'reason': 'not callable in both versions'})
+                continue
+            inputs = entry.get('inputs')
+            if inputs is None:
+                found = auto_inputs(original, modified, spec.get('input_size', 20), spec.get('trial_seconds', 2.0))
+                inputs = [found] if found is not None else []
+            if not inputs:
+                functions.append({'function': name, 'status': 'skipped', 'reason': 'no input accepted by both versions'})
+                continue
+            for args in inputs:
+                record = {'function': name, 'inputs': repr(args)[:200]}
+                try:
+                    with time_limit(spec.get('function_seconds', 20.0)):
+                        record.update(benchmark_pair(original, modified, args, spec.get('repeat', 15),
+                                                     spec.get('target_seconds', 0.01), sink))
+                    record['outputs_match'] = same_output(original, modified, args, sink)
+                    record['status'] = 'ok'
+                except BaseException as exc:
+                    record.update(status='error', error=describe_error(exc))
+                functions.append(record)
+    return {'status': 'ok', 'functions': functions}
+
+
+MODES = {'verify': verify, 'compare': compare}
+
+
+def main():
+    apply_limits()
+    mode, code_path, result_fd = sys.argv[1], sys.argv[2], int(sys.argv[3])
+    # Not passed on to anything the code under test starts
+    os.set_inheritable(result_fd, False)
+    start = time.perf_counter()
+    result = MODES[mode](code_path, *sys.argv[4:])
+    result['wall_seconds'] = round(time.perf_counter() - start, 6)
+    result['peak_memory_mb'] = peak_memory_mb()
+    # Results go to the parent's pipe: stdout belongs to the code under test, and so does the working directory
+    with os.fdopen(result_fd, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+
+if __name__ == '__main__':
+    main()
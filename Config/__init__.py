@@ -0,0 +1,28 @@
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+CONFIG_FILE = os.path.join(PROJECT_ROOT, "Config", "config.json")
+
+
+@lru_cache(maxsize=1)
+def load_config() -> Dict[str, Any]:
+    """Load Config/config.json (cached for the lifetime of the process)"""
+    try:
+        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"Warning: Could not load {CONFIG_FILE}: {e}")
+        return {}
+
+
+def get_setting(section: str, key: str, default: Any = None) -> Any:
+    """Read `config[section][key]`, falling back to `default`"""
+    return load_config().get(section, {}).get(key, default)
+
+
+def resolve_path(path: str) -> str:
+    """Resolve a config path relative to the project root"""
+    return path if os.path.isabs(path) else os.path.join(PROJECT_ROOT, path)
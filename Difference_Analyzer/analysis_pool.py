@@ -0,0 +1,144 @@
+# analysis_pool.py - Process pool for the CPU-bound parse and diff stages
+import atexit
+import multiprocessing
+import os
+import pickle
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Config import get_setting
+from Difference_Analyzer.ast_features import FileFeatures, diff_features
+from Difference_Analyzer.file_analysis import ParsedFile, parse_file
+from Storage.report_cache import file_hash
+
+# Per-worker parse cache, created by the pool initializer
+_worker_cache = None
+
+
+class ParseCache:
+    """Bounded LRU of ParsedFiles keyed by file content hash, held inside each worker"""
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def parse(self, path: str, label: str) -> ParsedFile:
+        key = file_hash(path)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        parsed = parse_file(path, label)
+        # Parse errors are cheap to recompute and not worth a cache slot
+        if isinstance(parsed.features, FileFeatures):
+            self.entries[key] = parsed
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return parsed
+
+
+def _init_worker(cache_entries: int):
+    global _worker_cache
+    _worker_cache = ParseCache(cache_entries)
+
+
+def _analyze_pair(original_path: str, modified_path: str) -> bytes:
+    """Worker task: parse both files (through the warm cache) and diff them"""
+    cache = _worker_cache or ParseCache()
+    original = cache.parse(original_path, 'original.py')
+    modified = cache.parse(modified_path, 'modified.py')
+    changes = None
+    if isinstance(original.features, FileFeatures) and isinstance(modified.features, FileFeatures):
+        changes = diff_features(original.features, modified.features)
+    return pickle.dumps((original, modified, changes), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+class AnalysisPool:
+    """
+    Lazily started process pool for parsing and diffing uploaded files.
+
+    Keeps `ast.parse` and feature extraction off the API's request threads,
+    so a large upload doesn't hold the GIL while small requests wait. Inputs
+    below `min_bytes` are handled inline, where the round trip would cost
+    more than the parse.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, min_bytes: Optional[int] = None,
+                 cache_entries: Optional[int] = None):
+        self.max_workers = max_workers or get_setting('analysis_pool', 'max_workers', None) or os.cpu_count() or 1
+        self.min_bytes = min_bytes if min_bytes is not None else get_setting('analysis_pool', 'min_bytes', 262144)
+        self.cache_entries = cache_entries or get_setting('analysis_pool', 'worker_cache_entries', 128)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # The API forks from a threaded process; forkserver avoids inheriting held locks
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context(method),
+                    initializer=_init_worker, initargs=(self.cache_entries,)
+                )
+            return self._executor
+
+    def should_offload(self, *paths: str) -> bool:
+        try:
+            return sum(os.path.getsize(path) for path in paths) >= self.min_bytes
+        except OSError:
+            return False
+
+    def run(self, fn, *args):
+        """Run a picklable module-level function in a worker and wait for its result"""
+        try:
+            return self._get_executor().submit(fn, *args).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool next time and do this one inline
+            print("Warning: analysis worker pool crashed, falling back to in-process parsing")
+            self.shutdown(wait=False)
+            return fn(*args)
+
+    def map(self, fn, items: list, chunksize: int = 1) -> list:
+        """Results of a picklable module-level function over `items`, computed across the workers"""
+        try:
+            return list(self._get_executor().map(fn, items, chunksize=chunksize))
+        except BrokenProcessPool:
+            print("Warning: analysis worker pool crashed, falling back to in-process parsing")
+            self.shutdown(wait=False)
+            return [fn(item) for item in items]
+
+    def analyze_files(self, original_path: str, modified_path: str) -> Tuple:
+        """Return (original ParsedFile, modified ParsedFile, changes) for two files"""
+        return pickle.loads(self.run(_analyze_pair, original_path, modified_path))
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_analysis_pool() -> Optional[AnalysisPool]:
+    """Shared pool for this process, or None when disabled in config"""
+    global _pool
+    if not get_setting('analysis_pool', 'enabled', True):
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = AnalysisPool()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def shutdown_analysis_pool():
+    if _pool is not None:
+        _pool.shutdown()
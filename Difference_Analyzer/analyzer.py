@@ -3,7 +3,8 @@ import ast
 import json
 import os
 from datetime import datetime
-from typing import TypedDict, Dict, List, Optional, Any, Annotated
+from functools import lru_cache
+from typing import TypedDict, Dict, List, Optional, Any, Annotated, Callable
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from pydantic import BaseModel, Field
@@ -14,22 +15,58 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 try:
     from Agent.client import Client
     from Agent.custom_prompt import REPORT_BUILDER_SYSTEM_PROMPT
+    from Agent.history_policy import bounded_history
+    from Agent.prompt_cache import PromptPrefix, invoke_with_prefix
     google_llm = Client().load_google_llm()
+    # Compiled once; the report data goes in the user message after this stable prefix
+    REPORT_PREFIX = PromptPrefix('report', REPORT_BUILDER_SYSTEM_PROMPT)
 except ImportError as e:
     print(f"Warning: Could not import Agent modules: {e}")
     google_llm = None
+    bounded_history = add_messages
+
+from Difference_Analyzer.ast_features import diff_features, count_changes
+from Difference_Analyzer.file_analysis import (ParsedFile, build_parsed_diff_model, compare_parsed_clones, compare_parsed_lint,
+                                               parse_code, parse_file)
+from Difference_Analyzer.project_analyzer import analyze_project
+from Difference_Analyzer.analysis_pool import get_analysis_pool
+from Difference_Analyzer.runtime_benchmark import compare_runtime
+from Difference_Analyzer.diff_model import decode_diff_model, encode_diff_model
+from Difference_Analyzer.syntax_recovery import describe_recovery, recover_source
+from Storage.report_cache import ReportCache, content_hash
+from Config import get_setting
+
+# Finished reports, keyed by the content hashes of both inputs
+report_cache = ReportCache()
 
 
 # State definition for AST analysis workflow
 class ASTAnalysisState(TypedDict):
-    original_code: str
-    modified_code: str
+    # Either file paths (preferred: sources are read, parsed and dropped inside
+    # the parser node) or in-memory code strings
+    original_file: Optional[str]
+    modified_file: Optional[str]
+    original_code: Optional[str]
+    modified_code: Optional[str]
     original_ast: Optional[Dict]
     modified_ast: Optional[Dict]
+    # FileDetails of each side (see file_analysis.py): collected in the same parse as the
+    # features, so later nodes never read or parse the files again
+    original_details: Optional[Any]
+    modified_details: Optional[Any]
     structural_changes: Dict
+    # Per side that didn't parse: the top-level blocks skipped by error-tolerant parsing (see syntax_recovery.py)
+    syntax_recovery: Dict
+    clone_report: Dict
+    lint_report: Dict
+    # Side-by-side diff payload for clients (see diff_model.py); cached next to the report, not sent to the LLM
+    diff_model: Dict
+    # Benchmark mode only: user-supplied inputs and the per-function timings
+    benchmark_inputs: Optional[Dict]
+    runtime_comparison: Dict
     pattern_insights: Dict
     learning_summary: Dict
-    analysis_history: Annotated[List[Dict], add_messages]
+    analysis_history: Annotated[List[Dict], bounded_history]
     final_report: Optional[str]  # Changed from Dict to str
 
 # Pydantic models for structured analysis
@@ -45,7 +82,8 @@ class PatternInsight(BaseModel):
     recommendation: str = Field(..., description="Suggestion for improvement")
     confidence: float = Field(..., description="Confidence score 0-1")
 
-class ReportOutput(BaseModel):
+class ReportNarrative(BaseModel):
+    # The part of the report written by the LLM
     change_summary: str = Field(
         ..., 
         description="High-level bullet or paragraph summarizing what changed between versions."
@@ -63,8 +101,29 @@ class ReportOutput(BaseModel):
         description="Actionable recommendations (1-3 bullets) to improve code or process."
     )
 
+class PerformanceFinding(BaseModel):
+    rule: str
+    name: str
+    severity: str
+    line: int
+    function: str
+    message: str
+    suggestion: str
+    loop_line: int = Field(default=0, description="Line of the loop a len-in-loop finding refers to")
+    introduced: bool = Field(default=True, description="Not present in the original version")
+
+class ReportOutput(ReportNarrative):
+    # Filled in from the linter after the LLM call, not by the LLM
+    performance_findings: List[PerformanceFinding] = Field(
+        default_factory=list, description="Performance anti-patterns in the modified code, with line numbers."
+    )
+
+class BenchmarkedReportOutput(ReportOutput):
+    # Filled in from the measurements after the LLM call, not by the LLM
+    runtime_comparison: Dict = Field(default_factory=dict, description="Per-function speedups with confidence intervals.")
+
 # Strucutred_Output_LLm
-structured_llm = google_llm.with_structured_output(ReportOutput)
+structured_llm = google_llm.with_structured_output(ReportNarrative)
 
 
 class ASTAnalyzer:
@@ -90,51 +149,108 @@ class ASTAnalyzer:
 
 # Node 1: AST Parser
 def ast_parser_node(state: ASTAnalysisState) -> Dict:
-    """Parse both code versions into AST representations"""
+    """Parse both code versions into compact feature summaries"""
     
-    def safe_parse(code: str, filename: str) -> Optional[Dict]:
-        try:
-            tree = ast.parse(code)
-            
-            # Fixed import extraction logic
-            imports = []
-            for node in ast.walk(tree):
-                if isinstance(node, ast.Import):
-                    for alias in node.names:
-                        imports.append(alias.name)
-                elif isinstance(node, ast.ImportFrom):
-                    module = node.module or ""
-                    for alias in node.names:
-                        imports.append(f"{module}.{alias.name}" if module else alias.name)
-            
-            return {
-                'functions': [node.name for node in ast.walk(tree) if isinstance(node, ast.FunctionDef)],
-                'classes': [node.name for node in ast.walk(tree) if isinstance(node, ast.ClassDef)],
-                'imports': imports,
-                'variables': [node.id for node in ast.walk(tree) 
-                             if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)],
-                'complexity_metrics': {
-                    'total_nodes': len(list(ast.walk(tree))),
-                    'function_count': len([n for n in ast.walk(tree) if isinstance(n, ast.FunctionDef)]),
-                    'class_count': len([n for n in ast.walk(tree) if isinstance(n, ast.ClassDef)]),
-                    'if_statements': len([n for n in ast.walk(tree) if isinstance(n, ast.If)]),
-                    'loops': len([n for n in ast.walk(tree) if isinstance(n, (ast.For, ast.While))]),
-                }
-            }
-        except SyntaxError as e:
-            return {'error': f'Syntax error in {filename}: {str(e)}'}
-        except Exception as e:
-            return {'error': f'Parse error in {filename}: {str(e)}'}
+    # Large files are parsed and diffed in a worker process, off the request thread
+    original_file, modified_file = state.get('original_file'), state.get('modified_file')
+    pool = get_analysis_pool() if original_file and modified_file else None
+    if pool and pool.should_offload(original_file, modified_file):
+        original, modified, changes = pool.analyze_files(original_file, modified_file)
+        recovered = _recover_unparseable(state, {'original': original, 'modified': modified})
+        if recovered:
+            return recovered
+        return {
+            'original_ast': original.features,
+            'modified_ast': modified.features,
+            'original_details': original.details,
+            'modified_details': modified.details,
+            'structural_changes': changes or {},
+            'analysis_history': [{'role': 'system', 'content': f'AST parsing completed in worker pool at {datetime.now().isoformat()}'}]
+        }
     
-    original_ast = safe_parse(state['original_code'], 'original.py')
-    modified_ast = safe_parse(state['modified_code'], 'modified.py')
+    def parse_side(side: str):
+        # One file at a time, so at most one source and one AST are alive at once
+        path = state.get(f'{side}_file')
+        if path:
+            return parse_file(path, f'{side}.py')
+        return parse_code(state.get(f'{side}_code') or '', f'{side}.py')
+    
+    original = parse_side('original')
+    modified = parse_side('modified')
+    recovered = _recover_unparseable(state, {'original': original, 'modified': modified})
+    if recovered:
+        return recovered
     
     return {
-        'original_ast': original_ast,
-        'modified_ast': modified_ast,
+        'original_ast': original.features,
+        'modified_ast': modified.features,
+        'original_details': original.details,
+        'modified_details': modified.details,
         'analysis_history': [{'role': 'system', 'content': f'AST parsing completed at {datetime.now().isoformat()}'}]
     }
 
+def _is_parse_error(features) -> bool:
+    return isinstance(features, dict) and str(features.get('error', '')).startswith(('Syntax error', 'Parse error'))
+
+def _recover_unparseable(state: ASTAnalysisState, parsed: Dict[str, ParsedFile]) -> Optional[Dict]:
+    """
+    Error-tolerant parsing for sides that don't parse: their broken top-level
+    blocks are blanked out and that side continues as in-memory code, so the
+    later nodes analyze whatever is left instead of running on empty data.
+    A side that parsed keeps its file path and streamed parse. Sources above
+    `syntax_recovery.max_bytes` are not loaded for recovery; their parse error
+    stands and the report is skipped.
+    """
+    if not get_setting('syntax_recovery', 'enabled', True) or \
+            not any(_is_parse_error(side.features) for side in parsed.values()):
+        return None
+    max_bytes = get_setting('syntax_recovery', 'max_bytes', 262144)
+    updates, recovery, notes = {'structural_changes': {}}, {}, []
+    for side, parsed_side in parsed.items():
+        if _is_parse_error(parsed_side.features):
+            path = state.get(f'{side}_file')
+            try:
+                size = os.path.getsize(path) if path else len(state.get(f'{side}_code') or '')
+                if size > max_bytes:
+                    error = f"{parsed_side.features['error']} (not recovered: {size} bytes is over syntax_recovery.max_bytes)"
+                    parsed_side = ParsedFile({'error': error}, None)
+                    notes.append(error)
+                else:
+                    if path:
+                        with open(path, 'r', encoding='utf-8') as f:
+                            source = f.read()
+                    else:
+                        source = state.get(f'{side}_code') or ''
+                    source, recovery[side] = recover_source(source)
+                    recovery[side]['error'] = parsed_side.features['error']
+                    notes.append(describe_recovery(f'{side}.py', recovery[side]))
+                    parsed_side = parse_code(source, f'{side}.py')
+                    updates[f'{side}_file'], updates[f'{side}_code'] = None, source
+            except (IOError, UnicodeDecodeError):
+                pass
+        updates[f'{side}_ast'] = parsed_side.features
+        updates[f'{side}_details'] = parsed_side.details
+    updates['syntax_recovery'] = recovery
+    updates['analysis_history'] = [{'role': 'system', 'content': f'AST parsing completed with syntax recovery at {datetime.now().isoformat()}. {"; ".join(notes)}'}]
+    return updates
+
+def _unanalyzable(state: ASTAnalysisState) -> List[str]:
+    """Why there is nothing useful to analyze: one reason per side that doesn't parse or kept too little code"""
+    reasons = []
+    recovery = state.get('syntax_recovery') or {}
+    min_share = get_setting('syntax_recovery', 'min_parsed_share', 0.5)
+    for side in ('original', 'modified'):
+        features = state.get(f'{side}_ast')
+        if side in recovery and recovery[side]['parsed_share'] < min_share:
+            reasons.append(describe_recovery(f'{side}.py', recovery[side]))
+        elif features is None or 'error' in features:
+            reasons.append((features or {}).get('error') or f'{side}.py could not be parsed')
+    return reasons
+
+# Conditional Edge: go straight to the report when the parse left nothing worth analyzing
+def route_after_parse(state: ASTAnalysisState) -> str:
+    return 'build_report' if _unanalyzable(state) else 'analyze_structure'
+
 # Node 2: Structure Analyzer
 def structure_analyzer_node(state: ASTAnalysisState) -> Dict:
     """Analyze structural differences between ASTs"""
@@ -148,34 +264,102 @@ def structure_analyzer_node(state: ASTAnalysisState) -> Dict:
             'analysis_history': [{'role': 'system', 'content': 'Structure analysis failed due to parsing errors'}]
         }
     
-    changes = {
-        'functions': {
-            'added': list(set(modified['functions']) - set(original['functions'])),
-            'removed': list(set(original['functions']) - set(modified['functions'])),
-            'common': list(set(original['functions']) & set(modified['functions']))
-        },
-        'classes': {
-            'added': list(set(modified['classes']) - set(original['classes'])),
-            'removed': list(set(original['classes']) - set(modified['classes'])),
-            'common': list(set(original['classes']) & set(modified['classes']))
-        },
-        'imports': {
-            'added': list(set(modified['imports']) - set(original['imports'])),
-            'removed': list(set(original['imports']) - set(modified['imports'])),
-            'common': list(set(original['imports']) & set(modified['imports']))
-        },
-        'complexity_delta': {
-            metric: modified['complexity_metrics'][metric] - original['complexity_metrics'][metric]
-            for metric in original['complexity_metrics']
-            if metric in modified['complexity_metrics']
-        }
+    # Reuse the diff if the worker pool already computed it alongside the parse
+    changes = state.get('structural_changes') or diff_features(original, modified)
+    changes_detected = count_changes(changes)
+    symbol_changes = {kind: len(entries) for kind, entries in changes.get('symbols', {}).items() if entries}
+    return {
+        'structural_changes': changes,
+        'analysis_history': [{'role': 'system', 'content': f'Structure analysis completed at {datetime.now().isoformat()}. Changes detected: {changes_detected}. Symbol changes: {symbol_changes}'}]
     }
+
+def _input_bytes(state: ASTAnalysisState) -> int:
+    total = 0
+    for side in ('original', 'modified'):
+        path = state.get(f'{side}_file')
+        try:
+            total += os.path.getsize(path) if path else len(state.get(f'{side}_code') or '')
+        except OSError:
+            pass
+    return total
+
+def _side_source(state: ASTAnalysisState, side: str) -> str:
+    path = state.get(f'{side}_file')
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    return state.get(f'{side}_code') or ''
+
+def _run_side_analysis(state: ASTAnalysisState, fn: Callable[..., Dict], *args, sources: bool = False) -> Dict:
+    """
+    fn(original, modified, *args) for the nodes after parse_ast, with one offload and error policy.
+
+    Each side is passed as a ParsedFile (features and details from the single parse), or as
+    source text with sources=True. Parsed inputs of at least analysis_pool.min_bytes run in the
+    worker pool; sources never do (the benchmark already runs in the sandbox). Any failure comes
+    back as {'error': ...} instead of ending the workflow.
+    """
+    if state.get('original_details') is None or state.get('modified_details') is None:
+        return {'error': 'Both versions must parse first'}
+    try:
+        if sources:
+            return fn(_side_source(state, 'original'), _side_source(state, 'modified'), *args)
+        original = ParsedFile(state['original_ast'], state['original_details'])
+        modified = ParsedFile(state['modified_ast'], state['modified_details'])
+        pool = get_analysis_pool()
+        if pool and _input_bytes(state) >= pool.min_bytes:
+            return pool.run(fn, original, modified, *args)
+        return fn(original, modified, *args)
+    except Exception as e:
+        return {'error': f'{type(e).__name__}: {e}'}
+
+# Node 2b: Clone Detector
+def clone_detection_node(state: ASTAnalysisState) -> Dict:
+    """Similarity scores and duplicated blocks between and within the two versions"""
+    
+    report = _run_side_analysis(state, compare_parsed_clones)
     
-    changes_detected = sum(len(v.get('added', [])) + len(v.get('removed', [])) 
-                          for k, v in changes.items() if isinstance(v, dict) and 'added' in v)
+    summary = 'failed: ' + report['error'] if 'error' in report else f"similarity {report['similarity']}"
     return {
-        'structural_changes': changes,
-        'analysis_history': [{'role': 'system', 'content': f'Structure analysis completed at {datetime.now().isoformat()}. Changes detected: {changes_detected}'}]
+        'clone_report': report,
+        'analysis_history': [{'role': 'system', 'content': f'Clone detection completed at {datetime.now().isoformat()}, {summary}'}]
+    }
+
+# Node 2c: Performance Linter
+def performance_lint_node(state: ASTAnalysisState) -> Dict:
+    """Rule-based performance anti-pattern findings for the modified version"""
+    
+    # Linting ran during the parse; this compares the findings of both versions
+    report = _run_side_analysis(state, compare_parsed_lint)
+    
+    summary = 'failed: ' + report['error'] if 'error' in report else f"{len(report['findings'])} findings, {report['introduced']} introduced"
+    return {
+        'lint_report': report,
+        'analysis_history': [{'role': 'system', 'content': f'Performance lint completed at {datetime.now().isoformat()}, {summary}'}]
+    }
+
+# Node 2d: Diff Model
+def diff_model_node(state: ASTAnalysisState) -> Dict:
+    """Precompute the line mapping, per-symbol changed spans and per-function metric deltas"""
+    
+    model = _run_side_analysis(state, build_parsed_diff_model)
+    
+    summary = 'failed: ' + model['error'] if 'error' in model else f"{len(model['hunks'])} hunks, {len(model['metrics'])} functions with metric changes"
+    return {
+        'diff_model': model,
+        'analysis_history': [{'role': 'system', 'content': f'Diff model built at {datetime.now().isoformat()}, {summary}'}]
+    }
+
+# Node 2e: Runtime Benchmark (benchmark mode only)
+def runtime_benchmark_node(state: ASTAnalysisState) -> Dict:
+    """Time the top-level functions common to both versions in a sandbox"""
+    
+    comparison = _run_side_analysis(state, compare_runtime, state.get('benchmark_inputs'), sources=True)
+    
+    summary = 'failed: ' + comparison['error'] if isinstance(comparison.get('error'), str) else f"{comparison.get('summary')}"
+    return {
+        'runtime_comparison': comparison,
+        'analysis_history': [{'role': 'system', 'content': f'Runtime benchmark completed at {datetime.now().isoformat()}, {summary}'}]
     }
 
 # Node 3: Pattern Extractor
@@ -188,6 +372,10 @@ def pattern_extractor_node(state: ASTAnalysisState) -> Dict:
     functions_added = len(changes.get('functions', {}).get('added', []))
     classes_added = len(changes.get('classes', {}).get('added', []))
     functions_removed = len(changes.get('functions', {}).get('removed', []))
+    symbol_changes = changes.get('symbols', {})
+    clones = state.get('clone_report') or {}
+    big_o = changes.get('function_complexity', {})
+    lint = state.get('lint_report') or {}
     
     complexity_delta = changes.get('complexity_delta', {})
     total_nodes_delta = complexity_delta.get('total_nodes', 0)
@@ -205,12 +393,33 @@ def pattern_extractor_node(state: ASTAnalysisState) -> Dict:
             'function_additions': functions_added,
             'function_removals': functions_removed,
             'complexity_increase': total_nodes_delta,
-            'control_flow_changes': if_statements_delta + loops_delta
+            'control_flow_changes': if_statements_delta + loops_delta,
+            'symbols_modified': len(symbol_changes.get('modified', [])),
+            'symbols_renamed': len(symbol_changes.get('renamed', [])),
+            'symbols_moved': len(symbol_changes.get('moved', [])),
+        },
+        'code_reuse': {
+            'similarity_to_original': clones.get('similarity'),
+            'share_copied_from_original': clones.get('containment'),
+            'renamed_copies': len(clones.get('renamed_copies', [])),
+            'duplicated_functions': len(clones.get('duplicate_functions', [])),
+            'internal_duplicate_blocks': len(clones.get('internal_duplicates', [])),
+        },
+        'performance_antipatterns': {
+            'counts': lint.get('counts', {}),
+            'introduced': lint.get('introduced', 0),
+            'fixed': lint.get('fixed', 0),
+        },
+        'algorithmic_complexity': {
+            'regressions': big_o.get('regressions', []),
+            'improvements': big_o.get('improvements', []),
+            'unchanged_functions': big_o.get('unchanged', 0),
         },
         'quality_indicators': {
             'maintains_structure': len(changes.get('functions', {}).get('common', [])) > 0,
             'adds_features': functions_added > 0,
-            'cleans_code': functions_removed > 0 and total_nodes_delta < 0
+            'cleans_code': functions_removed > 0 and total_nodes_delta < 0,
+            'keeps_algorithmic_complexity': not big_o.get('regressions'),
         }
     }
     
@@ -244,16 +453,47 @@ def learning_insights_node(state: ASTAnalysisState) -> Dict:
         insights['learning_recommendations'].append("Consider code simplification techniques")
     if patterns['common_modifications']['function_additions'] > 2:
         insights['learning_recommendations'].append("Focus on modular design principles")
+    if patterns.get('code_reuse', {}).get('duplicated_functions') or patterns.get('code_reuse', {}).get('internal_duplicate_blocks'):
+        insights['learning_recommendations'].append("Extract duplicated logic into shared functions")
+    for regression in patterns.get('algorithmic_complexity', {}).get('regressions', []):
+        insights['learning_recommendations'].append(
+            f"{regression['function']} went from {regression['original']} to {regression['modified']}: "
+            f"review {'; '.join(regression['reasons'][-2:])}"
+        )
     
     return {
         'learning_summary': insights,
         'analysis_history': [{'role': 'system', 'content': f'Learning insights generated at {datetime.now().isoformat()}. Recommendations: {len(insights["learning_recommendations"])}'}]
     }
 
+SEVERITY_ORDER = {'high': 0, 'medium': 1, 'low': 2}
+
+def _lint_suggestions(findings: List[Dict]) -> List[str]:
+    """The most important findings as suggestion bullets: introduced and high-severity first, one per rule"""
+    limit = get_setting('performance_lint', 'max_suggestions', 3)
+    ranked = sorted(findings, key=lambda f: (not f['introduced'], SEVERITY_ORDER.get(f['severity'], 3), f['line']))
+    suggestions, rules = [], set()
+    for finding in ranked:
+        if finding['rule'] in rules or len(suggestions) >= limit:
+            continue
+        rules.add(finding['rule'])
+        loop = f" (loop at line {finding['loop_line']})" if finding.get('loop_line') else ''
+        suggestions.append(f"Line {finding['line']} ({finding['function']}): {finding['message']}{loop}. {finding['suggestion']}.")
+    return suggestions
+
 # Node 5: Report Builder
 def report_builder_node(state: ASTAnalysisState) -> Dict:
     """Build comprehensive analysis report"""
     
+    # Parse failures leave nothing for the LLM to describe, so it isn't called
+    if state.get('original_ast') is not None or state.get('modified_ast') is not None:
+        reasons = _unanalyzable(state)
+        if reasons:
+            return {
+                'final_report': f"Analysis skipped: {' | '.join(reasons)}. Fix the syntax errors and analyze again.",
+                'analysis_history': [{'role': 'system', 'content': f'Report skipped at {datetime.now().isoformat()}: not enough parseable code'}]
+            }
+    
     # Convert analysis_history messages to serializable format
     serializable_history = []
     for msg in state['analysis_history']:
@@ -272,17 +512,35 @@ def report_builder_node(state: ASTAnalysisState) -> Dict:
             'workflow_version': '1.0'
         },
         'structural_summary': state['structural_changes'],
+        'clone_detection': state.get('clone_report') or {},
+        'performance': {
+            'complexity_delta': state['structural_changes'].get('complexity_delta', {}),
+            'big_o': state['structural_changes'].get('function_complexity', {}),
+            'runtime_comparison': state.get('runtime_comparison') or {},
+            'lint': state.get('lint_report') or {},
+        },
         'pattern_analysis': state['pattern_insights'],
         'learning_insights': state['learning_summary'],
         'recommendations': state['learning_summary']['learning_recommendations'],
         'analysis_chain': serializable_history
     }
+    if state.get('syntax_recovery'):
+        report_data['syntax_recovery'] = state['syntax_recovery']
     
     # Handle case where google_llm is not available
     if structured_llm:
         try:
-            final_prompt = REPORT_BUILDER_SYSTEM_PROMPT + "\n\n" + json.dumps(report_data, indent=2)
-            final_report = structured_llm.invoke(final_prompt)
+            narrative = invoke_with_prefix(REPORT_PREFIX, structured_llm, json.dumps(report_data, indent=2),
+                                           base_llm=google_llm, schema=ReportNarrative).model_dump()
+            # Linter findings go in verbatim, so they don't depend on the LLM picking them up
+            findings = (state.get('lint_report') or {}).get('findings', [])
+            narrative['suggestions'] = narrative['suggestions'] + _lint_suggestions(findings)
+            if state.get('runtime_comparison'):
+                final_report = BenchmarkedReportOutput(
+                    **narrative, performance_findings=findings, runtime_comparison=state['runtime_comparison']
+                )
+            else:
+                final_report = ReportOutput(**narrative, performance_findings=findings)
         except Exception as e:
             final_report = f"LLM report generation failed: {str(e)}\n\nRaw analysis data:\n{json.dumps(report_data, indent=2)}"
     else:
@@ -294,33 +552,115 @@ def report_builder_node(state: ASTAnalysisState) -> Dict:
     }
 
 # Graph Creation
-def create_ast_analysis_workflow() -> StateGraph:
-    """Create the AST analysis workflow graph"""
+@lru_cache(maxsize=None)
+def create_ast_analysis_workflow(skip_parsing: bool = False, benchmark_runtime: bool = False) -> StateGraph:
+    """
+    Create the AST analysis workflow graph.
+
+    With skip_parsing=True the graph starts at pattern extraction, for callers
+    that supply precomputed `structural_changes` (e.g. project-level analysis).
+    With benchmark_runtime=True a sandboxed runtime comparison runs after the performance lint.
+    Compiled graphs are stateless, so each variant is built once per process and reused.
+    """
     
     graph = StateGraph(ASTAnalysisState)
     
     # Add nodes
     graph.add_node('parse_ast', ast_parser_node)
     graph.add_node('analyze_structure', structure_analyzer_node)
+    graph.add_node('detect_clones', clone_detection_node)
+    graph.add_node('lint_performance', performance_lint_node)
+    graph.add_node('build_diff', diff_model_node)
+    if benchmark_runtime:
+        graph.add_node('benchmark_runtime', runtime_benchmark_node)
     graph.add_node('extract_patterns', pattern_extractor_node)
     graph.add_node('generate_insights', learning_insights_node)
     graph.add_node('build_report', report_builder_node)
     
     # Define edges
-    graph.add_edge(START, 'parse_ast')
-    graph.add_edge('parse_ast', 'analyze_structure')
-    graph.add_edge('analyze_structure', 'extract_patterns')
+    graph.add_edge(START, 'extract_patterns' if skip_parsing else 'parse_ast')
+    graph.add_conditional_edges('parse_ast', route_after_parse,
+                                {'analyze_structure': 'analyze_structure', 'build_report': 'build_report'})
+    graph.add_edge('analyze_structure', 'detect_clones')
+    graph.add_edge('detect_clones', 'lint_performance')
+    graph.add_edge('lint_performance', 'build_diff')
+    if benchmark_runtime:
+        graph.add_edge('build_diff', 'benchmark_runtime')
+        graph.add_edge('benchmark_runtime', 'extract_patterns')
+    else:
+        graph.add_edge('build_diff', 'extract_patterns')
     graph.add_edge('extract_patterns', 'generate_insights')
     graph.add_edge('generate_insights', 'build_report')
     graph.add_edge('build_report', END)
     
     return graph.compile()
 
+def _report_cache_key(original_file: str, modified_file: str, benchmark_runtime: bool = False,
+                      benchmark_inputs: Optional[Dict] = None) -> str:
+    key = ReportCache.key_for_files(original_file, modified_file)
+    if benchmark_runtime:
+        # Benchmarked reports carry extra data, and differ per set of inputs
+        key += '_runtime'
+        if benchmark_inputs:
+            key += '_' + content_hash(json.dumps(benchmark_inputs, sort_keys=True))[:16]
+    return key
+
+def load_cached_report(original_file: str, modified_file: str, benchmark_runtime: bool = False,
+                       benchmark_inputs: Optional[Dict] = None):
+    """Return the cached report for a file pair without running the workflow, or None"""
+    if not os.path.exists(original_file) or not os.path.exists(modified_file):
+        return None
+    cached = report_cache.get(_report_cache_key(original_file, modified_file, benchmark_runtime, benchmark_inputs))
+    if cached is None:
+        return None
+    return (BenchmarkedReportOutput if benchmark_runtime else ReportOutput).model_validate(cached)
+
+def _diff_cache_key(original_file: str, modified_file: str) -> str:
+    # One diff per file pair, shared by the plain and benchmarked reports
+    return ReportCache.key_for_files(original_file, modified_file) + '_diff'
+
+def _store_diff_model(cache_key: str, model: Dict):
+    report_cache.put(cache_key, encode_diff_model(model, get_setting('diff_model', 'compress', True)))
+
+def load_cached_diff(original_file: str, modified_file: str, compress: bool = False) -> Optional[Dict]:
+    """
+    The precomputed side-by-side diff model for a file pair (see diff_model.py).
+
+    Served from the report cache; built without the LLM and cached if missing
+    (e.g. evicted). With compress=True it is returned zlib+base64 encoded.
+    """
+    if not os.path.exists(original_file) or not os.path.exists(modified_file):
+        return None
+    cache_key = _diff_cache_key(original_file, modified_file)
+    model = decode_diff_model(report_cache.get(cache_key))
+    if model is None:
+        # One streaming parse per file, as in the workflow
+        original, modified = parse_file(original_file, 'original.py'), parse_file(modified_file, 'modified.py')
+        for side in (original, modified):
+            if side.details is None:
+                return side.features
+        model = build_parsed_diff_model(original, modified)
+        _store_diff_model(cache_key, model)
+    return encode_diff_model(model, compress)
+
 # CLI Integration Function
-def analyze_with_ast_workflow(original_file: str, modified_file: str) -> str:
+def analyze_with_ast_workflow(original_file: str, modified_file: str, force_refresh: bool = False,
+                              benchmark_runtime: bool = False, benchmark_inputs: Optional[Dict] = None,
+                              progress: Optional[Callable[[str], None]] = None) -> str:
     """
     Analyze code differences using AST-based LangGraph workflow
     To be integrated into your agent.py analyze command
+
+    Reports are cached by the content of both files; pass force_refresh=True
+    to rerun the workflow (and the LLM call) anyway. The side-by-side diff
+    model is cached next to the report (see load_cached_diff).
+
+    With benchmark_runtime=True, top-level functions present in both versions
+    are also timed in a sandbox and the report includes their speedups.
+    `benchmark_inputs` maps function names to lists of positional-argument
+    lists; other functions get inputs generated from their signatures.
+
+    `progress`, if given, is called with each workflow node's name as it finishes.
     """
     
     try:
@@ -330,22 +670,33 @@ def analyze_with_ast_workflow(original_file: str, modified_file: str) -> str:
         if not os.path.exists(modified_file):
             return f"Error: Modified file '{modified_file}' does not exist."
         
-        # Load files
-        with open(original_file, 'r', encoding='utf-8') as f:
-            original_code = f.read()
-        with open(modified_file, 'r', encoding='utf-8') as f:
-            modified_code = f.read()
+        # Serve from cache unless a refresh is forced (files are hashed in chunks, not loaded)
+        cache_key = _report_cache_key(original_file, modified_file, benchmark_runtime, benchmark_inputs)
+        if not force_refresh:
+            cached = report_cache.get(cache_key)
+            if cached is not None:
+                return (BenchmarkedReportOutput if benchmark_runtime else ReportOutput).model_validate(cached)
         
         # Initialize workflow
-        workflow = create_ast_analysis_workflow()
+        workflow = create_ast_analysis_workflow(benchmark_runtime=benchmark_runtime)
         
-        # Create initial state
+        # Create initial state; the parser node reads the files itself
         initial_state = ASTAnalysisState(
-            original_code=original_code,
-            modified_code=modified_code,
+            original_file=original_file,
+            modified_file=modified_file,
+            original_code=None,
+            modified_code=None,
             original_ast=None,
             modified_ast=None,
+            original_details=None,
+            modified_details=None,
             structural_changes={},
+            syntax_recovery={},
+            clone_report={},
+            lint_report={},
+            diff_model={},
+            benchmark_inputs=benchmark_inputs,
+            runtime_comparison={},
             pattern_insights={},
             learning_summary={},
             analysis_history=[],
@@ -353,7 +704,21 @@ def analyze_with_ast_workflow(original_file: str, modified_file: str) -> str:
         )
         
         # Run workflow
-        result = workflow.invoke(initial_state)
+        if progress is None:
+            result = workflow.invoke(initial_state)
+        else:
+            for mode, chunk in workflow.stream(initial_state, stream_mode=['updates', 'values']):
+                if mode == 'updates':
+                    for node in chunk:
+                        progress(node)
+                else:
+                    result = chunk
+        
+        # Only structured reports are cached; error strings should be retried
+        if isinstance(result['final_report'], ReportOutput):
+            report_cache.put(cache_key, result['final_report'].model_dump())
+            if 'error' not in result['diff_model']:
+                _store_diff_model(_diff_cache_key(original_file, modified_file), result['diff_model'])
         
         return result['final_report']
         
@@ -361,3 +726,44 @@ def analyze_with_ast_workflow(original_file: str, modified_file: str) -> str:
         return f'Analysis workflow failed: {str(e)}'
 
 
+
+
+def analyze_project_with_ast_workflow(original_path: str, modified_path: str, parallel: bool = True) -> Dict:
+    """
+    Analyze two project trees (directories or zip/tar archives) and build one report
+    from the aggregated per-file structural changes.
+    """
+    try:
+        project = analyze_project(original_path, modified_path, parallel=parallel)
+    except (FileNotFoundError, ValueError) as e:
+        return {'error': str(e)}
+    
+    workflow = create_ast_analysis_workflow(skip_parsing=True)
+    initial_state = ASTAnalysisState(
+        original_file=None,
+        modified_file=None,
+        original_code=None,
+        modified_code=None,
+        original_ast=None,
+        modified_ast=None,
+        original_details=None,
+        modified_details=None,
+        structural_changes=project['structural_changes'],
+        syntax_recovery={},
+        clone_report={},
+        lint_report={},
+        diff_model={},
+        benchmark_inputs=None,
+        runtime_comparison={},
+        pattern_insights={},
+        learning_summary={},
+        analysis_history=[],
+        final_report=None
+    )
+    
+    try:
+        result = workflow.invoke(initial_state)
+        project['final_report'] = result['final_report']
+    except Exception as e:
+        project['final_report'] = f'Analysis workflow failed: {str(e)}'
+    return project
@@ -0,0 +1,453 @@
+# ast_features.py - LLM-free AST feature extraction and diffing shared by the analyzers
+import ast
+import os
+import sys
+import threading
+import tokenize
+from array import array
+from collections import Counter
+import hashlib
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from Difference_Analyzer.complexity_estimator import FunctionComplexity, compare_complexity, estimate_complexity
+
+# Source characters per parse batch when streaming a file (see extract_file_features)
+STREAM_BATCH_CHARS = 256 * 1024
+# Top-level keywords that continue the previous compound statement
+CLAUSE_KEYWORDS = {'else', 'elif', 'except', 'finally'}
+METRIC_NAMES = ('total_nodes', 'function_count', 'class_count', 'if_statements', 'loops')
+FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+# CPython < 3.12 can fail with "AST constructor recursion depth mismatch" when
+# several threads parse at once (API request threads), so parses are serialized
+_PARSE_LOCK = threading.Lock()
+SCOPE_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+
+def parse_source(source: str) -> ast.AST:
+    """Thread-safe ast.parse"""
+    with _PARSE_LOCK:
+        return ast.parse(source)
+
+
+class Symbol(NamedTuple):
+    """One function, method or class, identified by its qualified name"""
+    qualname: str       # e.g. 'Model.__init__' or 'outer.<locals>.inner'
+    kind: str           # 'function', 'async_function' or 'class'
+    signature: str      # unparsed arguments and return annotation (bases for classes)
+    decorators: Tuple[str, ...]
+    lineno: int
+    end_lineno: int
+    body_hash: str      # hash of the body, excluding nested functions/classes
+
+    @property
+    def name(self) -> str:
+        return self.qualname.rsplit('.', 1)[-1]
+
+    @property
+    def parent(self) -> str:
+        return self.qualname.rsplit('.', 1)[0] if '.' in self.qualname else ''
+
+
+def _body_hash(node: ast.AST) -> str:
+    # Nested definitions are symbols of their own, so they don't count as a change here
+    own_body = [stmt for stmt in node.body if not isinstance(stmt, SCOPE_NODES)]
+    dumped = '\n'.join(ast.dump(stmt) for stmt in own_body)
+    return hashlib.blake2b(dumped.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def _signature(node: ast.AST) -> str:
+    if isinstance(node, ast.ClassDef):
+        return ', '.join(ast.unparse(base) for base in node.bases + node.keywords)
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ''
+    return f"({ast.unparse(node.args)}){returns}"
+
+
+def extract_symbols(tree: ast.AST) -> Dict[str, Symbol]:
+    """Qualified-name symbol table, following the `__qualname__` rules for nesting"""
+    symbols = {}
+    
+    def visit(body, prefix: str):
+        for node in body:
+            if isinstance(node, SCOPE_NODES):
+                qualname = sys.intern(f"{prefix}{node.name}")
+                kind = 'class' if isinstance(node, ast.ClassDef) else (
+                    'async_function' if isinstance(node, ast.AsyncFunctionDef) else 'function')
+                symbols[qualname] = Symbol(
+                    qualname, kind, _signature(node),
+                    tuple(ast.unparse(d) for d in node.decorator_list),
+                    node.lineno, getattr(node, 'end_lineno', node.lineno) or node.lineno,
+                    _body_hash(node),
+                )
+                child_prefix = f"{qualname}." if kind == 'class' else f"{qualname}.<locals>."
+                visit(node.body, child_prefix)
+            else:
+                # Definitions inside if/for/try/with blocks keep the enclosing scope
+                for field in ('body', 'orelse', 'finalbody', 'handlers'):
+                    visit(getattr(node, field, None) or [], prefix)
+                for case in getattr(node, 'cases', None) or []:
+                    visit(case.body, prefix)
+    
+    visit(getattr(tree, 'body', []), '')
+    return symbols
+
+
+def diff_symbols(original: Dict[str, Symbol], modified: Dict[str, Symbol]) -> Dict[str, List[Dict]]:
+    """
+    Per-symbol diff keyed by qualified name.
+
+    Symbols present on both sides are `modified` when their body, signature or
+    decorators differ. Leftover removed/added symbols with the same body hash
+    are paired through a hash index (linear in the number of symbols): the
+    same short name in another scope is a `move`, a different name a `rename`.
+    """
+    changes = {'modified': [], 'renamed': [], 'moved': [], 'added': [], 'removed': []}
+    
+    for qualname, before in original.items():
+        after = modified.get(qualname)
+        if after is None:
+            continue
+        changed = [field for field in ('body_hash', 'signature', 'decorators')
+                   if getattr(before, field) != getattr(after, field)]
+        if changed:
+            changes['modified'].append({
+                'symbol': qualname,
+                'kind': after.kind,
+                'changed': [field.replace('_hash', '') for field in changed],
+                'lines': [after.lineno, after.end_lineno],
+            })
+    
+    removed = [sym for name, sym in original.items() if name not in modified]
+    added_index = {}
+    for name, sym in modified.items():
+        if name not in original:
+            added_index.setdefault((sym.kind, sym.body_hash), []).append(sym)
+    
+    for before in removed:
+        candidates = added_index.get((before.kind, before.body_hash))
+        if not candidates:
+            changes['removed'].append({'symbol': before.qualname, 'kind': before.kind})
+            continue
+        # Prefer an exact short-name match (move), then a same-scope rename
+        match = next((c for c in candidates if c.name == before.name), None) \
+            or next((c for c in candidates if c.parent == before.parent), None) \
+            or candidates[0]
+        candidates.remove(match)
+        bucket = 'moved' if match.name == before.name else 'renamed'
+        changes[bucket].append({
+            'from': before.qualname,
+            'to': match.qualname,
+            'kind': match.kind,
+            'lines': [match.lineno, match.end_lineno],
+        })
+    
+    for candidates in added_index.values():
+        for sym in candidates:
+            changes['added'].append({'symbol': sym.qualname, 'kind': sym.kind})
+    return changes
+
+
+def _features_from_tree(tree: ast.AST) -> Dict:
+    """Collect symbols and complexity metrics in a single walk over the tree"""
+    functions, classes, imports, variables = [], [], [], []
+    metrics = {'total_nodes': 0, 'function_count': 0, 'class_count': 0, 'if_statements': 0, 'loops': 0}
+    
+    for node in ast.walk(tree):
+        metrics['total_nodes'] += 1
+        if isinstance(node, FUNCTION_NODES):
+            functions.append(node.name)
+            metrics['function_count'] += 1
+        elif isinstance(node, ast.ClassDef):
+            classes.append(node.name)
+            metrics['class_count'] += 1
+        elif isinstance(node, ast.If):
+            metrics['if_statements'] += 1
+        elif isinstance(node, (ast.For, ast.While)):
+            metrics['loops'] += 1
+        elif isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Store):
+                variables.append(node.id)
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.append(alias.name)
+        elif isinstance(node, ast.ImportFrom):
+            module = node.module or ""
+            for alias in node.names:
+                imports.append(f"{module}.{alias.name}" if module else alias.name)
+    
+    return {
+        'functions': functions,
+        'classes': classes,
+        'imports': imports,
+        'variables': variables,
+        'complexity_metrics': metrics,
+        'symbols': extract_symbols(tree),
+        'function_complexity': estimate_complexity(tree),
+    }
+
+
+def extract_features(code: str, filename: str, collectors=()) -> Optional[Dict]:
+    """
+    Parse source code and extract the features compared by the analyzers.
+    Each collector's `add(tree, source)` sees the parsed tree (see extract_file_features).
+    """
+    try:
+        tree = parse_source(code)
+        for collector in collectors:
+            collector.add(tree, code)
+        return _features_from_tree(tree)
+    except SyntaxError as e:
+        return {'error': f'Syntax error in {filename}: {str(e)}'}
+    except Exception as e:
+        return {'error': f'Parse error in {filename}: {str(e)}'}
+
+
+def _symbol_table(names) -> Tuple[str, ...]:
+    """Deduplicated, sorted tuple of interned names"""
+    return tuple(sorted({sys.intern(name) for name in names}))
+
+
+def _sorted_diff(original: Tuple[str, ...], modified: Tuple[str, ...]) -> Dict[str, List[str]]:
+    """Added/removed/common between two sorted symbol tables in one linear merge"""
+    added, removed, common = [], [], []
+    i = j = 0
+    while i < len(original) and j < len(modified):
+        a, b = original[i], modified[j]
+        if a == b:
+            common.append(a)
+            i += 1
+            j += 1
+        elif a < b:
+            removed.append(a)
+            i += 1
+        else:
+            added.append(b)
+            j += 1
+    removed.extend(original[i:])
+    added.extend(modified[j:])
+    return {'added': added, 'removed': removed, 'common': common}
+
+
+class FileFeatures:
+    """
+    Compact features of one parsed file.
+
+    Symbols are kept as deduplicated, sorted tuples of interned strings,
+    assigned variable names as a Counter, and metrics in a fixed-order array.
+    Diffs are a linear merge of the sorted tables, so no sets are rebuilt.
+    Supports dict-style reads (`features['functions']`) for older callers.
+    """
+    __slots__ = ('functions', 'classes', 'imports', 'variables', 'metrics', 'symbols', 'complexity')
+
+    def __init__(self, functions=(), classes=(), imports=(), variables=(), metrics: Optional[Dict] = None,
+                 symbols: Optional[Dict[str, Symbol]] = None, complexity: Optional[Dict[str, FunctionComplexity]] = None):
+        self.functions = _symbol_table(functions)
+        self.classes = _symbol_table(classes)
+        self.imports = _symbol_table(imports)
+        self.variables = variables if isinstance(variables, Counter) else Counter(sys.intern(v) for v in variables)
+        self.metrics = array('q', ((metrics or {}).get(name, 0) for name in METRIC_NAMES))
+        self.symbols = symbols or {}
+        self.complexity = complexity or {}
+
+    @classmethod
+    def from_features(cls, features: Optional[Dict]):
+        """Build from an extract_features dict; error dicts and None pass through unchanged"""
+        if not isinstance(features, dict) or 'error' in features:
+            return features
+        return cls(features['functions'], features['classes'], features['imports'],
+                   features['variables'], features['complexity_metrics'], features.get('symbols'),
+                   features.get('function_complexity'))
+
+    def __getstate__(self):
+        # Plain tuples and bytes keep the pickle small when crossing process boundaries
+        return (self.functions, self.classes, self.imports, dict(self.variables),
+                self.metrics.tobytes(), tuple(tuple(sym) for sym in self.symbols.values()),
+                tuple(tuple(est) for est in self.complexity.values()))
+
+    def __setstate__(self, state):
+        functions, classes, imports, variables, metrics, symbols, complexity = state
+        # Unpickled strings are not interned, so intern them again on arrival
+        self.functions = tuple(map(sys.intern, functions))
+        self.classes = tuple(map(sys.intern, classes))
+        self.imports = tuple(map(sys.intern, imports))
+        self.variables = Counter({sys.intern(name): count for name, count in variables.items()})
+        self.metrics = array('q')
+        self.metrics.frombytes(metrics)
+        self.symbols = {sys.intern(sym[0]): Symbol(*sym) for sym in symbols}
+        self.complexity = {sys.intern(est[0]): FunctionComplexity(*est) for est in complexity}
+
+    @property
+    def complexity_metrics(self) -> Dict[str, int]:
+        return dict(zip(METRIC_NAMES, self.metrics))
+
+    def __getitem__(self, key: str):
+        if key == 'complexity_metrics':
+            return self.complexity_metrics
+        if key in ('functions', 'classes', 'imports'):
+            return list(getattr(self, key))
+        if key == 'variables':
+            return list(self.variables.elements())
+        if key == 'symbols':
+            return self.symbols
+        if key == 'function_complexity':
+            return self.complexity
+        raise KeyError(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in ('functions', 'classes', 'imports', 'variables', 'complexity_metrics', 'symbols',
+                       'function_complexity')
+
+    def diff(self, modified: 'FileFeatures') -> Dict:
+        """Same result shape as diff_features, with sorted symbol lists"""
+        symbols = diff_symbols(self.symbols, modified.symbols)
+        return {
+            'functions': _sorted_diff(self.functions, modified.functions),
+            'classes': _sorted_diff(self.classes, modified.classes),
+            'imports': _sorted_diff(self.imports, modified.imports),
+            'complexity_delta': {
+                name: after - before for name, before, after in zip(METRIC_NAMES, self.metrics, modified.metrics)
+            },
+            'symbols': symbols,
+            'function_complexity': compare_complexity(
+                self.complexity, modified.complexity, symbols['renamed'] + symbols['moved']
+            ),
+        }
+
+    def to_dict(self) -> Dict:
+        """JSON-friendly summary (variables reduced to a unique count)"""
+        return {
+            'functions': list(self.functions),
+            'classes': list(self.classes),
+            'imports': list(self.imports),
+            'unique_variables': len(self.variables),
+            'complexity_metrics': self.complexity_metrics,
+            'symbols': {name: sym._asdict() for name, sym in self.symbols.items()},
+            'function_complexity': {name: est.label for name, est in self.complexity.items()},
+        }
+
+
+def iter_source_batches(readline, batch_chars: int = STREAM_BATCH_CHARS) -> Iterator[str]:
+    """
+    Split a module read through `readline` into batches of whole top-level statements.
+
+    Statement boundaries come from the token stream, so strings, brackets,
+    decorators and else/except clauses never get cut apart. Each batch is at
+    least `batch_chars` long (except the last) and parses as its own module.
+    """
+    lines, start, pending = [], 0, 0  # `start` is the 0-based line index of the pending batch
+
+    def tracked_readline():
+        nonlocal pending
+        line = readline()
+        if line:
+            lines.append(line)
+            pending += len(line)
+        return line
+
+    depth, at_statement_start, after_decorator = 0, True, False
+    for tok in tokenize.generate_tokens(tracked_readline):
+        if tok.type in (tokenize.NL, tokenize.COMMENT):
+            continue
+        if tok.type == tokenize.INDENT:
+            depth += 1
+        elif tok.type == tokenize.DEDENT:
+            depth -= 1
+        elif tok.type == tokenize.NEWLINE:
+            at_statement_start = True
+        elif tok.type == tokenize.ENDMARKER:
+            break
+        elif at_statement_start:
+            at_statement_start = False
+            if depth == 0 and tok.string not in CLAUSE_KEYWORDS and not after_decorator and pending >= batch_chars:
+                boundary = tok.start[0] - 1 - start
+                yield ''.join(lines[:boundary])
+                del lines[:boundary]
+                start += boundary
+                pending = sum(len(line) for line in lines)
+            if depth == 0:
+                after_decorator = tok.string == '@'
+    if lines:
+        yield ''.join(lines)
+
+
+def iter_file_trees(path: str, batch_chars: int = STREAM_BATCH_CHARS) -> Iterator[Tuple[ast.Module, str]]:
+    """
+    (tree, source) per batch of a file (see iter_source_batches), with line
+    numbers relative to the whole file. Small files are one batch. Read and
+    syntax errors (SyntaxError, tokenize.TokenError) propagate.
+    """
+    if os.path.getsize(path) <= batch_chars:
+        # Small files fit in one batch; skip the tokenizer pass
+        with open(path, 'r', encoding='utf-8') as f:
+            source = f.read()
+        yield parse_source(source), source
+        return
+    line_offset = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for source in iter_source_batches(f.readline, batch_chars):
+            tree = parse_source(source)
+            # Report line numbers relative to the whole file, not the batch
+            ast.increment_lineno(tree, line_offset)
+            line_offset += source.count('\n')
+            yield tree, source
+
+
+def extract_file_features(path: str, filename: Optional[str] = None,
+                          batch_chars: int = STREAM_BATCH_CHARS, collectors=()):
+    """
+    Parse a file and return its compact features without holding the whole source
+    or its full AST in memory: top-level statements are parsed in batches and the
+    per-batch features are merged.
+
+    Anything else derived from the parse goes through `collectors`: objects
+    whose `add(tree, source)` is called once per batch, in file order, so other
+    analyses share this single pass instead of reading and parsing the file again.
+    If the batched parse fails, each collector's `reset()` is called and the
+    whole file is parsed once, through the same collectors, so their results
+    are never left partial.
+    """
+    filename = filename or os.path.basename(path)
+    functions, classes, imports, variables = set(), set(), set(), Counter()
+    metrics, symbols, complexity, batches = {}, {}, {}, 0
+    try:
+        for tree, source in iter_file_trees(path, batch_chars):
+            for collector in collectors:
+                collector.add(tree, source)
+            features = _features_from_tree(tree)
+            del source, tree
+            batches += 1
+            symbols.update(features['symbols'])
+            complexity.update(features['function_complexity'])
+            functions.update(features['functions'])
+            classes.update(features['classes'])
+            imports.update(features['imports'])
+            variables.update(features['variables'])
+            for metric, value in features['complexity_metrics'].items():
+                metrics[metric] = metrics.get(metric, 0) + value
+    except (SyntaxError, tokenize.TokenError, ValueError, RecursionError):
+        # Let a whole-file parse produce the usual error message, or the full result if it succeeds
+        for collector in collectors:
+            collector.reset()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return FileFeatures.from_features(extract_features(f.read(), filename, collectors))
+        except (IOError, UnicodeDecodeError) as e:
+            return {'error': f'Could not read {filename}: {str(e)}'}
+    except (IOError, UnicodeDecodeError) as e:
+        return {'error': f'Could not read {filename}: {str(e)}'}
+    
+    if batches == 0:
+        return FileFeatures.from_features(extract_features('', filename, collectors))
+    # Every batch contributes its own Module node; count one like a whole-file parse
+    metrics['total_nodes'] -= batches - 1
+    return FileFeatures(functions, classes, imports, variables, metrics, symbols, complexity)
+
+
+def diff_features(original, modified) -> Dict:
+    """Compute added/removed/common symbols and metric deltas between two feature sets (dicts or FileFeatures)"""
+    return FileFeatures.from_features(original).diff(FileFeatures.from_features(modified))
+
+
+def count_changes(changes: Dict) -> int:
+    """Number of added + removed names in a diff_features result"""
+    return sum(len(changes.get(k, {}).get('added', [])) + len(changes.get(k, {}).get('removed', []))
+               for k in ('functions', 'classes', 'imports'))
@@ -0,0 +1,402 @@
+# clone_detector.py - Clone detection over normalized AST token streams
+import ast
+import hashlib
+import os
+import random
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import tokenize
+import zlib
+from array import array
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Config import get_setting, resolve_path
+from Storage.shared_state import abandon_connection, reconnect_after_fork
+from Difference_Analyzer.ast_features import iter_file_trees, parse_source
+
+# Winnowing: every run of WINDOW consecutive K_GRAM hashes contributes at least
+# one fingerprint, so any shared run of WINDOW + K_GRAM - 1 tokens is detected
+K_GRAM = 12
+WINDOW = 8
+# Functions shorter than this (in normalized tokens) are too generic to call clones
+MIN_FUNCTION_TOKENS = 24
+# Matched fingerprints closer than this many lines are merged into one block
+BLOCK_GAP_LINES = 3
+MIN_BLOCK_LINES = 3
+MAX_REPORTED_BLOCKS = 20
+
+# MinHash / LSH: 16 bands of 4 rows puts the 50% match-probability point near Jaccard 0.5
+NUM_PERM = 64
+LSH_BANDS = 16
+_MERSENNE = (1 << 61) - 1
+_BASE = 1000003
+_rng = random.Random(20240611)  # fixed seed: signatures are persisted across processes
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE)) for _ in range(NUM_PERM)]
+
+_token_ids: Dict[str, int] = {}
+
+
+def _token_id(label: str) -> int:
+    # crc32 is stable across processes, unlike hash() on str
+    token = _token_ids.get(label)
+    if token is None:
+        token = _token_ids[label] = zlib.crc32(label.encode('utf-8')) + 1
+    return token
+
+
+def _label(node: ast.AST) -> str:
+    # Identifiers, attribute names and literal values are dropped, so renaming
+    # variables or changing constants leaves the token stream unchanged
+    if isinstance(node, ast.Constant):
+        return f"Constant:{type(node.value).__name__}"
+    return type(node).__name__
+
+
+def normalized_tokens(tree: ast.AST) -> Tuple[array, array, list]:
+    """
+    Pre-order token stream of an AST.
+
+    Returns (token ids, line of each token, function spans) where each span is
+    (name, first line, last line, first token index, end token index).
+    """
+    tokens, lines, functions = array('q'), array('l'), []
+    # (node, inherited line, index of the function whose span ends here)
+    stack = [(tree, 1, None)]
+    while stack:
+        node, line, closes = stack.pop()
+        if closes is not None:
+            functions[closes][4] = len(tokens)
+            continue
+        if isinstance(node, ast.expr_context):
+            continue
+        line = getattr(node, 'lineno', line)
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            functions.append([node.name, line, getattr(node, 'end_lineno', line) or line, len(tokens), None])
+            stack.append((None, line, len(functions) - 1))
+        tokens.append(_token_id(_label(node)))
+        lines.append(line)
+        stack.extend((child, line, None) for child in reversed(list(ast.iter_child_nodes(node))))
+    return tokens, lines, [tuple(f) for f in functions]
+
+
+def winnow(tokens: array, k: int = K_GRAM, window: int = WINDOW) -> List[Tuple[int, int]]:
+    """Winnowed (hash, token position) fingerprints of the k-grams of `tokens`"""
+    if len(tokens) < k:
+        return []
+    high = pow(_BASE, k - 1, _MERSENNE)
+    h = 0
+    for token in tokens[:k]:
+        h = (h * _BASE + token) % _MERSENNE
+    hashes = [h]
+    for i in range(k, len(tokens)):
+        h = ((h - tokens[i - k] * high) * _BASE + tokens[i]) % _MERSENNE
+        hashes.append(h)
+
+    # Rightmost minimum of each window, tracked with a monotonic deque (linear time)
+    fingerprints, candidates, last = [], deque(), -1
+    for i, value in enumerate(hashes):
+        while candidates and hashes[candidates[-1]] >= value:
+            candidates.pop()
+        candidates.append(i)
+        if candidates[0] <= i - window:
+            candidates.popleft()
+        if i >= window - 1 or i == len(hashes) - 1:
+            chosen = candidates[0]
+            if chosen != last:
+                fingerprints.append((hashes[chosen], chosen))
+                last = chosen
+    return fingerprints
+
+
+class CodeFingerprint:
+    """Winnowed fingerprints of one source file plus normalized hashes of its functions"""
+    __slots__ = ('hashes', 'starts', 'ends', 'functions')
+
+    def __init__(self, tokens: array, lines: array, spans: list):
+        self.hashes, self.starts, self.ends = array('q'), array('l'), array('l')
+        for value, position in winnow(tokens):
+            self.hashes.append(value)
+            self.starts.append(lines[position])
+            self.ends.append(max(lines[position:position + K_GRAM]))
+        self.functions = [
+            (name, first, last, hashlib.blake2b(tokens[begin:end].tobytes(), digest_size=8).hexdigest())
+            for name, first, last, begin, end in spans
+            if end - begin >= MIN_FUNCTION_TOKENS
+        ]
+
+    @classmethod
+    def from_tree(cls, tree: ast.AST) -> 'CodeFingerprint':
+        return cls(*normalized_tokens(tree))
+
+    @property
+    def hash_set(self) -> set:
+        return set(self.hashes)
+
+
+class FingerprintCollector:
+    """
+    Builds one file's CodeFingerprint from the batches of a streaming parse
+    (an `extract_file_features` collector).
+
+    Only the compact token and line arrays are kept between batches. The
+    Module token of every batch after the first is dropped, so the stream,
+    and therefore the fingerprint, is the same as for a whole-file parse.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Drop what was collected so far, before extract_file_features replays a failed stream as one parse"""
+        self.tokens, self.lines, self.spans = array('q'), array('l'), []
+
+    def add(self, tree: ast.AST, source: str = ''):
+        tokens, lines, spans = normalized_tokens(tree)
+        skip = 1 if len(self.tokens) else 0
+        offset = len(self.tokens) - skip
+        self.tokens.extend(tokens[skip:])
+        self.lines.extend(lines[skip:])
+        self.spans.extend((name, first, last, begin + offset, end + offset) for name, first, last, begin, end in spans)
+
+    def result(self) -> CodeFingerprint:
+        return CodeFingerprint(self.tokens, self.lines, self.spans)
+
+
+def fingerprint_code(code: str):
+    """CodeFingerprint of a source string, or an error dict if it doesn't parse"""
+    try:
+        return CodeFingerprint.from_tree(parse_source(code))
+    except SyntaxError as e:
+        return {'error': f"Syntax error: {e}"}
+
+
+def fingerprint_file(path: str):
+    """CodeFingerprint of a file, parsed in streaming batches; an error dict if it can't be read or parsed"""
+    collector = FingerprintCollector()
+    try:
+        for tree, source in iter_file_trees(path):
+            collector.add(tree, source)
+    except (OSError, UnicodeDecodeError) as e:
+        return {'error': f"Could not read {path}: {e}"}
+    except (SyntaxError, tokenize.TokenError) as e:
+        return {'error': f"Syntax error: {e}"}
+    return collector.result()
+
+
+def _merge_blocks(pairs: Iterable[Tuple[int, int, int, int]]) -> List[Dict]:
+    """Merge matched (a_start, a_end, b_start, b_end) line ranges into contiguous blocks"""
+    blocks = []
+    for a_start, a_end, b_start, b_end in sorted(pairs, key=lambda p: (p[2] - p[0], p[0])):
+        last = blocks[-1] if blocks else None
+        # Same alignment (line offset) and adjacent on both sides: extend the block
+        if (last and b_start - a_start == last[2] - last[0]
+                and a_start <= last[1] + BLOCK_GAP_LINES and b_start <= last[3] + BLOCK_GAP_LINES):
+            last[1], last[3] = max(last[1], a_end), max(last[3], b_end)
+            last[4] += 1
+        else:
+            blocks.append([a_start, a_end, b_start, b_end, 1])
+    blocks = [b for b in blocks if b[1] - b[0] + 1 >= MIN_BLOCK_LINES]
+    blocks.sort(key=lambda b: b[1] - b[0], reverse=True)
+    return blocks[:MAX_REPORTED_BLOCKS]
+
+
+def _first_positions(fingerprint: CodeFingerprint) -> Dict[int, int]:
+    index = {}
+    for i, value in enumerate(fingerprint.hashes):
+        index.setdefault(value, i)
+    return index
+
+
+def duplicated_blocks(original: CodeFingerprint, modified: CodeFingerprint) -> List[Dict]:
+    """Line ranges of `modified` that reproduce a block of `original`"""
+    index = _first_positions(original)
+    pairs = []
+    for j, value in enumerate(modified.hashes):
+        i = index.get(value)
+        if i is not None:
+            pairs.append((original.starts[i], original.ends[i], modified.starts[j], modified.ends[j]))
+    return [
+        {'original_lines': [a0, a1], 'modified_lines': [b0, b1], 'matched_fingerprints': n}
+        for a0, a1, b0, b1, n in _merge_blocks(pairs)
+    ]
+
+
+def internal_duplicates(fingerprint: CodeFingerprint) -> List[Dict]:
+    """Blocks repeated within one file (each later copy paired with the first)"""
+    index, pairs = {}, []
+    for j, value in enumerate(fingerprint.hashes):
+        i = index.setdefault(value, j)
+        # Overlapping k-grams of one repetitive block are not a copy of themselves
+        if i != j and fingerprint.starts[j] > fingerprint.ends[i]:
+            pairs.append((fingerprint.starts[i], fingerprint.ends[i], fingerprint.starts[j], fingerprint.ends[j]))
+    return [
+        {'first_lines': [a0, a1], 'copy_lines': [b0, b1], 'matched_fingerprints': n}
+        for a0, a1, b0, b1, n in _merge_blocks(pairs)
+    ]
+
+
+def function_clones(original: CodeFingerprint, modified: CodeFingerprint) -> Dict[str, List]:
+    """Functions whose normalized bodies are identical: renamed copies across versions, duplicates within `modified`"""
+    original_by_hash = {}
+    for name, first, last, digest in original.functions:
+        original_by_hash.setdefault(digest, (name, first, last))
+
+    renamed_copies, duplicates = [], {}
+    for name, first, last, digest in modified.functions:
+        source = original_by_hash.get(digest)
+        if source and source[0] != name:
+            renamed_copies.append({'original': source[0], 'modified': name,
+                                   'original_lines': list(source[1:]), 'modified_lines': [first, last]})
+        duplicates.setdefault(digest, []).append({'function': name, 'lines': [first, last]})
+    return {
+        'renamed_copies': renamed_copies,
+        'duplicate_functions': [group for group in duplicates.values() if len(group) > 1],
+    }
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def compare_fingerprints(original: CodeFingerprint, modified: CodeFingerprint) -> Dict:
+    """Similarity scores and duplicated code between two versions"""
+    a, b = original.hash_set, modified.hash_set
+    return {
+        'similarity': round(jaccard(a, b), 4),
+        # Share of the modified version that was taken from the original
+        'containment': round(len(a & b) / len(b), 4) if b else 1.0,
+        'duplicated_blocks': duplicated_blocks(original, modified),
+        'internal_duplicates': internal_duplicates(modified),
+        **function_clones(original, modified),
+    }
+
+
+def compare_code(original_code: str, modified_code: str) -> Dict:
+    original = fingerprint_code(original_code)
+    if isinstance(original, dict):
+        return original
+    modified = fingerprint_code(modified_code)
+    if isinstance(modified, dict):
+        return modified
+    return compare_fingerprints(original, modified)
+
+
+def minhash_signature(hashes: Iterable[int]) -> Tuple[int, ...]:
+    """MinHash signature of a fingerprint set; equal slots estimate Jaccard similarity"""
+    values = set(hashes)
+    if not values:
+        return (_MERSENNE,) * NUM_PERM
+    return tuple(min((a * v + b) % _MERSENNE for v in values) for a, b in _PERMUTATIONS)
+
+
+def _band_keys(signature: Tuple[int, ...]) -> List[Tuple[int, int]]:
+    rows = NUM_PERM // LSH_BANDS
+    keys = []
+    for band in range(LSH_BANDS):
+        chunk = struct.pack(f'<{rows}Q', *signature[band * rows:(band + 1) * rows])
+        keys.append((band, int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), 'little', signed=True)))
+    return keys
+
+
+class CloneIndex:
+    """
+    SQLite-backed MinHash/LSH index of submissions, one entry per session.
+
+    A query only looks at sessions that share at least one LSH band bucket
+    (an indexed lookup per band), then ranks those candidates by estimated
+    Jaccard similarity, so lookups don't scan every stored session.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or resolve_path(get_setting('files', 'clone_index', 'Generated/clone_index.sqlite'))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS signatures (
+                    session_id TEXT PRIMARY KEY,
+                    signature BLOB NOT NULL,
+                    fingerprints INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(signatures)")]
+            if 'content_hash' not in columns:
+                # Indexes created before content_hash: those rows just get re-indexed on their next report
+                self.conn.execute("ALTER TABLE signatures ADD COLUMN content_hash TEXT")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (band INTEGER, bucket INTEGER, session_id TEXT)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (band, bucket)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS buckets_session ON buckets (session_id)")
+        reconnect_after_fork(self)
+
+    def _reconnect(self):
+        # Forked API workers each need their own connection
+        abandon_connection(self.conn)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+
+    def is_indexed(self, session_id: str, content_hash: str) -> bool:
+        """Whether the session is already indexed with this exact submission (so fingerprinting can be skipped)"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM signatures WHERE session_id = ? AND content_hash = ?", (session_id, content_hash)
+            ).fetchone()
+        return row is not None
+
+    def add(self, session_id: str, fingerprint: CodeFingerprint, content_hash: Optional[str] = None):
+        """Index (or re-index) a session's submission; `content_hash` lets is_indexed recognize it later"""
+        signature = minhash_signature(fingerprint.hashes)
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM buckets WHERE session_id = ?", (session_id,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO signatures (session_id, signature, fingerprints, updated_at, content_hash) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_id, struct.pack(f'<{NUM_PERM}Q', *signature), len(fingerprint.hashes), time.time(),
+                 content_hash),
+            )
+            self.conn.executemany(
+                "INSERT INTO buckets VALUES (?, ?, ?)",
+                [(band, bucket, session_id) for band, bucket in _band_keys(signature)],
+            )
+
+    def remove(self, session_id: str):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM buckets WHERE session_id = ?", (session_id,))
+            self.conn.execute("DELETE FROM signatures WHERE session_id = ?", (session_id,))
+
+    def query(self, fingerprint: CodeFingerprint, top_k: int = 5, min_similarity: float = 0.3,
+              exclude: Optional[str] = None) -> List[Dict]:
+        """Stored sessions most similar to `fingerprint`, best first"""
+        signature = minhash_signature(fingerprint.hashes)
+        keys = _band_keys(signature)
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT session_id, signature FROM signatures WHERE session_id IN "
+                "(SELECT session_id FROM buckets WHERE "
+                + " OR ".join("(band = ? AND bucket = ?)" for _ in keys) + ")",
+                [value for key in keys for value in key],
+            ).fetchall()
+
+        matches = []
+        for session_id, blob in rows:
+            if session_id == exclude:
+                continue
+            stored = struct.unpack(f'<{NUM_PERM}Q', blob)
+            estimate = sum(x == y for x, y in zip(signature, stored)) / NUM_PERM
+            if estimate >= min_similarity:
+                matches.append({'session_id': session_id, 'estimated_similarity': round(estimate, 4)})
+        matches.sort(key=lambda m: m['estimated_similarity'], reverse=True)
+        return matches[:top_k]
@@ -0,0 +1,300 @@
+# complexity_estimator.py - static Big-O estimates for functions, from loop nesting, recursion and costly calls
+import ast
+import sys
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+SCOPE_NODES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+# Calls that walk their whole (non-constant) argument
+LINEAR_BUILTINS = {'sum', 'min', 'max', 'any', 'all', 'list', 'tuple', 'set', 'dict', 'reversed', 'enumerate', 'zip'}
+# Methods that scan or shift the receiver, whatever its type (list or str)
+LINEAR_METHODS = {'index', 'count', 'remove', 'copy', 'join', 'extend'}
+MEMO_DECORATORS = {'lru_cache', 'cache', 'functools.lru_cache', 'functools.cache'}
+HALVING_NAMES = {'mid', 'middle', 'half', 'pivot'}
+MAX_REASONS = 4
+
+
+class Cost(NamedTuple):
+    """O(2^n) if exponential, else O(n^degree log^log n); tuples order by growth"""
+    exponential: bool = False
+    degree: int = 0
+    log: int = 0
+
+    def __add__(self, other: 'Cost') -> 'Cost':
+        return Cost(self.exponential or other.exponential, self.degree + other.degree, self.log + other.log)
+
+    @property
+    def label(self) -> str:
+        if self.exponential:
+            return 'O(2^n)'
+        parts = []
+        if self.degree:
+            parts.append('n' if self.degree == 1 else f'n^{self.degree}')
+        if self.log:
+            parts.append('log n' if self.log == 1 else f'log^{self.log} n')
+        return f"O({' '.join(parts) or '1'})"
+
+
+CONSTANT, LINEAR, LOG, N_LOG_N = Cost(), Cost(degree=1), Cost(log=1), Cost(degree=1, log=1)
+
+
+class FunctionComplexity(NamedTuple):
+    qualname: str
+    label: str
+    cost: Tuple[bool, int, int]
+    lineno: int
+    reasons: Tuple[str, ...]   # the loops/calls behind the estimate, outermost first
+
+
+def _is_constant(node: Optional[ast.AST]) -> bool:
+    if node is None:
+        return False
+    if isinstance(node, ast.UnaryOp):
+        return _is_constant(node.operand)
+    return isinstance(node, ast.Constant)
+
+
+def _call_name(node: ast.Call) -> str:
+    func = node.func
+    if isinstance(func, ast.Name):
+        return func.id
+    if isinstance(func, ast.Attribute):
+        return func.attr
+    return ''
+
+
+class _FunctionEstimator:
+    """Worst path cost through one function body; nested functions and classes are estimated separately"""
+
+    def __init__(self, node: ast.AST, method_of: Optional[str]):
+        self.node = node
+        self.name = node.name
+        self.method_of = method_of
+        self.list_names, self.str_names = self._classify_names()
+        self.best = (CONSTANT, ())
+        self.self_calls, self.self_calls_in_loops, self.halving_recursion = 0, 0, False
+
+    def _own_nodes(self, roots):
+        stack = list(roots)
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(child for child in ast.iter_child_nodes(node) if not isinstance(child, SCOPE_NODES))
+
+    def _classify_names(self):
+        lists, strings = set(), set()
+        args = self.node.args
+        for arg in args.posonlyargs + args.args + args.kwonlyargs:
+            annotation = ast.unparse(arg.annotation) if arg.annotation else ''
+            if annotation.split('[')[0] in ('list', 'List'):
+                lists.add(arg.arg)
+            elif annotation == 'str':
+                strings.add(arg.arg)
+        for node in self._own_nodes(self.node.body):
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                value, target = node.value, node.targets[0].id
+                if isinstance(value, (ast.List, ast.ListComp)) or (
+                        isinstance(value, ast.Call) and _call_name(value) in ('list', 'sorted', 'split')):
+                    lists.add(target)
+                elif (isinstance(value, ast.Constant) and isinstance(value.value, str)) or isinstance(value, ast.JoinedStr):
+                    strings.add(target)
+        return lists, strings
+
+    def _record(self, cost: Cost, path: Tuple[str, ...]):
+        if cost > self.best[0]:
+            self.best = (cost, path)
+
+    # Loop factors
+
+    def _iteration_cost(self, iterable: ast.AST) -> Cost:
+        if isinstance(iterable, (ast.Tuple, ast.List, ast.Set)) and all(_is_constant(e) for e in iterable.elts):
+            return CONSTANT
+        if isinstance(iterable, ast.Call) and _call_name(iterable) == 'range' and all(map(_is_constant, iterable.args)):
+            return CONSTANT
+        return LINEAR
+
+    def _halves(self, body) -> bool:
+        for node in self._own_nodes(body):
+            if isinstance(node, ast.AugAssign) and isinstance(node.op, (ast.FloorDiv, ast.RShift, ast.Div, ast.Mult, ast.LShift)) \
+                    and _is_constant(node.value):
+                return True
+            if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.FloorDiv, ast.RShift)) and _is_constant(node.right):
+                return True
+        return False
+
+    # Operations
+
+    def _operation_cost(self, node: ast.AST) -> Tuple[Cost, str]:
+        line = getattr(node, 'lineno', '?')
+        if isinstance(node, ast.Compare):
+            for op, right in zip(node.ops, node.comparators):
+                if isinstance(op, (ast.In, ast.NotIn)) and (
+                        (isinstance(right, ast.Name) and right.id in self.list_names)
+                        or isinstance(right, ast.ListComp)
+                        or (isinstance(right, ast.List) and not all(_is_constant(e) for e in right.elts))):
+                    return LINEAR, f"line {line}: `in` on a list"
+        elif isinstance(node, ast.Call):
+            name = _call_name(node)
+            if isinstance(node.func, ast.Attribute):
+                if name == 'sort':
+                    return N_LOG_N, f"line {line}: sort"
+                if name in LINEAR_METHODS:
+                    return LINEAR, f"line {line}: .{name}()"
+                if name in ('insert', 'pop') and node.args and _is_constant(node.args[0]) \
+                        and getattr(node.args[0], 'value', None) == 0:
+                    return LINEAR, f"line {line}: .{name}(0) shifts every element"
+            elif name == 'sorted':
+                return N_LOG_N, f"line {line}: sorted()"
+            elif name in LINEAR_BUILTINS and node.args and not all(map(_is_constant, node.args)) \
+                    and not (isinstance(node.args[0], ast.Call) and _call_name(node.args[0]) == 'range'):
+                return LINEAR, f"line {line}: {name}() over a collection"
+        elif isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Slice):
+            s = node.slice
+            bounded = (s.lower is None or _is_constant(s.lower)) and _is_constant(s.upper) and s.step is None
+            from_end = _is_constant(s.lower) and s.upper is None and isinstance(s.lower, ast.UnaryOp)
+            if not (bounded or from_end):
+                return LINEAR, f"line {line}: slice copy"
+        elif isinstance(node, ast.AugAssign) and isinstance(node.op, ast.Add) and isinstance(node.target, ast.Name):
+            value = node.value
+            if node.target.id in self.str_names or isinstance(value, ast.JoinedStr) or (
+                    isinstance(value, ast.Constant) and isinstance(value.value, str)):
+                return LINEAR, f"line {line}: string concatenation"
+        return CONSTANT, ''
+
+    def _is_self_call(self, node: ast.AST) -> bool:
+        if not isinstance(node, ast.Call):
+            return False
+        func = node.func
+        if isinstance(func, ast.Name):
+            return func.id == self.name and self.method_of is None
+        return isinstance(func, ast.Attribute) and func.attr == self.name and \
+            isinstance(func.value, ast.Name) and func.value.id in ('self', 'cls') and self.method_of is not None
+
+    # Traversal
+
+    def visit(self, node: ast.AST, factor: Cost, path: Tuple[str, ...], in_loop: bool):
+        line = getattr(node, 'lineno', '?')
+        if isinstance(node, (ast.For, ast.AsyncFor)):
+            self.visit(node.iter, factor, path, in_loop)
+            own = self._iteration_cost(node.iter)
+            inner_path = path + (f"line {line}: loop over {ast.unparse(node.iter)[:40]}",) if own != CONSTANT else path
+            for child in node.body + node.orelse:
+                self.visit(child, factor + own, inner_path, in_loop or own != CONSTANT)
+            self._record(factor + own, inner_path)
+            return
+        if isinstance(node, ast.While):
+            self.visit(node.test, factor, path, in_loop)
+            own = LOG if self._halves(node.body) else LINEAR
+            kind = 'halving loop' if own == LOG else 'while loop'
+            inner_path = path + (f"line {line}: {kind}",)
+            for child in node.body + node.orelse:
+                self.visit(child, factor + own, inner_path, True)
+            self._record(factor + own, inner_path)
+            return
+        if isinstance(node, COMPREHENSIONS):
+            own, inner_path = CONSTANT, path
+            for generator in node.generators:
+                self.visit(generator.iter, factor + own, inner_path, in_loop or own != CONSTANT)
+                step = self._iteration_cost(generator.iter)
+                if step != CONSTANT:
+                    own = own + step
+                    inner_path = inner_path + (f"line {line}: comprehension over {ast.unparse(generator.iter)[:40]}",)
+                for condition in generator.ifs:
+                    self.visit(condition, factor + own, inner_path, in_loop or own != CONSTANT)
+            elements = [node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]
+            for element in elements:
+                self.visit(element, factor + own, inner_path, in_loop or own != CONSTANT)
+            self._record(factor + own, inner_path)
+            return
+        if isinstance(node, SCOPE_NODES):
+            return
+        if self._is_self_call(node):
+            self.self_calls += 1
+            self.self_calls_in_loops += in_loop
+            if any(self._halving_argument(arg) for arg in node.args):
+                self.halving_recursion = True
+        cost, reason = self._operation_cost(node)
+        if reason:
+            self._record(factor + cost, path + (reason,))
+        for child in ast.iter_child_nodes(node):
+            self.visit(child, factor, path, in_loop)
+
+    def _halving_argument(self, arg: ast.AST) -> bool:
+        for node in ast.walk(arg):
+            if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.FloorDiv, ast.RShift, ast.Div)):
+                return True
+            if isinstance(node, ast.Name) and node.id in HALVING_NAMES:
+                return True
+        return False
+
+    def estimate(self) -> Tuple[Cost, Tuple[str, ...]]:
+        for stmt in self.node.body:
+            self.visit(stmt, CONSTANT, (), False)
+        cost, path = self.best
+        if not self.self_calls:
+            return cost, path
+        memoized = any(ast.unparse(d).split('(')[0] in MEMO_DECORATORS for d in self.node.decorator_list)
+        line = self.node.lineno
+        if memoized:
+            return cost + LINEAR, (f"line {line}: memoized recursion",) + path
+        if self.self_calls_in_loops or self.self_calls >= 2:
+            if self.halving_recursion and not self.self_calls_in_loops:
+                # Divide and conquer: log n levels, each doing the per-call work over the whole input
+                if cost.degree >= 1:
+                    return cost + LOG, (f"line {line}: divide-and-conquer recursion",) + path
+                return LINEAR, (f"line {line}: divide-and-conquer recursion",)
+            return Cost(exponential=True), (f"line {line}: {self.self_calls} recursive calls per invocation",) + path
+        if self.halving_recursion:
+            return cost + LOG, (f"line {line}: recursion on half the input",) + path
+        return cost + LINEAR, (f"line {line}: linear recursion",) + path
+
+
+def estimate_complexity(tree: ast.AST) -> Dict[str, FunctionComplexity]:
+    """Big-O estimate for every function and method, keyed by qualified name (as in extract_symbols)"""
+    estimates = {}
+
+    def visit(body, prefix: str, class_name: Optional[str]):
+        for node in body:
+            if isinstance(node, ast.ClassDef):
+                visit(node.body, f"{prefix}{node.name}.", node.name)
+            elif isinstance(node, FUNCTION_NODES):
+                qualname = sys.intern(f"{prefix}{node.name}")
+                cost, reasons = _FunctionEstimator(node, class_name).estimate()
+                estimates[qualname] = FunctionComplexity(
+                    qualname, cost.label, tuple(cost), node.lineno, tuple(reasons[:MAX_REASONS])
+                )
+                visit(node.body, f"{qualname}.<locals>.", None)
+            else:
+                for field in ('body', 'orelse', 'finalbody', 'handlers'):
+                    visit(getattr(node, field, None) or [], prefix, class_name)
+                for case in getattr(node, 'cases', None) or []:
+                    visit(case.body, prefix, class_name)
+
+    visit(getattr(tree, 'body', []), '', None)
+    return estimates
+
+
+def compare_complexity(original: Dict[str, FunctionComplexity], modified: Dict[str, FunctionComplexity],
+                       renamed: Optional[List[Dict]] = None) -> Dict:
+    """
+    Complexity changes for functions present in both versions (matched by
+    qualified name, or through the symbol diff's renames/moves).
+    """
+    pairs = [(name, name) for name in original if name in modified]
+    pairs += [(r['from'], r['to']) for r in renamed or [] if r['from'] in original and r['to'] in modified]
+    result = {'regressions': [], 'improvements': [], 'unchanged': 0}
+    for before_name, after_name in pairs:
+        before, after = original[before_name], modified[after_name]
+        if tuple(before.cost) == tuple(after.cost):
+            result['unchanged'] += 1
+            continue
+        entry = {
+            'function': after_name if before_name == after_name else f"{before_name} -> {after_name}",
+            'original': before.label,
+            'modified': after.label,
+            'lines': after.lineno,
+            'reasons': list(after.reasons if tuple(after.cost) > tuple(before.cost) else before.reasons),
+        }
+        result['regressions' if tuple(after.cost) > tuple(before.cost) else 'improvements'].append(entry)
+    return result
@@ -0,0 +1,255 @@
+# diff_model.py - precomputed side-by-side diff payload (line mapping, per-symbol spans, per-function metric deltas)
+import ast
+import base64
+import difflib
+import hashlib
+import json
+import os
+import sys
+import zlib
+from array import array
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Difference_Analyzer.ast_features import (FUNCTION_NODES, SCOPE_NODES, FileFeatures, diff_symbols, extract_features,
+                                              extract_symbols)
+from Config import get_setting
+
+DIFF_MODEL_VERSION = 1
+# Opcode tags, shortened: equal, replace, delete, insert
+TAGS = {'equal': 'e', 'replace': 'r', 'delete': 'd', 'insert': 'i'}
+BRANCH_NODES = (ast.If, ast.IfExp, ast.For, ast.AsyncFor, ast.While, ast.ExceptHandler, ast.BoolOp, ast.comprehension)
+BLOCK_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try)
+COMPRESSED_ENCODING = 'zlib+base64'
+
+
+def hash_lines(lines: Iterable[str]) -> array:
+    """
+    One 64-bit hash per line. blake2b rather than hash(), so hashes from a
+    worker process compare equal to those computed in the API process.
+    """
+    return array('q', (int.from_bytes(hashlib.blake2b(line.encode('utf-8', 'surrogatepass'), digest_size=8).digest(),
+                                      'little', signed=True) for line in lines))
+
+
+def line_mapping(original_lines: List, modified_lines: List) -> List[List]:
+    """
+    difflib opcodes as compact [tag, i1, i2, j1, j2] rows (0-based, end-exclusive).
+    Lines can be given as text or as hash_lines() hashes.
+
+    Equal rows map original lines to modified lines one to one, so together
+    the rows align both sides for a side-by-side view. Lines that make up more
+    than 1% of a long file (blank lines, `return`, closing brackets) are junk
+    to the matcher: they never anchor a match, which keeps it near-linear on
+    ordinary code.
+    """
+    matcher = difflib.SequenceMatcher(None, original_lines, modified_lines)
+    return [[TAGS[tag], i1, i2, j1, j2] for tag, i1, i2, j1, j2 in matcher.get_opcodes()]
+
+
+def _changed_lines(hunks: List[List], side: int) -> List[Tuple[int, int]]:
+    """1-based inclusive line ranges touched by non-equal hunks on one side (0 = original, 1 = modified)"""
+    ranges = []
+    for tag, i1, i2, j1, j2 in hunks:
+        start, end = (i1, i2) if side == 0 else (j1, j2)
+        if tag != 'e' and end > start:
+            ranges.append((start + 1, end))
+    return ranges
+
+
+def _spans_within(ranges: List[Tuple[int, int]], start: int, end: int) -> List[List[int]]:
+    return [[max(a, start), min(b, end)] for a, b in ranges if a <= end and b >= start]
+
+
+def _own_nodes(node: ast.AST):
+    """Nodes in a function's body, not descending into nested functions or classes"""
+    stack = list(ast.iter_child_nodes(node))
+    while stack:
+        child = stack.pop()
+        yield child
+        if not isinstance(child, SCOPE_NODES + (ast.Lambda,)):
+            stack.extend(ast.iter_child_nodes(child))
+
+
+def _nesting(body, depth: int = 0) -> int:
+    deepest = depth
+    for stmt in body:
+        if isinstance(stmt, BLOCK_NODES):
+            for field in ('body', 'orelse', 'finalbody'):
+                deepest = max(deepest, _nesting(getattr(stmt, field, None) or [], depth + 1))
+            for handler in getattr(stmt, 'handlers', None) or []:
+                deepest = max(deepest, _nesting(handler.body, depth + 1))
+    return deepest
+
+
+def function_metrics(tree: ast.AST) -> Dict[str, Dict]:
+    """lines, branches, max nesting and parameter count per function, keyed by qualified name"""
+    symbols = extract_symbols(tree)
+    nodes = {}
+
+    def visit(body, prefix: str):
+        for node in body:
+            if isinstance(node, SCOPE_NODES):
+                qualname = f"{prefix}{node.name}"
+                if isinstance(node, FUNCTION_NODES):
+                    nodes[qualname] = node
+                visit(node.body, f"{qualname}." if isinstance(node, ast.ClassDef) else f"{qualname}.<locals>.")
+            else:
+                for field in ('body', 'orelse', 'finalbody', 'handlers'):
+                    visit(getattr(node, field, None) or [], prefix)
+                for case in getattr(node, 'cases', None) or []:
+                    visit(case.body, prefix)
+
+    visit(getattr(tree, 'body', []), '')
+    metrics = {}
+    for qualname, node in nodes.items():
+        args = node.args
+        symbol = symbols[qualname]
+        metrics[qualname] = {
+            'lines': symbol.end_lineno - symbol.lineno + 1,
+            'branches': sum(isinstance(child, BRANCH_NODES) for child in _own_nodes(node)),
+            'nesting': _nesting(node.body),
+            'params': len(args.posonlyargs) + len(args.args) + len(args.kwonlyargs)
+                      + (args.vararg is not None) + (args.kwarg is not None),
+        }
+    return metrics
+
+
+def _symbol_entries(original_symbols: Dict, modified_symbols: Dict, hunks: List[List]) -> Tuple[List[Dict], Dict[str, str]]:
+    """Per-symbol status, line ranges on each side and changed spans; also modified -> original name pairs"""
+    changes = diff_symbols(original_symbols, modified_symbols)
+    original_ranges, modified_ranges = _changed_lines(hunks, 0), _changed_lines(hunks, 1)
+    counterpart = {name: name for name in modified_symbols if name in original_symbols}
+    status = {name: 'unchanged' for name in counterpart}
+    for entry in changes['modified']:
+        status[entry['symbol']] = 'modified'
+    for bucket in ('renamed', 'moved'):
+        for entry in changes[bucket]:
+            counterpart[entry['to']] = entry['from']
+            status[entry['to']] = bucket
+    for entry in changes['added']:
+        status[entry['symbol']] = 'added'
+
+    entries = []
+    for name, after in modified_symbols.items():
+        before = original_symbols.get(counterpart.get(name, ''))
+        entry = {'symbol': name, 'kind': after.kind, 'status': status.get(name, 'added'),
+                 'modified': [after.lineno, after.end_lineno]}
+        if before is not None:
+            entry['original'] = [before.lineno, before.end_lineno]
+            if counterpart[name] != name:
+                entry['from'] = counterpart[name]
+        spans = {}
+        if before is not None:
+            spans['original'] = _spans_within(original_ranges, before.lineno, before.end_lineno)
+        spans['modified'] = _spans_within(modified_ranges, after.lineno, after.end_lineno)
+        entry['changed_lines'] = {side: ranges for side, ranges in spans.items() if ranges}
+        entries.append(entry)
+    for entry in changes['removed']:
+        before = original_symbols[entry['symbol']]
+        entries.append({'symbol': before.qualname, 'kind': before.kind, 'status': 'removed',
+                        'original': [before.lineno, before.end_lineno],
+                        'changed_lines': {'original': [[before.lineno, before.end_lineno]]}})
+    return entries, counterpart
+
+
+class DiffInputs(NamedTuple):
+    """What the diff model needs from one file beyond its FileFeatures"""
+    line_hashes: array  # hash_lines() of every source line
+    function_metrics: Dict[str, Dict]
+
+
+class DiffInputCollector:
+    """Line hashes and per-function metrics from the batches of a streaming parse (an `extract_file_features` collector)"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Drop what was collected so far, before extract_file_features replays a failed stream as one parse"""
+        self.line_hashes, self.function_metrics = array('q'), {}
+
+    def add(self, tree: ast.AST, source: str):
+        # Batches end on a line break, so per-batch splitlines() adds up to the whole file's
+        self.line_hashes.extend(hash_lines(source.splitlines()))
+        self.function_metrics.update(function_metrics(tree))
+
+    def result(self) -> DiffInputs:
+        return DiffInputs(self.line_hashes, self.function_metrics)
+
+
+def _metric_deltas(original: FileFeatures, modified: FileFeatures, original_inputs: DiffInputs,
+                   modified_inputs: DiffInputs, counterpart: Dict[str, str]) -> Dict[str, Dict]:
+    """Only the metrics that changed, as [before, after], for functions present in both versions"""
+    before_metrics, after_metrics = original_inputs.function_metrics, modified_inputs.function_metrics
+    before_big_o, after_big_o = original.complexity, modified.complexity
+    deltas = {}
+    for name, original_name in counterpart.items():
+        before, after = before_metrics.get(original_name), after_metrics.get(name)
+        if before is None or after is None:
+            continue
+        changed = {metric: [before[metric], after[metric]] for metric in after if before[metric] != after[metric]}
+        if original_name in before_big_o and name in after_big_o:
+            labels = [before_big_o[original_name].label, after_big_o[name].label]
+            if labels[0] != labels[1]:
+                changed['big_o'] = labels
+        if changed:
+            deltas[name] = changed
+    return deltas
+
+
+def diff_model_from_parse(original: FileFeatures, modified: FileFeatures,
+                          original_inputs: DiffInputs, modified_inputs: DiffInputs) -> Dict:
+    """
+    Side-by-side diff of two versions, precomputed so clients only render it.
+
+    Built from what the parse already produced (symbols and Big-O from the
+    FileFeatures, line hashes and function metrics from DiffInputCollector),
+    so neither file is read or parsed again. `hunks` maps lines between the
+    versions (see line_mapping); `symbols` gives each function/class its
+    status, line range on both sides and the changed line spans inside it;
+    `metrics` holds per-function metric deltas. Line numbers in `symbols` and
+    `metrics` are 1-based. Source text is not included: clients already hold
+    both files. Above `diff_model.max_lines` lines on either side the line
+    mapping is not computed: `hunks` is empty and `truncated` is set.
+    """
+    original_lines, modified_lines = original_inputs.line_hashes, modified_inputs.line_hashes
+    truncated = max(len(original_lines), len(modified_lines)) > get_setting('diff_model', 'max_lines', 20000)
+    hunks = [] if truncated else line_mapping(original_lines, modified_lines)
+    symbols, counterpart = _symbol_entries(original.symbols, modified.symbols, hunks)
+    return {
+        'version': DIFF_MODEL_VERSION,
+        'lines': [len(original_lines), len(modified_lines)],
+        'truncated': truncated,
+        'hunks': hunks,
+        'symbols': symbols,
+        'metrics': _metric_deltas(original, modified, original_inputs, modified_inputs, counterpart),
+    }
+
+
+def build_diff_model(original_code: str, modified_code: str) -> Dict:
+    """diff_model_from_parse for two source strings, or an error dict if either doesn't parse"""
+    sides = []
+    for code, filename in ((original_code, 'original.py'), (modified_code, 'modified.py')):
+        collector = DiffInputCollector()
+        features = FileFeatures.from_features(extract_features(code, filename, [collector]))
+        if not isinstance(features, FileFeatures):
+            return features
+        sides.append((features, collector.result()))
+    (original, original_inputs), (modified, modified_inputs) = sides
+    return diff_model_from_parse(original, modified, original_inputs, modified_inputs)
+
+
+def encode_diff_model(model: Dict, compress: bool = False) -> Dict:
+    """The model as is, or wrapped as {'encoding': 'zlib+base64', 'data': ...} when compressed"""
+    if not compress:
+        return model
+    raw = json.dumps(model, separators=(',', ':')).encode('utf-8')
+    return {'encoding': COMPRESSED_ENCODING, 'data': base64.b64encode(zlib.compress(raw, 6)).decode('ascii')}
+
+
+def decode_diff_model(payload: Optional[Dict]) -> Optional[Dict]:
+    if payload is None or payload.get('encoding') != COMPRESSED_ENCODING:
+        return payload
+    return json.loads(zlib.decompress(base64.b64decode(payload['data'])))
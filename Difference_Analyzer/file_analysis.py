@@ -0,0 +1,61 @@
+# file_analysis.py - one parse per file for everything the analysis workflow compares
+import os
+import sys
+from typing import Any, Dict, List, NamedTuple, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Difference_Analyzer.ast_features import FileFeatures, extract_features, extract_file_features
+from Difference_Analyzer.clone_detector import CodeFingerprint, FingerprintCollector, compare_fingerprints
+from Difference_Analyzer.diff_model import DiffInputCollector, DiffInputs, diff_model_from_parse
+from Difference_Analyzer.perf_linter import Finding, LintCollector, compare_findings
+
+
+class FileDetails(NamedTuple):
+    """What the analysis nodes after the parse need from one file, collected during that parse"""
+    fingerprint: CodeFingerprint
+    findings: List[Finding]
+    diff_inputs: DiffInputs
+
+
+class ParsedFile(NamedTuple):
+    features: Any  # FileFeatures, or an error dict when the file doesn't parse
+    details: Optional[FileDetails]  # None when the file doesn't parse
+
+
+def _collectors() -> list:
+    # One per FileDetails field, in field order
+    return [FingerprintCollector(), LintCollector(), DiffInputCollector()]
+
+
+def _parsed(features, collectors) -> ParsedFile:
+    if not isinstance(features, FileFeatures):
+        return ParsedFile(features, None)
+    return ParsedFile(features, FileDetails(*(collector.result() for collector in collectors)))
+
+
+def parse_file(path: str, filename: Optional[str] = None) -> ParsedFile:
+    """Features and details of a file from one streaming, bounded-memory pass (see extract_file_features)"""
+    collectors = _collectors()
+    return _parsed(extract_file_features(path, filename, collectors=collectors), collectors)
+
+
+def parse_code(code: str, filename: str) -> ParsedFile:
+    """Features and details of an in-memory source string"""
+    collectors = _collectors()
+    return _parsed(FileFeatures.from_features(extract_features(code or '', filename, collectors)), collectors)
+
+
+# Analyses over two parsed versions; module-level so the analysis pool can run them in a worker
+
+def compare_parsed_clones(original: ParsedFile, modified: ParsedFile) -> Dict:
+    return compare_fingerprints(original.details.fingerprint, modified.details.fingerprint)
+
+
+def compare_parsed_lint(original: ParsedFile, modified: ParsedFile) -> Dict:
+    return compare_findings(original.details.findings, modified.details.findings)
+
+
+def build_parsed_diff_model(original: ParsedFile, modified: ParsedFile) -> Dict:
+    return diff_model_from_parse(original.features, modified.features,
+                                 original.details.diff_inputs, modified.details.diff_inputs)
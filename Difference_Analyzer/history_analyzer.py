@@ -0,0 +1,303 @@
+# history_analyzer.py - Code evolution analysis over a git commit range
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Difference_Analyzer.ast_features import FileFeatures, METRIC_NAMES, extract_features
+from Config import get_setting, resolve_path
+
+EMPTY_BLOB = '0' * 40
+METRICS = METRIC_NAMES
+
+
+class BlobReader:
+    """Streams blob contents out of a single long-lived `git cat-file --batch` process"""
+
+    def __init__(self, repo_path: str):
+        self.process = subprocess.Popen(
+            ['git', '-C', repo_path, 'cat-file', '--batch'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+
+    def read(self, sha: str) -> Optional[str]:
+        self.process.stdin.write(f"{sha}\n".encode())
+        self.process.stdin.flush()
+        header = self.process.stdout.readline().decode().split()
+        if len(header) < 3 or header[1] == 'missing':
+            return None
+        size = int(header[2])
+        data = self.process.stdout.read(size)
+        self.process.stdout.read(1)  # trailing newline
+        return data.decode('utf-8', errors='replace')
+
+    def close(self):
+        if self.process.poll() is None:
+            self.process.stdin.close()
+            self.process.wait()
+
+
+class FeatureCache:
+    """Bounded LRU of per-blob feature summaries, so identical blobs are parsed once"""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, sha: str, reader: BlobReader):
+        if sha in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(sha)
+            return self.entries[sha]
+        self.misses += 1
+        source = reader.read(sha)
+        # FileFeatures keeps interned, deduplicated symbols; the source is dropped
+        features = FileFeatures.from_features(extract_features(source, sha)) if source is not None else None
+        self.entries[sha] = features
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return features
+
+
+def _git(repo_path: str, *args: str) -> str:
+    return subprocess.run(
+        ['git', '-C', repo_path, *args], check=True, capture_output=True, text=True
+    ).stdout
+
+
+def _iter_lines(repo_path: str, *args: str) -> Iterator[str]:
+    """
+    Stream git output line by line instead of buffering it (rev-list over 10k+ commits).
+    Raises CalledProcessError, with git's stderr, if git fails; stopping early is not a failure.
+    """
+    # stderr goes to a file: a pipe nobody reads while stdout streams could fill up and block git
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(['git', '-C', repo_path, *args], stdout=subprocess.PIPE, stderr=errors, text=True)
+        try:
+            for line in process.stdout:
+                yield line.rstrip('\n')
+        finally:
+            process.stdout.close()
+            process.wait()
+        if process.returncode:
+            errors.seek(0)
+            raise subprocess.CalledProcessError(process.returncode, process.args,
+                                                stderr=errors.read().decode('utf-8', 'replace'))
+
+
+def _python_blobs_at(repo_path: str, commit: str) -> Dict[str, str]:
+    """Map path -> blob sha for every .py file in a commit's tree"""
+    blobs = {}
+    for line in _iter_lines(repo_path, 'ls-tree', '-r', '--end-of-options', commit):
+        meta, path = line.split('\t', 1)
+        _, kind, sha = meta.split()
+        if kind == 'blob' and path.endswith('.py'):
+            blobs[path] = sha
+    return blobs
+
+
+def _changed_python_files(repo_path: str, commit: str, parent: Optional[str]) -> List[Tuple[str, str, Optional[str], str]]:
+    """(old_sha, new_sha, old_path, new_path) for each .py file changed by a commit vs its first parent"""
+    if parent:
+        output = _git(repo_path, 'diff-tree', '-r', '-M', '--no-commit-id', '-z', parent, commit)
+    else:
+        output = _git(repo_path, 'diff-tree', '-r', '--root', '--no-commit-id', '-z', commit)
+    fields = output.split('\0')
+    changes, i = [], 0
+    while i < len(fields) - 1:
+        meta = fields[i].split()
+        if not meta:
+            i += 1
+            continue
+        old_sha, new_sha, status = meta[2], meta[3], meta[4]
+        if status[0] in 'RC':
+            old_path, new_path = fields[i + 1], fields[i + 2]
+            i += 3
+        else:
+            old_path = new_path = fields[i + 1]
+            i += 2
+        if old_path.endswith('.py') or new_path.endswith('.py'):
+            changes.append((old_sha, new_sha, old_path if status[0] != 'A' else None, new_path if status[0] != 'D' else None))
+    return changes
+
+
+def _empty_features() -> FileFeatures:
+    return FileFeatures()
+
+
+def _default_paths(repo_path: str) -> Tuple[str, str]:
+    base = os.path.join(resolve_path(get_setting('directories', 'generated', 'Generated')), 'history')
+    name = os.path.basename(os.path.abspath(repo_path)) or 'repo'
+    return os.path.join(base, f"{name}.jsonl"), os.path.join(base, f"{name}.state.json")
+
+
+def _load_state(state_file: str) -> Optional[Dict]:
+    if os.path.exists(state_file):
+        try:
+            with open(state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError):
+            return None
+    return None
+
+
+def _written_commits(output_file: str) -> set:
+    """Commits that already have a row in `output_file`, so reprocessing a range doesn't duplicate them"""
+    if not os.path.exists(output_file):
+        return set()
+    written = set()
+    with open(output_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                written.add(json.loads(line)['commit'])
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue  # a line cut short by an interrupted run
+    return written
+
+
+def seed_file_metrics(repo_path: str, commit: str) -> Dict[str, Dict]:
+    """Complexity metrics of every .py file in a commit's tree (the baseline for a range)"""
+    file_metrics = {}
+    reader = BlobReader(repo_path)
+    try:
+        for path, sha in _python_blobs_at(repo_path, commit).items():
+            features = extract_features(reader.read(sha) or '', path)
+            if 'error' not in features:
+                file_metrics[path] = features['complexity_metrics']
+    finally:
+        reader.close()
+    return file_metrics
+
+
+def iter_history_metrics(repo_path: str, rev_range: str = 'HEAD',
+                         file_metrics: Optional[Dict[str, Dict]] = None,
+                         cache_size: int = 4096) -> Iterator[Dict]:
+    """
+    Yield one metrics row per commit in `rev_range` (oldest first, first-parent only).
+
+    Only the files each commit changes are parsed, and parsed blobs are shared
+    through a bounded cache, so memory stays proportional to the number of
+    Python files in the tree rather than the number of commits. `file_metrics`
+    (path -> complexity metrics) is updated in place and can seed a resumed run.
+    """
+    if file_metrics is None:
+        file_metrics = {}
+    totals = {m: sum(metrics.get(m, 0) for metrics in file_metrics.values()) for m in METRICS}
+    cache = FeatureCache(cache_size)
+    reader = BlobReader(repo_path)
+    try:
+        for line in _iter_lines(repo_path, 'rev-list', '--reverse', '--first-parent',
+                                '--format=%H%x09%ct%x09%P%x09%an', '--end-of-options', rev_range):
+            if line.startswith('commit '):
+                continue
+            commit, timestamp, parents, author = line.split('\t', 3)
+            parent = parents.split()[0] if parents else None
+            row = {
+                'commit': commit,
+                'timestamp': datetime.fromtimestamp(int(timestamp)).isoformat(),
+                'author': author,
+                'files_changed': 0,
+                'parse_errors': 0,
+                'functions_added': 0,
+                'functions_removed': 0,
+                'classes_added': 0,
+                'classes_removed': 0,
+            }
+            for old_sha, new_sha, old_path, new_path in _changed_python_files(repo_path, commit, parent):
+                old = cache.get(old_sha, reader) if old_path and old_sha != EMPTY_BLOB else _empty_features()
+                new = cache.get(new_sha, reader) if new_path and new_sha != EMPTY_BLOB else _empty_features()
+                row['files_changed'] += 1
+                if not isinstance(old, FileFeatures) or not isinstance(new, FileFeatures):
+                    row['parse_errors'] += 1
+                    # Keep previous metrics for a file that temporarily fails to parse
+                    if new_path and old_path and old_path != new_path and old_path in file_metrics:
+                        file_metrics[new_path] = file_metrics.pop(old_path)
+                    continue
+                changes = old.diff(new)
+                row['functions_added'] += len(changes['functions']['added'])
+                row['functions_removed'] += len(changes['functions']['removed'])
+                row['classes_added'] += len(changes['classes']['added'])
+                row['classes_removed'] += len(changes['classes']['removed'])
+
+                previous = file_metrics.pop(old_path, None) if old_path else None
+                for metric in METRICS:
+                    totals[metric] += new.complexity_metrics[metric] - (previous or {}).get(metric, 0)
+                if new_path:
+                    file_metrics[new_path] = new.complexity_metrics
+
+            row['python_files'] = len(file_metrics)
+            row.update(totals)
+            row['cache_hits'], row['cache_misses'] = cache.hits, cache.misses
+            yield row
+    finally:
+        reader.close()
+
+
+def analyze_git_history(repo_path: str, rev_range: Optional[str] = None, output_file: Optional[str] = None,
+                        state_file: Optional[str] = None, cache_size: int = 4096) -> Dict:
+    """
+    Write a per-commit time series of complexity and structural metrics to JSONL.
+
+    Runs incrementally: the last processed commit and per-file metrics are kept
+    in `state_file`, and a later call without `rev_range` only processes commits
+    added since then. Commits that already have a row in `output_file` (e.g.
+    from an explicit range overlapping an earlier run) are not written again.
+    """
+    if not os.path.isdir(repo_path):
+        return {'error': f"Repository '{repo_path}' does not exist."}
+    if rev_range is not None and (not rev_range.strip() or rev_range.startswith('-')):
+        return {'error': f"Invalid commit range {rev_range!r}: expected revisions such as v1.0..HEAD"}
+
+    default_output, default_state = _default_paths(repo_path)
+    output_file = output_file or default_output
+    state_file = state_file or default_state
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    os.makedirs(os.path.dirname(os.path.abspath(state_file)), exist_ok=True)
+
+    state = _load_state(state_file) if rev_range is None else None
+    try:
+        if state:
+            rev_range = f"{state['last_commit']}..HEAD"
+            file_metrics = state['file_metrics']
+        elif rev_range and '..' in rev_range and rev_range.split('..', 1)[0]:
+            file_metrics = seed_file_metrics(repo_path, rev_range.split('..', 1)[0])
+        else:
+            rev_range = rev_range or 'HEAD'
+            file_metrics = {}
+
+        written = _written_commits(output_file)
+        processed, skipped, last_commit = 0, 0, state['last_commit'] if state else None
+        with open(output_file, 'a', encoding='utf-8') as out:
+            for row in iter_history_metrics(repo_path, rev_range, file_metrics=file_metrics, cache_size=cache_size):
+                # Still walked, so the running totals stay right for the rows after it
+                last_commit = row['commit']
+                if last_commit in written:
+                    skipped += 1
+                    continue
+                out.write(json.dumps(row) + '\n')
+                written.add(last_commit)
+                processed += 1
+    except subprocess.CalledProcessError as e:
+        return {'error': f"git failed: {(e.stderr or str(e)).strip()}"}
+
+    if last_commit:
+        with open(state_file, 'w', encoding='utf-8') as f:
+            json.dump({'last_commit': last_commit, 'file_metrics': file_metrics}, f)
+
+    return {
+        'repo': repo_path,
+        'range': rev_range,
+        'processed_commits': processed,
+        'skipped_commits': skipped,
+        'last_commit': last_commit,
+        'output_file': output_file,
+        'state_file': state_file,
+    }
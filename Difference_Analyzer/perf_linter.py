@@ -0,0 +1,334 @@
+# perf_linter.py - rule-based, single-pass linter for common Python performance anti-patterns
+import ast
+import os
+import sys
+from typing import Dict, List, NamedTuple, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Difference_Analyzer.ast_features import parse_source
+
+RULES = {
+    'P001': ('len-in-loop', 'medium', 'Compute len() once before the loop; the collection does not change inside it'),
+    'P002': ('string-concat-in-loop', 'high', "Collect the pieces in a list and ''.join() them after the loop"),
+    'P003': ('range-len-indexing', 'low', 'Iterate over the items directly, or use enumerate() when the index is needed'),
+    'P004': ('list-membership', 'high', 'Use a set (or dict) for membership tests; `in` on a list scans every element'),
+    'P005': ('redundant-copy', 'low', 'Drop the extra copy; iterate or pass the original object'),
+}
+MUTATING_METHODS = {'append', 'extend', 'insert', 'pop', 'remove', 'clear', 'add', 'update', 'discard', 'sort',
+                    'reverse', 'popitem', 'setdefault'}
+COPY_BUILTINS = {'list', 'sorted', 'tuple', 'set'}
+COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+
+class Finding(NamedTuple):
+    rule: str
+    name: str
+    severity: str
+    line: int
+    function: str
+    message: str  # never contains line numbers, see key()
+    suggestion: str
+    loop_line: int = 0  # line of the loop the finding is about (len-in-loop), 0 otherwise
+
+    def key(self):
+        # Identifies "the same" finding across versions: lines shift whenever
+        # code is added above, so only the rule, function and line-free message count
+        return self.rule, self.function, self.message
+
+
+class _LoopFrame:
+    __slots__ = ('line', 'len_calls', 'copies', 'mutated')
+
+    def __init__(self, line: int):
+        self.line = line
+        self.len_calls = {}   # name -> first line of len(name) in this loop
+        self.copies = []      # (name, line, expression) for `for x in list(name)` style iterables
+        self.mutated = set()
+
+
+class PerformanceLinter(ast.NodeVisitor):
+    """
+    One walk over the tree; every rule is checked at the node it concerns.
+
+    Rules that depend on the whole loop body (is the collection mutated?)
+    record candidates in the enclosing loop frame and are resolved when the
+    walk leaves that loop, so no subtree is visited twice.
+    """
+
+    def __init__(self):
+        self.findings: List[Finding] = []
+        self.scopes = [('<module>', set(), set())]   # (qualname, list names, str names)
+        self.loops: List[_LoopFrame] = []
+
+    # Helpers
+
+    def _report(self, rule: str, node: ast.AST, message: str):
+        name, severity, suggestion = RULES[rule]
+        self.findings.append(Finding(rule, name, severity, getattr(node, 'lineno', 0), self.scopes[-1][0],
+                                     message, suggestion))
+
+    def _mark_mutated(self, name: str):
+        if self.loops:
+            self.loops[-1].mutated.add(name)
+
+    def _mark_bound(self, target: ast.AST):
+        for node in ast.walk(target):
+            if isinstance(node, ast.Name):
+                self._mark_mutated(node.id)
+
+    def _enter_loop(self, node: ast.AST) -> _LoopFrame:
+        frame = _LoopFrame(node.lineno)
+        self.loops.append(frame)
+        return frame
+
+    def _exit_loop(self):
+        frame = self.loops.pop()
+        for name, line in frame.len_calls.items():
+            if name not in frame.mutated:
+                self.findings.append(Finding('P001', *RULES['P001'][:2], line, self.scopes[-1][0],
+                                             f"len({name}) is recomputed on every iteration of the enclosing loop",
+                                             RULES['P001'][2], frame.line))
+        for name, line, expression in frame.copies:
+            if name not in frame.mutated:
+                self.findings.append(Finding('P005', *RULES['P005'][:2], line, self.scopes[-1][0],
+                                             f"`{expression}` copies {name} although the loop never modifies it",
+                                             RULES['P005'][2]))
+        # A mutation inside a nested loop also happens inside the enclosing one
+        if self.loops:
+            self.loops[-1].mutated |= frame.mutated
+
+    # Scopes
+
+    def _visit_scope(self, node, qualname: str):
+        outer_loops, self.loops = self.loops, []
+        lists, strings = set(), set()
+        if not isinstance(node, ast.ClassDef):
+            for arg in node.args.posonlyargs + node.args.args + node.args.kwonlyargs:
+                annotation = ast.unparse(arg.annotation) if arg.annotation else ''
+                if annotation.split('[')[0] in ('list', 'List'):
+                    lists.add(arg.arg)
+                elif annotation == 'str':
+                    strings.add(arg.arg)
+        self.scopes.append((qualname, lists, strings))
+        self.generic_visit(node)
+        self.scopes.pop()
+        self.loops = outer_loops
+
+    def _qualname(self, name: str) -> str:
+        parent = self.scopes[-1][0]
+        return name if parent == '<module>' else f"{parent}.{name}"
+
+    def visit_FunctionDef(self, node):
+        self._visit_scope(node, self._qualname(node.name))
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        self._visit_scope(node, self._qualname(node.name))
+
+    # Loops
+
+    def _check_iterable(self, iterable: ast.AST, frame: _LoopFrame):
+        if isinstance(iterable, ast.Call) and isinstance(iterable.func, ast.Name):
+            func, args = iterable.func.id, iterable.args
+            if func == 'range' and len(args) == 1 and isinstance(args[0], ast.Call) \
+                    and isinstance(args[0].func, ast.Name) and args[0].func.id == 'len' and args[0].args:
+                self._report('P003', iterable, f"`for ... in {ast.unparse(iterable)}` indexes the sequence by position")
+            elif func == 'list' and len(args) == 1 and isinstance(args[0], ast.Name):
+                frame.copies.append((args[0].id, iterable.lineno, ast.unparse(iterable)))
+        elif isinstance(iterable, ast.Subscript) and isinstance(iterable.value, ast.Name) \
+                and isinstance(iterable.slice, ast.Slice) and iterable.slice.lower is None \
+                and iterable.slice.upper is None and iterable.slice.step is None:
+            frame.copies.append((iterable.value.id, iterable.lineno, ast.unparse(iterable)))
+        elif isinstance(iterable, ast.Call) and isinstance(iterable.func, ast.Attribute) \
+                and iterable.func.attr == 'copy' and not iterable.args and isinstance(iterable.func.value, ast.Name):
+            frame.copies.append((iterable.func.value.id, iterable.lineno, ast.unparse(iterable)))
+
+    def visit_For(self, node):
+        self.visit(node.iter)
+        frame = self._enter_loop(node)
+        self._check_iterable(node.iter, frame)
+        self._mark_bound(node.target)
+        self.visit(node.target)
+        for stmt in node.body:
+            self.visit(stmt)
+        self._exit_loop()
+        for stmt in node.orelse:
+            self.visit(stmt)
+
+    visit_AsyncFor = visit_For
+
+    def visit_While(self, node):
+        # The condition is evaluated on every iteration, so it belongs to the loop
+        self._enter_loop(node)
+        self.visit(node.test)
+        for stmt in node.body:
+            self.visit(stmt)
+        self._exit_loop()
+        for stmt in node.orelse:
+            self.visit(stmt)
+
+    def _visit_comprehension(self, node):
+        # The first iterable is evaluated once, outside the implicit loop
+        self.visit(node.generators[0].iter)
+        frame = self._enter_loop(node)
+        for index, generator in enumerate(node.generators):
+            if index:
+                self.visit(generator.iter)
+            self._check_iterable(generator.iter, frame)
+            self._mark_bound(generator.target)
+            for condition in generator.ifs:
+                self.visit(condition)
+        for field in ('key', 'value', 'elt'):
+            if getattr(node, field, None) is not None:
+                self.visit(getattr(node, field))
+        self._exit_loop()
+
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = _visit_comprehension
+
+    # Assignments: track list/str names and mutations
+
+    def visit_Assign(self, node):
+        self.visit(node.value)
+        _, lists, strings = self.scopes[-1]
+        for target in node.targets:
+            if isinstance(target, ast.Name):
+                self._mark_mutated(target.id)
+                value = node.value
+                if isinstance(value, ast.BinOp) and isinstance(value.op, ast.Add) and isinstance(value.left, ast.Name) \
+                        and value.left.id == target.id and target.id in strings:
+                    if self.loops:
+                        self._report('P002', node, f"`{target.id} = {target.id} + ...` builds a string by repeated concatenation in a loop")
+                    continue
+                lists.discard(target.id)
+                strings.discard(target.id)
+                if isinstance(value, (ast.List, ast.ListComp)) or (
+                        isinstance(value, ast.Call) and isinstance(value.func, (ast.Name, ast.Attribute))
+                        and getattr(value.func, 'id', getattr(value.func, 'attr', '')) in ('list', 'sorted', 'split')):
+                    lists.add(target.id)
+                elif (isinstance(value, ast.Constant) and isinstance(value.value, str)) or isinstance(value, ast.JoinedStr):
+                    strings.add(target.id)
+            elif isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name):
+                self._mark_mutated(target.value.id)
+                self.visit(target)
+            else:
+                self._mark_bound(target)
+                self.visit(target)
+
+    def visit_AugAssign(self, node):
+        self.visit(node.value)
+        target = node.target
+        if isinstance(target, ast.Name):
+            self._mark_mutated(target.id)
+            value = node.value
+            is_string = target.id in self.scopes[-1][2] or isinstance(value, ast.JoinedStr) or (
+                isinstance(value, ast.Constant) and isinstance(value.value, str))
+            if self.loops and isinstance(node.op, ast.Add) and is_string:
+                self._report('P002', node, f"`{target.id} += ...` builds a string by repeated concatenation in a loop")
+        elif isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name):
+            self._mark_mutated(target.value.id)
+
+    def visit_Delete(self, node):
+        for target in node.targets:
+            if isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name):
+                self._mark_mutated(target.value.id)
+        self.generic_visit(node)
+
+    # Expressions
+
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Name):
+            if func.id == 'len' and len(node.args) == 1 and isinstance(node.args[0], ast.Name) and self.loops:
+                self.loops[-1].len_calls.setdefault(node.args[0].id, node.lineno)
+            elif func.id in COPY_BUILTINS and len(node.args) == 1:
+                inner = node.args[0]
+                if isinstance(inner, ast.Call) and isinstance(inner.func, ast.Name) and inner.func.id in ('list', 'sorted') \
+                        and (func.id, inner.func.id) in (('list', 'sorted'), ('sorted', 'list'), ('list', 'list')):
+                    self._report('P005', node, f"`{ast.unparse(node)[:60]}` copies the data twice")
+                elif func.id == 'list' and isinstance(inner, ast.ListComp):
+                    self._report('P005', node, f"`{ast.unparse(node)[:60]}` copies a list comprehension's result")
+        elif isinstance(func, ast.Attribute) and func.attr in MUTATING_METHODS and isinstance(func.value, ast.Name):
+            self._mark_mutated(func.value.id)
+        self.generic_visit(node)
+
+    def visit_Compare(self, node):
+        lists = self.scopes[-1][1]
+        for op, right in zip(node.ops, node.comparators):
+            if not isinstance(op, (ast.In, ast.NotIn)):
+                continue
+            if isinstance(right, ast.ListComp):
+                self._report('P004', node, f"membership test on a list comprehension `{ast.unparse(right)[:40]}`")
+            elif self.loops and isinstance(right, ast.Name) and right.id in lists:
+                self._report('P004', node, f"`{ast.unparse(node)[:60]}` scans the list {right.id} on every iteration")
+            elif self.loops and isinstance(right, ast.List) and len(right.elts) > 3:
+                self._report('P004', node, f"membership test on a {len(right.elts)}-element list literal inside a loop")
+        self.generic_visit(node)
+
+
+def _sorted(findings) -> List[Finding]:
+    return sorted(findings, key=lambda f: (f.line, f.rule))
+
+
+def lint_tree(tree: ast.AST) -> List[Finding]:
+    linter = PerformanceLinter()
+    linter.visit(tree)
+    return _sorted(linter.findings)
+
+
+class LintCollector:
+    """
+    Lints the batches of a streaming parse (an `extract_file_features`
+    collector). One linter visits every batch, so module-level list and str
+    names carry over from batch to batch as in a whole-file walk.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Drop what was collected so far, before extract_file_features replays a failed stream as one parse"""
+        self.linter = PerformanceLinter()
+
+    def add(self, tree: ast.AST, source: str = ''):
+        self.linter.visit(tree)
+
+    def result(self) -> List[Finding]:
+        return _sorted(self.linter.findings)
+
+
+def lint_code(code: str) -> Dict:
+    """Findings for one source string, or an error dict if it doesn't parse"""
+    try:
+        tree = parse_source(code)
+    except SyntaxError as e:
+        return {'error': f'Cannot lint code that does not parse: {e}'}
+    return {'findings': lint_tree(tree)}
+
+
+def compare_findings(original: List[Finding], modified: List[Finding]) -> Dict:
+    """
+    Findings of the modified version; those absent from the original (same
+    rule, function and message) are marked `introduced`.
+    """
+    existing = {f.key() for f in original}
+    findings = [dict(f._asdict(), introduced=f.key() not in existing) for f in modified]
+    counts = {}
+    for finding in findings:
+        counts[finding['name']] = counts.get(finding['name'], 0) + 1
+    return {
+        'findings': findings,
+        'counts': counts,
+        'introduced': sum(f['introduced'] for f in findings),
+        'fixed': len(existing - {f.key() for f in modified}),
+    }
+
+
+def compare_lint(original_code: Optional[str], modified_code: str) -> Dict:
+    """compare_findings for two source strings; no original means every finding is introduced"""
+    modified = lint_code(modified_code)
+    if 'error' in modified:
+        return modified
+    original = lint_code(original_code) if original_code else {'findings': []}
+    return compare_findings(original.get('findings', []), modified['findings'])
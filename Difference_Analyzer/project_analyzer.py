@@ -0,0 +1,243 @@
+# project_analyzer.py - Whole-project (multi-file) structural diff
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Difference_Analyzer.analysis_pool import get_analysis_pool
+from Difference_Analyzer.ast_features import FileFeatures, extract_file_features, count_changes
+from Storage.report_cache import file_hash
+
+# Minimum line-set similarity for an unmatched removed/added pair to count as a rename
+RENAME_SIMILARITY_THRESHOLD = 0.5
+# Below this many changed files the process pool costs more than it saves
+PARALLEL_MIN_FILES = 8
+SKIPPED_DIRS = {'__pycache__', '.git', '.venv', 'venv', '.tox', '.mypy_cache', '.pytest_cache'}
+
+
+def _is_within(base: str, target: str) -> bool:
+    base = os.path.realpath(base)
+    return os.path.commonpath([base, os.path.realpath(target)]) == base
+
+
+def _extract_archive(archive_path: str, destination: str):
+    """Extract a zip or tar archive, refusing members that escape `destination`"""
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            for member in archive.namelist():
+                if not _is_within(destination, os.path.join(destination, member)):
+                    raise ValueError(f"Unsafe path in archive: {member}")
+            archive.extractall(destination)
+    elif tarfile.is_tarfile(archive_path):
+        with tarfile.open(archive_path) as archive:
+            for member in archive.getmembers():
+                if not (member.isfile() or member.isdir()) or not _is_within(destination, os.path.join(destination, member.name)):
+                    raise ValueError(f"Unsafe member in archive: {member.name}")
+            archive.extractall(destination)
+    else:
+        raise ValueError(f"Unsupported archive format: {archive_path}")
+
+
+@contextmanager
+def project_root(path: str) -> Iterator[str]:
+    """Yield a directory for `path`, extracting it to a temp dir first if it is an archive"""
+    if os.path.isdir(path):
+        yield path
+        return
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Project path '{path}' does not exist.")
+    temp_dir = tempfile.mkdtemp(prefix='project_')
+    try:
+        _extract_archive(path, temp_dir)
+        # Archives usually wrap everything in a single top-level folder
+        entries = os.listdir(temp_dir)
+        if len(entries) == 1 and os.path.isdir(os.path.join(temp_dir, entries[0])):
+            yield os.path.join(temp_dir, entries[0])
+        else:
+            yield temp_dir
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def collect_python_files(root: str) -> Dict[str, str]:
+    """Map each .py file's path relative to `root` to its content hash"""
+    files = {}
+    for directory, dirs, names in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if d not in SKIPPED_DIRS)
+        for name in names:
+            if name.endswith('.py'):
+                full_path = os.path.join(directory, name)
+                files[os.path.relpath(full_path, root).replace(os.sep, '/')] = file_hash(full_path)
+    return files
+
+
+def _line_set(path: str) -> set:
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def _similarity(a: set, b: set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def match_files(original_root: str, original_files: Dict[str, str],
+                modified_root: str, modified_files: Dict[str, str]) -> Dict[str, List]:
+    """
+    Pair up files between two trees.
+
+    Files are matched by relative path first, then by identical content hash,
+    and finally leftover files are paired by line-set similarity (renames).
+    """
+    common = sorted(set(original_files) & set(modified_files))
+    removed = sorted(set(original_files) - set(modified_files))
+    added = sorted(set(modified_files) - set(original_files))
+
+    renamed = []
+    # Exact moves: same content under a different path
+    added_by_hash = {}
+    for path in added:
+        added_by_hash.setdefault(modified_files[path], []).append(path)
+    for path in list(removed):
+        candidates = added_by_hash.get(original_files[path])
+        if candidates:
+            target = candidates.pop(0)
+            renamed.append((path, target, 1.0))
+            removed.remove(path)
+            added.remove(target)
+
+    # Fuzzy renames: best line-set overlap above the threshold
+    if removed and added:
+        added_lines = {path: _line_set(os.path.join(modified_root, path)) for path in added}
+        for path in list(removed):
+            lines = _line_set(os.path.join(original_root, path))
+            best, best_score = None, RENAME_SIMILARITY_THRESHOLD
+            for candidate in added:
+                score = _similarity(lines, added_lines[candidate])
+                if score >= best_score:
+                    best, best_score = candidate, score
+            if best is not None:
+                renamed.append((path, best, round(best_score, 3)))
+                removed.remove(path)
+                added.remove(best)
+
+    return {
+        'unchanged': [p for p in common if original_files[p] == modified_files[p]],
+        'modified': [(p, p) for p in common if original_files[p] != modified_files[p]],
+        'renamed': renamed,
+        'added': added,
+        'removed': removed,
+    }
+
+
+def diff_file_pair(task: Tuple[Optional[str], Optional[str], str]) -> Dict:
+    """
+    Parse and diff one file pair. Either side may be None for added/removed files.
+    Runs inside worker processes, so it only takes and returns plain data.
+    """
+    original_path, modified_path, label = task
+    original = extract_file_features(original_path, label) if original_path else FileFeatures()
+    modified = extract_file_features(modified_path, label) if modified_path else FileFeatures()
+
+    errors = [side['error'] for side in (original, modified) if isinstance(side, dict)]
+    if errors:
+        return {'file': label, 'error': '; '.join(errors)}
+
+    changes = original.diff(modified)
+    return {'file': label, 'changes': changes, 'changes_detected': count_changes(changes)}
+
+
+def aggregate_file_changes(file_results: List[Dict]) -> Dict:
+    """
+    Merge per-file diffs into one structural_changes dict.
+
+    Symbols are qualified by file path (`pkg/mod.py::name`) and complexity
+    deltas are summed, so the result has the same shape as a single-file diff.
+    """
+    aggregated = {
+        'functions': {'added': [], 'removed': [], 'common': []},
+        'classes': {'added': [], 'removed': [], 'common': []},
+        'imports': {'added': [], 'removed': [], 'common': []},
+        'complexity_delta': {},
+        'symbols': {'modified': [], 'renamed': [], 'moved': [], 'added': [], 'removed': []},
+        'function_complexity': {'regressions': [], 'improvements': [], 'unchanged': 0},
+    }
+    for result in file_results:
+        changes = result.get('changes')
+        if not changes:
+            continue
+        for category in ('functions', 'classes', 'imports'):
+            for bucket in ('added', 'removed', 'common'):
+                aggregated[category][bucket].extend(
+                    f"{result['file']}::{name}" for name in sorted(changes[category][bucket])
+                )
+        for metric, delta in changes['complexity_delta'].items():
+            aggregated['complexity_delta'][metric] = aggregated['complexity_delta'].get(metric, 0) + delta
+        for bucket, entries in changes.get('symbols', {}).items():
+            aggregated['symbols'][bucket].extend(dict(entry, file=result['file']) for entry in entries)
+        complexity = changes.get('function_complexity', {})
+        for bucket in ('regressions', 'improvements'):
+            aggregated['function_complexity'][bucket].extend(
+                dict(entry, file=result['file']) for entry in complexity.get(bucket, [])
+            )
+        aggregated['function_complexity']['unchanged'] += complexity.get('unchanged', 0)
+    return aggregated
+
+
+def analyze_project(original_path: str, modified_path: str, parallel: bool = True) -> Dict:
+    """
+    Structural diff of two project trees (directories or zip/tar archives).
+
+    Unchanged files are skipped by content hash; changed, added and removed
+    files are parsed and diffed in parallel on the shared analysis pool (see
+    analysis_pool), so concurrent requests share one bounded set of workers.
+    `parallel=False` parses in this process.
+    """
+    with project_root(original_path) as original_root, project_root(modified_path) as modified_root:
+        original_files = collect_python_files(original_root)
+        modified_files = collect_python_files(modified_root)
+        matches = match_files(original_root, original_files, modified_root, modified_files)
+
+        tasks = (
+            [(os.path.join(original_root, a), os.path.join(modified_root, b), b) for a, b in matches['modified']]
+            + [(os.path.join(original_root, a), os.path.join(modified_root, b), b) for a, b, _ in matches['renamed']]
+            + [(None, os.path.join(modified_root, p), p) for p in matches['added']]
+            + [(os.path.join(original_root, p), None, p) for p in matches['removed']]
+        )
+
+        pool = get_analysis_pool() if parallel and len(tasks) >= PARALLEL_MIN_FILES else None
+        if pool is None:
+            file_results = [diff_file_pair(task) for task in tasks]
+        else:
+            file_results = pool.map(diff_file_pair, tasks, chunksize=max(1, len(tasks) // (4 * pool.max_workers)))
+
+    structural_changes = aggregate_file_changes(file_results)
+    return {
+        'analysis_metadata': {
+            'timestamp': datetime.now().isoformat(),
+            'analysis_type': 'AST_project_analysis',
+            'original': original_path,
+            'modified': modified_path,
+        },
+        'file_summary': {
+            'total_original': len(original_files),
+            'total_modified': len(modified_files),
+            'unchanged': len(matches['unchanged']),
+            'modified': [b for _, b in matches['modified']],
+            'renamed': [{'from': a, 'to': b, 'similarity': score} for a, b, score in matches['renamed']],
+            'added': matches['added'],
+            'removed': matches['removed'],
+            'errors': [r for r in file_results if 'error' in r],
+        },
+        'structural_changes': structural_changes,
+        'changes_detected': count_changes(structural_changes),
+        'file_changes': [r for r in file_results if 'changes' in r],
+    }
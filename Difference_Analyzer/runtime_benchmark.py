@@ -0,0 +1,113 @@
+import ast
+import json
+import os
+import random
+import statistics
+import sys
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Agent.sandbox import get_sandbox_pool
+from Config import get_setting
+from Difference_Analyzer.ast_features import parse_source
+
+BOOTSTRAP_SAMPLES = 2000
+
+
+def top_level_functions(tree: ast.Module) -> List[str]:
+    """Names of module-level (non-async) functions; later definitions win, as at import"""
+    return [node.name for node in tree.body if isinstance(node, ast.FunctionDef)]
+
+
+def common_top_level_functions(original_code: str, modified_code: str) -> List[str]:
+    original = set(top_level_functions(parse_source(original_code)))
+    return sorted(original.intersection(top_level_functions(parse_source(modified_code))))
+
+
+def speedup_interval(original_times: List[float], modified_times: List[float],
+                     confidence: float = 0.95, samples: int = BOOTSTRAP_SAMPLES) -> Dict:
+    """
+    Speedup of modified over original (ratio of median per-call times, >1 means
+    faster) with a percentile bootstrap confidence interval.
+    """
+    speedup = statistics.median(original_times) / statistics.median(modified_times)
+    rng = random.Random(0)
+    ratios = sorted(
+        statistics.median(rng.choices(original_times, k=len(original_times)))
+        / statistics.median(rng.choices(modified_times, k=len(modified_times)))
+        for _ in range(samples)
+    )
+    tail = (1 - confidence) / 2
+    low, high = ratios[int(tail * samples)], ratios[min(samples - 1, int((1 - tail) * samples))]
+    if low > 1:
+        verdict = 'faster'
+    elif high < 1:
+        verdict = 'slower'
+    else:
+        verdict = 'no significant change'
+    return {'speedup': round(speedup, 4), 'ci95': [round(low, 4), round(high, 4)], 'verdict': verdict}
+
+
+def summarize_timings(record: Dict) -> Dict:
+    """Replace the raw per-repeat times from the sandbox with medians and the speedup interval"""
+    original_times, modified_times = record.pop('original_times'), record.pop('modified_times')
+    record.update(
+        original_seconds=statistics.median(original_times),
+        modified_seconds=statistics.median(modified_times),
+        repeats=len(original_times),
+        **speedup_interval(original_times, modified_times),
+    )
+    return record
+
+
+def compare_runtime(original_code: str, modified_code: str,
+                    inputs: Optional[Dict[str, List[List]]] = None) -> Dict:
+    """
+    Benchmark the top-level functions both versions define, in one sandboxed subprocess.
+
+    `inputs` maps function names to lists of positional-argument lists; functions
+    without supplied inputs get arguments generated from their signature.
+    """
+    try:
+        names = common_top_level_functions(original_code, modified_code)
+    except SyntaxError as e:
+        return {'error': f'Cannot benchmark code that does not parse: {e}'}
+    if not names:
+        return {'functions': [], 'summary': {}, 'note': 'No common top-level functions to benchmark'}
+
+    max_functions = get_setting('runtime_benchmark', 'max_functions', 20)
+    spec = {
+        'functions': [{'name': name, 'inputs': (inputs or {}).get(name)} for name in names[:max_functions]],
+        'repeat': get_setting('runtime_benchmark', 'repeat', 15),
+        'target_seconds': get_setting('runtime_benchmark', 'target_seconds', 0.01),
+        'input_size': get_setting('runtime_benchmark', 'input_size', 20),
+        'function_seconds': get_setting('runtime_benchmark', 'function_seconds', 20),
+    }
+    result = get_sandbox_pool().submit(
+        modified_code, 'compare', ['original.py', 'spec.json'],
+        files={'original.py': original_code, 'spec.json': json.dumps(spec)},
+        timeout=get_setting('runtime_benchmark', 'timeout_seconds', 120),
+        cpu_seconds=get_setting('runtime_benchmark', 'cpu_seconds', 110),
+    ).result()
+
+    functions = [
+        summarize_timings(record) if record.get('status') == 'ok' else record
+        for record in result.get('functions', [])
+    ]
+    summary = {verdict: 0 for verdict in ('faster', 'slower', 'no significant change', 'skipped', 'error')}
+    for record in functions:
+        # Runner statuses other than these (e.g. timeout, needs_input) are counted under their own name
+        outcome = record.get('verdict') or record.get('status') or 'error'
+        summary[outcome] = summary.get(outcome, 0) + 1
+    report = {
+        'functions': functions,
+        'summary': summary,
+        'sandbox': {'status': result['status'], 'process_seconds': result.get('process_seconds')},
+    }
+    if len(names) > max_functions:
+        report['note'] = f'Benchmarked the first {max_functions} of {len(names)} common functions'
+    if 'error' in result:
+        report['error'] = result['error']
+    return report
+
@@ -0,0 +1,101 @@
+# syntax_recovery.py - error-tolerant parsing: keep the top-level blocks that parse, blank out the rest
+import os
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Difference_Analyzer.ast_features import CLAUSE_KEYWORDS, parse_source
+from Config import get_setting
+
+FIRST_WORD = re.compile(r'[A-Za-z_]+')
+
+
+def segment_lines(lines: List[str]) -> List[Tuple[int, int]]:
+    """
+    Split source lines into top-level blocks by indentation alone, so it works
+    on code the tokenizer rejects: a block starts at every unindented
+    statement line, except clause keywords (else/elif/except/finally),
+    closing brackets, comments and the definition under a decorator.
+    Returns [start, end) line index pairs covering every line.
+    """
+    starts, after_decorator = [], False
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        if not stripped or stripped.startswith('#') or line[0] in ' \t':
+            continue
+        word = FIRST_WORD.match(stripped)
+        if (word and word.group() in CLAUSE_KEYWORDS) or stripped.startswith((')', ']', '}')):
+            continue
+        if not after_decorator:
+            starts.append(index)
+        after_decorator = stripped.startswith('@')
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    return list(zip(starts, starts[1:] + [len(lines)]))
+
+
+def _parses(source: str):
+    try:
+        parse_source(source)
+    except (SyntaxError, ValueError) as e:
+        return e
+    return None
+
+
+def recover_source(source: str, max_merge: Optional[int] = None) -> Tuple[str, Dict]:
+    """
+    Source with every top-level block that doesn't parse replaced by blank
+    lines (so line numbers still match the original), and what was dropped.
+
+    A block that fails on its own is retried together with up to
+    `max_merge - 1` following blocks, which rejoins statements the
+    indentation split apart (e.g. a multi-line string with unindented lines).
+    """
+    max_merge = max_merge or get_setting('syntax_recovery', 'max_merge', 3)
+    lines = source.splitlines(keepends=True)
+    segments = segment_lines(lines)
+    broken, kept = [], [True] * len(lines)
+    index = 0
+    while index < len(segments):
+        start = segments[index][0]
+        first_error = None
+        for width in range(1, max_merge + 1):
+            last = min(index + width, len(segments)) - 1
+            error = _parses(''.join(lines[start:segments[last][1]]))
+            if error is None or last == len(segments) - 1:
+                break
+            first_error = first_error or error
+        if error is None:
+            index = last + 1
+            continue
+        error = first_error or error
+        end = segments[index][1]
+        while end > start + 1 and not lines[end - 1].strip():
+            end -= 1
+        lineno = start + (getattr(error, 'lineno', None) or 1)
+        broken.append({'start': start + 1, 'end': end, 'error': f"{getattr(error, 'msg', str(error))} (line {lineno})"})
+        for line in range(start, segments[index][1]):
+            kept[line] = False
+        index += 1
+
+    code_lines = sum(1 for line in lines if line.strip() and not line.lstrip().startswith('#'))
+    broken_lines = sum(1 for line, keep in zip(lines, kept)
+                       if not keep and line.strip() and not line.lstrip().startswith('#'))
+    recovered = ''.join(line if keep else '\n' for line, keep in zip(lines, kept))
+    return recovered, {
+        'blocks': len(segments),
+        'broken': broken,
+        'broken_lines': broken_lines,
+        'code_lines': code_lines,
+        'parsed_share': round(1 - broken_lines / code_lines, 3) if code_lines else 0.0,
+    }
+
+
+def describe_recovery(filename: str, recovery: Dict) -> str:
+    """One line for reports and the analysis history: which blocks were skipped and how much was analyzed"""
+    spans = '; '.join(f"lines {b['start']}-{b['end']}: {b['error']}" for b in recovery['broken'][:3])
+    more = f"; {len(recovery['broken']) - 3} more" if len(recovery['broken']) > 3 else ''
+    return (f"{filename}: {len(recovery['broken'])} of {recovery['blocks']} top-level blocks do not parse "
+            f"({spans}{more}); {recovery['parsed_share']:.0%} of the code was analyzed")
@@ -0,0 +1,79 @@
+import hashlib
+import os
+import sys
+import time
+from typing import Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Config import get_setting, resolve_path
+from Storage.session_store import atomic_write
+from Storage.shared_state import get_shared_state
+
+
+class DraftStore:
+    """
+    Content-addressed store for message bodies pruned out of graph state.
+
+    Identical drafts are stored once under their sha256. Entries expire with
+    the sessions that referenced them (session_timeout_hours after their last
+    write); see purge_expired.
+    """
+
+    def __init__(self, root: Optional[str] = None, ttl_hours: Optional[float] = None,
+                 purge_interval_seconds: Optional[float] = None):
+        self.root = root or resolve_path(get_setting('directories', 'drafts', 'Generated/drafts'))
+        self.ttl_hours = ttl_hours or get_setting('session_config', 'session_timeout_hours', 24)
+        self.purge_interval_seconds = purge_interval_seconds or get_setting('history', 'purge_interval_seconds', 3600)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        if len(digest) != 64 or not all(c in '0123456789abcdef' for c in digest):
+            raise ValueError(f"Invalid draft digest: {digest!r}")
+        return os.path.join(self.root, digest[:2], f"{digest}.txt")
+
+    def put(self, text: str) -> str:
+        """Store `text` and return its sha256 (a rewrite of an existing draft only refreshes its mtime)"""
+        data = text.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            atomic_write(path, data)
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        try:
+            with open(self._path(digest), 'r', encoding='utf-8') as f:
+                return f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def purge_expired(self, force: bool = False) -> int:
+        """Delete drafts not written for `ttl_hours`; without `force`, one worker does this per interval"""
+        if not force and not get_shared_state().claim(f"draft_purge:{self.root}", self.purge_interval_seconds):
+            return 0
+        cutoff = time.time() - self.ttl_hours * 3600
+        purged = 0
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith('.txt') and entry.stat().st_mtime < cutoff:
+                    try:
+                        os.remove(entry.path)
+                        purged += 1
+                    except OSError:
+                        pass
+        return purged
+
+
+_draft_store = None
+
+
+def get_draft_store() -> DraftStore:
+    global _draft_store
+    if _draft_store is None:
+        _draft_store = DraftStore()
+    return _draft_store
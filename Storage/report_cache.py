@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Config import get_setting, resolve_path
+from Storage.session_store import atomic_write
+from Storage.shared_state import get_shared_state
+
+
+def content_hash(code: str) -> str:
+    """sha256 of a source string, as recorded by the session store"""
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+
+def file_hash(path: str) -> str:
+    """sha256 of a file's bytes, read in chunks (equals content_hash of its UTF-8 text)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ReportCache:
+    """
+    On-disk cache of finished analysis reports.
+
+    Entries are keyed by the content hashes of the original and modified code,
+    so a report is reused for as long as neither file changes. The cache is
+    bounded by entry count and total size; the least recently used entries
+    (by file mtime, refreshed on every hit) are evicted first. The entry and
+    byte counts live in SharedState, so every API worker sees the same totals.
+    """
+
+    def __init__(self, root: Optional[str] = None, max_entries: Optional[int] = None,
+                 max_size_mb: Optional[float] = None):
+        self.root = root or resolve_path(get_setting('directories', 'reports', 'Generated/reports'))
+        self.max_entries = max_entries or get_setting('report_cache', 'max_entries', 1000)
+        self.max_bytes = int((max_size_mb or get_setting('report_cache', 'max_size_mb', 100)) * 1024 * 1024)
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self.state = get_shared_state()
+        self._counter = f"report_cache:{self.root}"
+        if self.state.get(f"{self._counter}:entries") is None:
+            entries, total = self._scan()
+            self.state.set(f"{self._counter}:entries", entries)
+            self.state.set(f"{self._counter}:bytes", total)
+
+    @staticmethod
+    def key_for(original_code: str, modified_code: str) -> str:
+        return f"{content_hash(original_code)}_{content_hash(modified_code)}"
+
+    @staticmethod
+    def key_for_files(original_file: str, modified_file: str) -> str:
+        """Same key as key_for, computed without loading either file into memory"""
+        return f"{file_hash(original_file)}_{file_hash(modified_file)}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def _scan(self):
+        entries, total = 0, 0
+        for shard in os.scandir(self.root):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith('.json'):
+                        entries += 1
+                        total += entry.stat().st_size
+        return entries, total
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached payload for `key`, or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return entry.get('report')
+
+    def put(self, key: str, report: Dict):
+        """Store a report payload and evict old entries if over budget"""
+        data = json.dumps({'key': key, 'created_at': time.time(), 'report': report}).encode('utf-8')
+        path = self._path(key)
+        with self._lock:
+            previous = os.path.getsize(path) if os.path.exists(path) else None
+            atomic_write(path, data)
+            if previous is None:
+                entries = self.state.incr(f"{self._counter}:entries")
+                total = self.state.incr(f"{self._counter}:bytes", len(data))
+            else:
+                entries = self.state.get(f"{self._counter}:entries") or 0
+                total = self.state.incr(f"{self._counter}:bytes", len(data) - previous)
+            # One worker evicts at a time; the others keep serving
+            if (entries > self.max_entries or total > self.max_bytes) and self.state.claim(f"{self._counter}:evicting", 60):
+                try:
+                    self._evict()
+                finally:
+                    self.state.delete(f"{self._counter}:evicting")
+
+    def invalidate(self, key: str):
+        with self._lock:
+            path = self._path(key)
+            if os.path.exists(path):
+                self.state.incr(f"{self._counter}:bytes", -os.path.getsize(path))
+                self.state.incr(f"{self._counter}:entries", -1)
+                os.remove(path)
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is back under both limits"""
+        files = []
+        for shard in os.scandir(self.root):
+            if shard.is_dir():
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith('.json'):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+
+        entries, total = len(files), sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if entries <= self.max_entries and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            entries -= 1
+            total -= size
+        self.state.set(f"{self._counter}:entries", entries)
+        self.state.set(f"{self._counter}:bytes", total)
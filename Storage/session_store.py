@@ -0,0 +1,287 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import BinaryIO, Callable, Dict, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Config import get_setting, resolve_path
+from Storage.shared_state import get_shared_state, reconnect_after_fork
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+# File kinds stored per session and their on-disk names
+SESSION_FILES = {
+    'original': 'generated_code.py',
+    'updated': 'updated_code.py',
+}
+METADATA_FILE = 'meta.json'
+LOCK_FILE = '.meta.lock'
+
+
+class UploadTooLarge(ValueError):
+    """Raised when a streamed upload exceeds the configured size limit"""
+
+
+def atomic_write(path: str, data: bytes):
+    """Write bytes to `path` via a temp file + rename so readers never see partial files"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class SessionStore:
+    """
+    Sharded on-disk storage for session code files.
+
+    Each session lives in `root/<aa>/<bb>/<session_id>/` where `aa/bb` come from
+    a hash of the session id, so no single directory grows past a few hundred
+    entries. A `meta.json` next to the files records timestamps, sizes and
+    content hashes, and sessions idle for longer than `ttl_hours` expire.
+    Expired sessions are swept on a background thread, at most once per
+    `purge_interval_seconds`, so writes never wait for the sweep.
+    `on_delete` is called with each deleted or purged session id.
+    """
+
+    def __init__(self, root: Optional[str] = None, ttl_hours: Optional[float] = None,
+                 purge_interval_seconds: float = 600, on_delete: Optional[Callable[[str], None]] = None):
+        self.root = root or resolve_path(get_setting('directories', 'codes', 'Generated/codes'))
+        self.ttl_hours = ttl_hours if ttl_hours is not None else get_setting('session_config', 'session_timeout_hours', 24)
+        self.purge_interval_seconds = purge_interval_seconds
+        # Called with the session id after a session is deleted or purged, to drop what other stores hold for it
+        self.on_delete = on_delete
+        self._last_purge = 0.0
+        self._reset()
+        os.makedirs(self.root, exist_ok=True)
+        reconnect_after_fork(self, '_reset')
+
+    def _reset(self):
+        # Also run in forked workers: a lock held by a parent thread at fork time would never be released
+        self._meta_lock = threading.Lock()
+        self._purge_lock = threading.Lock()
+        self._purge_thread = None
+
+    def session_dir(self, session_id: str) -> str:
+        """Return the sharded directory for a session"""
+        if not session_id or os.sep in session_id or session_id in ('.', '..') or (os.altsep and os.altsep in session_id):
+            raise ValueError(f"Invalid session id: {session_id!r}")
+        digest = hashlib.sha1(session_id.encode('utf-8')).hexdigest()
+        return os.path.join(self.root, digest[:2], digest[2:4], session_id)
+
+    def path(self, session_id: str, kind: str) -> str:
+        """Return the path of a session file (whether or not it exists)"""
+        if kind not in SESSION_FILES:
+            raise ValueError(f"Unknown session file kind: {kind!r}")
+        return os.path.join(self.session_dir(session_id), SESSION_FILES[kind])
+
+    def _load_metadata(self, session_id: str) -> Dict:
+        meta_path = os.path.join(self.session_dir(session_id), METADATA_FILE)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_metadata(self, session_id: str, metadata: Dict):
+        meta_path = os.path.join(self.session_dir(session_id), METADATA_FILE)
+        atomic_write(meta_path, json.dumps(metadata, indent=2).encode('utf-8'))
+
+    @contextmanager
+    def _locked(self, session_id: str):
+        """Serialize meta.json read-modify-writes between threads and, via flock, between worker processes"""
+        directory = self.session_dir(session_id)
+        os.makedirs(directory, exist_ok=True)
+        with self._meta_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(directory, LOCK_FILE), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _is_expired(self, metadata: Dict) -> bool:
+        updated_at = metadata.get('updated_at')
+        return bool(updated_at) and time.time() - updated_at > self.ttl_hours * 3600
+
+    def save(self, session_id: str, kind: str, content: str) -> Dict:
+        """Atomically store a session file and return its metadata"""
+        self._schedule_purge()
+        data = content.encode('utf-8')
+        path = self.path(session_id, kind)
+        atomic_write(path, data)
+        return self._record(session_id, kind, path, len(data), hashlib.sha256(data).hexdigest())
+
+    def save_stream(self, session_id: str, kind: str, stream: BinaryIO, max_bytes: Optional[int] = None,
+                    chunk_size: int = 1 << 16) -> Dict:
+        """
+        Atomically store a session file from a binary stream, chunk by chunk.
+
+        The content is hashed while it is written, so the upload is never held
+        in memory. Raises UploadTooLarge if it exceeds `max_bytes`.
+        """
+        self._schedule_purge()
+        path = self.path(session_id, kind)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        digest, size = hashlib.sha256(), 0
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: stream.read(chunk_size), b''):
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise UploadTooLarge(f"Upload exceeds the {max_bytes} byte limit")
+                    digest.update(chunk)
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return self._record(session_id, kind, path, size, digest.hexdigest())
+
+    def _record(self, session_id: str, kind: str, path: str, size: int, sha256: str) -> Dict:
+        with self._locked(session_id):
+            now = time.time()
+            metadata = self._load_metadata(session_id)
+            metadata.setdefault('session_id', session_id)
+            metadata.setdefault('created_at', now)
+            metadata['updated_at'] = now
+            metadata.setdefault('files', {})[kind] = {
+                'path': path,
+                'size': size,
+                'sha256': sha256,
+                'updated_at': now,
+            }
+            self._save_metadata(session_id, metadata)
+        return metadata['files'][kind]
+
+    def file_info(self, session_id: str, kind: str) -> Optional[Dict]:
+        """Metadata for one session file, or None if missing or expired"""
+        metadata = self._load_metadata(session_id)
+        if not metadata or self._is_expired(metadata):
+            return None
+        info = metadata.get('files', {}).get(kind)
+        if info and not os.path.exists(info['path']):
+            return None
+        return info
+
+    def exists(self, session_id: str, kind: str) -> bool:
+        return self.file_info(session_id, kind) is not None
+
+    def load(self, session_id: str, kind: str) -> Optional[str]:
+        """Read a session file, or None if missing or expired"""
+        info = self.file_info(session_id, kind)
+        if info is None:
+            return None
+        with open(info['path'], 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def describe(self, session_id: str) -> Dict:
+        """Summary of every known file for a session, used by the session endpoints"""
+        files = {}
+        for kind in SESSION_FILES:
+            info = self.file_info(session_id, kind)
+            files[kind] = {
+                'path': self.path(session_id, kind),
+                'exists': info is not None,
+                **({
+                    'size': info['size'],
+                    'sha256': info['sha256'],
+                    'updated_at': datetime.fromtimestamp(info['updated_at']).isoformat(),
+                } if info else {})
+            }
+        return files
+
+    def delete(self, session_id: str) -> List[str]:
+        """Remove a session and return the paths of the files that were removed"""
+        directory = self.session_dir(session_id)
+        if not os.path.isdir(directory):
+            self._deleted(session_id)
+            return []
+        removed = [
+            self.path(session_id, kind) for kind in SESSION_FILES
+            if os.path.exists(self.path(session_id, kind))
+        ]
+        shutil.rmtree(directory, ignore_errors=True)
+        self._deleted(session_id)
+        return removed
+
+    def _deleted(self, session_id: str):
+        if self.on_delete is None:
+            return
+        try:
+            self.on_delete(session_id)
+        except Exception as e:
+            print(f"Warning: cleanup hook failed for deleted session {session_id}: {e}")
+
+    def _schedule_purge(self):
+        """Start purge_expired on a background thread if a sweep is due and none is running"""
+        if time.time() - self._last_purge < self.purge_interval_seconds:
+            return
+        with self._purge_lock:
+            if self._purge_thread is not None and self._purge_thread.is_alive():
+                return
+            self._purge_thread = threading.Thread(target=self.purge_expired, kwargs={'force': False},
+                                                  name='session-purge', daemon=True)
+            self._purge_thread.start()
+
+    def purge_expired(self, force: bool = True) -> int:
+        """
+        Delete sessions idle for longer than `ttl_hours`.
+
+        Unless `force` is set this runs at most once per `purge_interval_seconds`
+        across all workers sharing the store. Writes call it through
+        _schedule_purge, off the request thread.
+        """
+        now = time.time()
+        if not force and now - self._last_purge < self.purge_interval_seconds:
+            return 0
+        self._last_purge = now
+        # Several API workers share the store; only one of them sweeps per interval
+        if not force and not get_shared_state().claim(f"session_purge:{self.root}", self.purge_interval_seconds):
+            return 0
+
+        purged = 0
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for sub_shard in os.scandir(shard.path):
+                if not sub_shard.is_dir():
+                    continue
+                for entry in os.scandir(sub_shard.path):
+                    if not entry.is_dir() or not self._is_expired(self._load_metadata(entry.name)):
+                        continue
+                    # Check again under the lock: a write may have just refreshed the session
+                    with self._locked(entry.name):
+                        if not self._is_expired(self._load_metadata(entry.name)):
+                            continue
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                    self._deleted(entry.name)
+                    purged += 1
+        return purged
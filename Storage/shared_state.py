@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+import weakref
+from typing import Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Config import get_setting, resolve_path
+
+# Connections inherited across fork are never used or closed in the child: closing
+# them could release or checkpoint state the parent still owns
+_abandoned_connections = []
+
+
+def reconnect_after_fork(owner, method: str = '_reconnect'):
+    """
+    Call `owner.<method>()` in every child forked after this point.
+
+    For objects holding SQLite connections, which must not be shared between
+    processes (see main.py's production mode, which forks preloaded workers).
+    Holds only a weak reference, so the owner can still be garbage-collected.
+    """
+    if not hasattr(os, 'register_at_fork'):
+        return
+    ref = weakref.ref(owner)
+
+    def after_in_child():
+        target = ref()
+        if target is not None:
+            getattr(target, method)()
+
+    os.register_at_fork(after_in_child=after_in_child)
+
+
+def abandon_connection(conn: sqlite3.Connection):
+    _abandoned_connections.append(conn)
+
+
+class SharedState:
+    """
+    Expiring integer counters in SQLite, shared by every worker process on the host.
+
+    Each update is a single autocommitted upsert, so concurrent increments from
+    different processes never get lost. Used for rate limits, cache bookkeeping
+    and "only one worker does this per interval" claims.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or resolve_path(get_setting('files', 'shared_state', 'Generated/shared_state.sqlite'))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._connect()
+        reconnect_after_fork(self)
+
+    def _connect(self):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL) WITHOUT ROWID"
+        )
+
+    def _reconnect(self):
+        abandon_connection(self.conn)
+        self._connect()
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Add `amount` and return the new value; an expired counter restarts from zero"""
+        now = time.time()
+        with self._lock:
+            return self.conn.execute(
+                """
+                INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END,
+                    expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END
+                RETURNING value
+                """,
+                (key, amount, now + ttl if ttl else None, now, now),
+            ).fetchone()[0]
+
+    def get(self, key: str) -> Optional[int]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value FROM state WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: int, ttl: Optional[float] = None):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl if ttl else None),
+            )
+
+    def delete(self, key: str):
+        with self._lock:
+            self.conn.execute("DELETE FROM state WHERE key = ?", (key,))
+
+    def claim(self, key: str, ttl: float) -> bool:
+        """True for exactly one caller (in any process) per `ttl` seconds"""
+        now = time.time()
+        with self._lock:
+            return self.conn.execute(
+                """
+                INSERT INTO state (key, value, expires_at) VALUES (?, 1, ?)
+                ON CONFLICT(key) DO UPDATE SET expires_at = excluded.expires_at WHERE expires_at <= ?
+                RETURNING key
+                """,
+                (key, now + ttl, now),
+            ).fetchone() is not None
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self.conn.execute("DELETE FROM state WHERE expires_at <= ?", (time.time(),)).rowcount
+
+
+class RateLimiter:
+    """Fixed-window request limit per client, counted in SharedState so every worker enforces the same budget"""
+
+    def __init__(self, state: SharedState, limit: int, window_seconds: float, prefix: str = 'rate'):
+        self.state = state
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.prefix = prefix
+
+    def hit(self, client: str) -> Optional[float]:
+        """Count one request; returns None if allowed, else seconds until the window resets"""
+        now = time.time()
+        window = int(now // self.window_seconds)
+        count = self.state.incr(f"{self.prefix}:{client}:{window}", ttl=self.window_seconds * 2)
+        # Old windows' counters are dropped now and then, by whichever worker gets there first
+        if count == 1 and self.state.claim(f"{self.prefix}:purge", self.window_seconds * 10):
+            self.state.purge_expired()
+        if count <= self.limit:
+            return None
+        return (window + 1) * self.window_seconds - now
+
+
+_shared_state = None
+_shared_state_lock = threading.Lock()
+
+
+def get_shared_state() -> SharedState:
+    global _shared_state
+    with _shared_state_lock:
+        if _shared_state is None:
+            _shared_state = SharedState()
+        return _shared_state
@@ -220,15 +220,17 @@
 import streamlit as st
 import os
 import sys
-import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import json
+from types import SimpleNamespace
 
 # Add the project root to the path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from Agent.generator import workflow, CodeGenerationState
-from Difference_Analyzer.analyzer import analyze_with_ast_workflow
+from Config import get_setting
 
 # Page configuration
 st.set_page_config(
@@ -237,9 +239,81 @@ st.set_page_config(
     layout="wide"
 )
 
-# Create a dedicated directory for generated files
-GENERATED_FILES_DIR = "generated_files"
-os.makedirs(GENERATED_FILES_DIR, exist_ok=True)
+@st.cache_resource(show_spinner="Loading models and workflows...")
+def get_backend():
+    """LLM client, compiled graphs and storage, built once per server process instead of on every rerun"""
+    from Agent.generator import run_generation, CodeGenerationState
+    from Difference_Analyzer.analyzer import (analyze_with_ast_workflow, load_cached_report, load_cached_diff,
+                                              create_ast_analysis_workflow)
+    from Storage.report_cache import content_hash
+    from Storage.session_store import SessionStore
+
+    return SimpleNamespace(
+        run_generation=run_generation,
+        CodeGenerationState=CodeGenerationState,
+        analyze_with_ast_workflow=analyze_with_ast_workflow,
+        load_cached_report=load_cached_report,
+        load_cached_diff=load_cached_diff,
+        content_hash=content_hash,
+        # Sharded, TTL-aware storage for generated and updated session files
+        session_store=SessionStore(),
+        analysis_steps=len(create_ast_analysis_workflow().nodes) - 1,
+    )
+
+class Job:
+    """A background workflow run; worker threads only append to `steps`, never touch st.*"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.steps = []
+        self.started = time.time()
+        self.future = None
+
+    @property
+    def failed(self) -> bool:
+        return self.future.done() and self.future.exception() is not None
+
+class JobRunner:
+    """
+    Thread pool shared by every browser session of this server process.
+
+    Jobs are keyed by what they compute (e.g. the content hashes of both files),
+    so repeated clicks, reruns and other tabs attach to the running or finished
+    job instead of paying for another LLM call. Failed jobs can be resubmitted.
+    """
+
+    def __init__(self, max_workers: int, max_finished: int):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ui-job')
+        self.max_finished = max_finished
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            return self.jobs.get(key)
+
+    def submit(self, key, label: str, fn, *args, replace_finished: bool = False, **kwargs) -> Job:
+        """Start `fn(*args, progress=..., **kwargs)` unless a job with this key is running (or done, unless replace_finished)"""
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is not None and not job.failed and not (replace_finished and job.future.done()):
+                return job
+            job = Job(label)
+            job.future = self.executor.submit(fn, *args, progress=job.steps.append, **kwargs)
+            self.jobs[key] = job
+            self.jobs.move_to_end(key)
+            finished = [k for k, j in self.jobs.items() if j.future.done()]
+            for old_key in finished[:max(0, len(finished) - self.max_finished)]:
+                del self.jobs[old_key]
+            return job
+
+@st.cache_resource
+def get_job_runner():
+    return JobRunner(get_setting('ui', 'workers', 2), get_setting('ui', 'max_finished_jobs', 100))
+
+backend = get_backend()
+jobs = get_job_runner()
+session_store = backend.session_store
 
 # Initialize session state with better file management
 if 'generated_code' not in st.session_state:
@@ -250,8 +324,18 @@ if 'updated_file_path' not in st.session_state:
     st.session_state.updated_file_path = None
 if 'analysis_report' not in st.session_state:
     st.session_state.analysis_report = None
+if 'active_jobs' not in st.session_state:
+    # kind ('generate' / 'analyze') -> JobRunner key this browser session is waiting on
+    st.session_state.active_jobs = {}
 if 'session_id' not in st.session_state:
-    st.session_state.session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Keep the session id in the URL so a page reload picks up the stored files and report
+    st.session_state.session_id = st.query_params.get('session_id', datetime.now().strftime("%Y%m%d_%H%M%S"))
+    st.query_params['session_id'] = st.session_state.session_id
+    if session_store.exists(st.session_state.session_id, 'original'):
+        st.session_state.generated_code = session_store.load(st.session_state.session_id, 'original')
+        st.session_state.generated_file_path = session_store.path(st.session_state.session_id, 'original')
+    if session_store.exists(st.session_state.session_id, 'updated'):
+        st.session_state.updated_file_path = session_store.path(st.session_state.session_id, 'updated')
 
 def main():
     st.title("🚀 Code Generation & Analysis Tool")
@@ -281,6 +365,68 @@ def main():
     elif page == "3. View Analysis Report":
         view_report_page()
 
+def _generate(user_query: str, session_id: str, progress):
+    """Background job: run the generation workflow and store the result in the session store"""
+    initial_state = backend.CodeGenerationState(
+        user_query=user_query,
+        generated_code='',
+        complexity_status='complex',
+        feedback='',
+        loop_count=0,
+        conversation_history=[],
+        final_code=None
+    )
+    response = backend.run_generation(initial_state, session_id, progress=progress)
+    final_code = response.get('final_code')
+    if response.get('clarification'):
+        questions = '\n'.join(f"- {question}" for question in response['clarification'])
+        raise RuntimeError(f"Please add more detail to your request:\n{questions}")
+    if not final_code:
+        raise RuntimeError("Code generation failed. Please try again.")
+    path = session_store.save(session_id, 'original', final_code)['path']
+    return final_code, path
+
+def _analyze(original_path: str, updated_path: str, force_refresh: bool, progress):
+    """Background job: run the analysis workflow (served from the report cache when possible)"""
+    report = backend.analyze_with_ast_workflow(original_path, updated_path, force_refresh=force_refresh, progress=progress)
+    if isinstance(report, str):
+        # The workflow reports failures as strings; raise so the job can be retried
+        raise RuntimeError(report)
+    return report
+
+def show_job_progress(kind: str, total_steps: int, on_done):
+    """
+    Poll this session's background job of `kind` without blocking the script.
+
+    Only this fragment reruns while the job is in flight; once it finishes the
+    result is handed to `on_done` and the whole page reruns to show it.
+    """
+    @st.fragment(run_every=get_setting('ui', 'poll_seconds', 0.5))
+    def poll():
+        key = st.session_state.active_jobs.get(kind)
+        job = jobs.get(key) if key is not None else None
+        if job is None:
+            st.session_state.active_jobs.pop(kind, None)
+            return
+        if not job.future.done():
+            steps = list(job.steps)
+            text = f"{job.label}: {steps[-1] if steps else 'starting'} ({time.time() - job.started:.0f}s)"
+            st.progress(min(len(steps) / total_steps, 0.95), text=text)
+            return
+        del st.session_state.active_jobs[kind]
+        error = job.future.exception()
+        if error is not None:
+            st.session_state[f'{kind}_error'] = str(error)
+        else:
+            on_done(job.future.result())
+        st.rerun(scope='app')
+
+    if kind in st.session_state.active_jobs:
+        poll()
+    error = st.session_state.pop(f'{kind}_error', None)
+    if error:
+        st.error(f"❌ {error}")
+
 def generate_code_page():
     st.header("📝 Step 1: Generate Code")
     st.markdown("Enter your query to generate Python code.")
@@ -292,61 +438,38 @@ def generate_code_page():
         height=100
     )
     
-    if st.button("🚀 Generate Code", type="primary"):
+    running = 'generate' in st.session_state.active_jobs
+    if st.button("🚀 Generate Code", type="primary", disabled=running):
         if user_query.strip():
-            with st.spinner("Generating code..."):
-                try:
-                    # Initialize the workflow state
-                    initial_state = CodeGenerationState(
-                        user_query=user_query,
-                        generated_code='',
-                        complexity_status='complex',
-                        feedback='',
-                        loop_count=0,
-                        conversation_history=[],
-                        final_code=None
-                    )
-                    
-                    # Run the workflow
-                    response = workflow.invoke(initial_state)
-                    final_code = response.get('final_code')
-                    
-                    if final_code:
-                        # Create a persistent file path using session ID
-                        generated_filename = f"generated_code_{st.session_state.session_id}.py"
-                        generated_file_path = os.path.join(GENERATED_FILES_DIR, generated_filename)
-                        
-                        # Save the generated code
-                        with open(generated_file_path, 'w', encoding='utf-8') as f:
-                            f.write(final_code)
-                        
-                        # Store in session state
-                        st.session_state.generated_code = final_code
-                        st.session_state.generated_file_path = generated_file_path
-                        
-                        st.success(f"✅ Code generated successfully!")
-                        st.info(f"📁 Saved to: {generated_file_path}")
-                        
-                        # Display the generated code
-                        st.subheader("Generated Code:")
-                        st.code(final_code, language='python')
-                        
-                        # Download button
-                        st.download_button(
-                            label="📥 Download Generated Code",
-                            data=final_code,
-                            file_name=generated_filename,
-                            mime="text/plain"
-                        )
-                        
-                    else:
-                        st.error("❌ Code generation failed. Please try again.")
-                        
-                except Exception as e:
-                    st.error(f"❌ Error during code generation: {str(e)}")
-                    st.write("Debug info:", str(e))
+            key = ('generate', st.session_state.session_id, user_query)
+            jobs.submit(key, "Generating code", _generate, user_query, st.session_state.session_id)
+            st.session_state.active_jobs['generate'] = key
         else:
             st.warning("⚠️ Please enter a query to generate code.")
+    
+    def on_generated(result):
+        st.session_state.generated_code, st.session_state.generated_file_path = result
+        st.session_state.analysis_report = None
+    
+    # Loops back through generate/check, so the bar is a rough guide
+    show_job_progress('generate', 6, on_generated)
+    
+    if st.session_state.generated_code:
+        generated_filename = f"generated_code_{st.session_state.session_id}.py"
+        st.success("✅ Code generated successfully!")
+        st.info(f"📁 Saved to: {st.session_state.generated_file_path}")
+        
+        # Display the generated code
+        st.subheader("Generated Code:")
+        st.code(st.session_state.generated_code, language='python')
+        
+        # Download button
+        st.download_button(
+            label="📥 Download Generated Code",
+            data=st.session_state.generated_code,
+            file_name=generated_filename,
+            mime="text/plain"
+        )
 
 def upload_code_page():
     st.header("📤 Step 2: Upload Updated Code")
@@ -377,55 +500,100 @@ def upload_code_page():
     
     if uploaded_file is not None:
         # Read uploaded file
-        updated_code = uploaded_file.read().decode('utf-8')
+        updated_code = uploaded_file.getvalue().decode('utf-8')
+        updated_hash = backend.content_hash(updated_code)
         
         st.subheader("📝 Your Updated Code:")
         st.code(updated_code, language='python')
         
-        # Save updated code immediately when uploaded
-        updated_filename = f"updated_code_{st.session_state.session_id}.py"
-        updated_file_path = os.path.join(GENERATED_FILES_DIR, updated_filename)
-        
-        with open(updated_file_path, 'w', encoding='utf-8') as f:
-            f.write(updated_code)
+        # Save the upload once; reruns with the same content leave the stored file alone
+        stored = session_store.file_info(st.session_state.session_id, 'updated')
+        if stored is None or stored['sha256'] != updated_hash:
+            stored = session_store.save(st.session_state.session_id, 'updated', updated_code)
+            st.session_state.analysis_report = None
+        updated_file_path = stored['path']
         
         st.session_state.updated_file_path = updated_file_path
         st.info(f"📁 Updated code saved to: {updated_file_path}")
         
-        if st.button("🔍 Analyze Changes", type="primary"):
-            with st.spinner("Analyzing code changes..."):
-                try:
-                    # Verify both files exist
-                    if not os.path.exists(st.session_state.generated_file_path):
-                        st.error(f"❌ Generated file not found: {st.session_state.generated_file_path}")
-                        return
-                    
-                    if not os.path.exists(updated_file_path):
-                        st.error(f"❌ Updated file not found: {updated_file_path}")
-                        return
-                    
-                    # Run analysis
-                    report = analyze_with_ast_workflow(
-                        st.session_state.generated_file_path,
-                        updated_file_path
-                    )
-                    
-                    # Store report in session state
-                    st.session_state.analysis_report = report
-                    
-                    st.success("✅ Analysis completed!")
-                    st.info("📊 Check the 'View Analysis Report' tab to see the results.")
-                        
-                except Exception as e:
-                    st.error(f"❌ Error during analysis: {str(e)}")
-                    st.write("Debug info:")
-                    st.write(f"Generated file: {st.session_state.generated_file_path}")
-                    st.write(f"Updated file: {updated_file_path}")
-                    st.write(f"Error: {str(e)}")
+        force_refresh = st.checkbox("Ignore cached report", help="Rerun the analysis even if these files were analyzed before")
+        
+        running = 'analyze' in st.session_state.active_jobs
+        if st.button("🔍 Analyze Changes", type="primary", disabled=running):
+            # Verify both files exist
+            if not os.path.exists(st.session_state.generated_file_path):
+                st.error(f"❌ Generated file not found: {st.session_state.generated_file_path}")
+                return
+            
+            # Same contents -> same job, so a second click (or tab) reuses the running or finished analysis
+            key = ('analyze', backend.content_hash(st.session_state.generated_code), updated_hash)
+            jobs.submit(key, "Analyzing code changes", _analyze,
+                        st.session_state.generated_file_path, updated_file_path, force_refresh,
+                        replace_finished=force_refresh)
+            st.session_state.active_jobs['analyze'] = key
+        
+        def on_analyzed(report):
+            st.session_state.analysis_report = report
+            st.session_state.analysis_done = True
+        
+        show_job_progress('analyze', backend.analysis_steps, on_analyzed)
+        
+        if st.session_state.pop('analysis_done', False):
+            st.success("✅ Analysis completed!")
+            st.info("📊 Check the 'View Analysis Report' tab to see the results.")
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def load_diff(original_hash: str, updated_hash: str, original_path: str, updated_path: str):
+    """Diff model plus both sources, keyed by content so reruns don't touch the disk"""
+    with open(original_path, 'r', encoding='utf-8') as f:
+        original_lines = f.read().splitlines()
+    with open(updated_path, 'r', encoding='utf-8') as f:
+        updated_lines = f.read().splitlines()
+    return backend.load_cached_diff(original_path, updated_path), original_lines, updated_lines
+
+def _line_ranges(ranges) -> str:
+    return ', '.join(f"{start}" if start == end else f"{start}-{end}" for start, end in ranges)
+
+def render_diff(model, original_lines, updated_lines):
+    """Render the precomputed diff model: metric deltas, then each changed symbol side by side"""
+    if model.get('metrics'):
+        st.markdown("#### 📈 Metric changes per function")
+        st.dataframe(
+            [{'function': name, **{metric: f"{before} → {after}" for metric, (before, after) in deltas.items()}}
+             for name, deltas in model['metrics'].items()],
+            hide_index=True,
+        )
+    
+    changed = [entry for entry in model['symbols'] if entry['status'] != 'unchanged']
+    st.markdown(f"#### 🧩 Changed symbols ({len(changed)} of {len(model['symbols'])})")
+    if model.get('truncated'):
+        st.caption(f"Files this long ({model['lines'][0]} / {model['lines'][1]} lines) get no line mapping; "
+                   "changed lines inside symbols are not highlighted.")
+    for entry in changed:
+        title = f"{entry['status']} {entry['kind']} `{entry['symbol']}`"
+        if 'from' in entry:
+            title += f" (was `{entry['from']}`)"
+        with st.expander(title):
+            left, right = st.columns(2)
+            for column, side, lines in ((left, 'original', original_lines), (right, 'modified', updated_lines)):
+                with column:
+                    if side not in entry:
+                        st.caption(f"not in the {side} version")
+                        continue
+                    start, end = entry[side]
+                    spans = entry['changed_lines'].get(side)
+                    st.caption(f"{side}, lines {start}-{end}" + (f"; changed: {_line_ranges(spans)}" if spans else ""))
+                    st.code('\n'.join(lines[start - 1:end]), language='python')
 
 def view_report_page():
     st.header("📊 Step 3: Analysis Report")
     
+    # Recover a previously built report from the on-disk cache (e.g. after a page reload)
+    if st.session_state.analysis_report is None:
+        original_path = session_store.path(st.session_state.session_id, 'original')
+        updated_path = session_store.path(st.session_state.session_id, 'updated')
+        st.session_state.analysis_report = backend.load_cached_report(original_path, updated_path)
+    
     if st.session_state.analysis_report is None:
         st.info("ℹ️ No analysis report available. Please complete Steps 1 and 2 first.")
         return
@@ -444,6 +612,15 @@ def view_report_page():
         disabled=True
     )
     
+    # Side-by-side diff, precomputed with the report
+    original_info = session_store.file_info(st.session_state.session_id, 'original')
+    updated_info = session_store.file_info(st.session_state.session_id, 'updated')
+    if original_info and updated_info:
+        model, original_lines, updated_lines = load_diff(
+            original_info['sha256'], updated_info['sha256'], original_info['path'], updated_info['path'])
+        if model and 'error' not in model:
+            render_diff(model, original_lines, updated_lines)
+    
     # Download report
     report_filename = f"analysis_report_{st.session_state.session_id}.txt"
     st.download_button(
@@ -462,16 +639,15 @@ def view_report_page():
         st.session_state.generated_file_path = None
         st.session_state.updated_file_path = None
         st.session_state.analysis_report = None
+        st.session_state.active_jobs = {}
         st.session_state.session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        st.query_params['session_id'] = st.session_state.session_id
         st.rerun()
 
 def cleanup_session_files():
     """Clean up files from current session"""
     try:
-        if st.session_state.generated_file_path and os.path.exists(st.session_state.generated_file_path):
-            os.remove(st.session_state.generated_file_path)
-        if st.session_state.updated_file_path and os.path.exists(st.session_state.updated_file_path):
-            os.remove(st.session_state.updated_file_path)
+        session_store.delete(st.session_state.session_id)
     except Exception as e:
         st.warning(f"Could not clean up some files: {e}")
 
@@ -481,4 +657,4 @@ if __name__ == "__main__":
         main()
     except Exception as e:
         st.error(f"Application error: {e}")
-        st.write("Debug info:", str(e))
\ No newline at end of file
+        st.write("Debug info:", str(e))
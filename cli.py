@@ -0,0 +1,201 @@
+"""
+Headless batch CLI: generate code for many queries, or analyze many
+original/modified pairs, in-process (no HTTP server) with JSONL output.
+
+    python cli.py generate queries.txt -o generated.jsonl --workers 8
+    python cli.py analyze pairs.jsonl -o reports.jsonl --workers 4 --resume
+    python cli.py analyze projects.tsv --project -o project_reports.jsonl
+    python cli.py history /path/to/repo --range v1.0..HEAD -o history.jsonl
+
+Input files have one job per line: a JSON object, or a bare query (generate)
+/ a tab-separated `original<TAB>modified` path pair (analyze). Use `-` for
+stdin/stdout. Results are written as each job finishes, one JSON object per line.
+"""
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List
+
+import click
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from Config import get_setting
+
+
+def read_jobs(stream, parse_plain: Callable[[str], Dict]) -> Iterator[Dict]:
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        job = json.loads(line) if line.startswith('{') else parse_plain(line)
+        job.setdefault('id', str(number))
+        yield job
+
+
+def finished_ids(output: str) -> set:
+    """Ids already written to `output`, so a rerun with --resume skips them"""
+    if output == '-' or not os.path.exists(output):
+        return set()
+    done = set()
+    with open(output, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by an interrupted run
+            if 'error' not in record:
+                done.add(str(record.get('id')))
+    return done
+
+
+def run_batch(jobs: List[Dict], handler: Callable[[Dict], Dict], output: str, workers: int, resume: bool):
+    """Run `handler` over the jobs on a thread pool, appending one JSON line per finished job"""
+    if resume:
+        done = finished_ids(output)
+        skipped = sum(1 for job in jobs if str(job['id']) in done)
+        jobs = [job for job in jobs if str(job['id']) not in done]
+        if skipped:
+            click.echo(f"Skipping {skipped} jobs already in {output}", err=True)
+
+    def timed(job: Dict) -> Dict:
+        start = time.perf_counter()
+        try:
+            record = handler(job)
+        except Exception as e:
+            record = {'error': f'{type(e).__name__}: {e}'}
+        return {'id': job['id'], **record, 'seconds': round(time.perf_counter() - start, 3)}
+
+    failed = 0
+    sink = click.open_file(output, 'a' if resume else 'w', encoding='utf-8')
+    with sink, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(timed, job) for job in jobs]
+        with click.progressbar(length=len(futures), label='jobs', file=sys.stderr) as bar:
+            for future in as_completed(futures):
+                record = future.result()
+                failed += 'error' in record
+                sink.write(json.dumps(record, default=str) + '\n')
+                sink.flush()
+                bar.update(1)
+    click.echo(f"{len(jobs) - failed} succeeded, {failed} failed", err=True)
+    return failed
+
+
+@click.group()
+def cli():
+    """Batch code generation and analysis without the API server"""
+
+
+@cli.command()
+@click.argument('queries', type=click.File('r', encoding='utf-8'))
+@click.option('-o', '--output', default='-', show_default=True, help='JSONL results file')
+@click.option('-w', '--workers', type=int, default=lambda: get_setting('cli', 'workers', 4), show_default='cli.workers')
+@click.option('--code-dir', type=click.Path(file_okay=False), help='Also write each final_code to <code-dir>/<id>.py')
+@click.option('--resume', is_flag=True, help='Append to --output, skipping ids it already holds')
+def generate(queries, output, workers, code_dir, resume):
+    """Generate code for every query in QUERIES (text lines or JSONL with `query`, `id`, `session_id`)"""
+    from Agent.generator import CodeGenerationState, run_generation
+
+    if code_dir:
+        os.makedirs(code_dir, exist_ok=True)
+
+    def handle(job: Dict) -> Dict:
+        initial_state = CodeGenerationState(
+            user_query=job['query'],
+            generated_code='',
+            complexity_status='complex',
+            feedback='',
+            loop_count=0,
+            conversation_history=[],
+            final_code=None
+        )
+        result = run_generation(initial_state, job.get('session_id') or f"batch-{uuid.uuid4()}")
+        final_code = result.get('final_code')
+        if not final_code:
+            return {'query': job['query'], 'error': 'No final code was produced'}
+        if code_dir:
+            with open(os.path.join(code_dir, f"{os.path.basename(str(job['id']))}.py"), 'w', encoding='utf-8') as f:
+                f.write(final_code)
+        return {
+            'query': job['query'],
+            'final_code': final_code,
+            'reused_generation': result.get('reused_generation'),
+            'execution_report': result.get('execution_report'),
+        }
+
+    jobs = list(read_jobs(queries, lambda line: {'query': line}))
+    sys.exit(1 if run_batch(jobs, handle, output, workers, resume) else 0)
+
+
+def _parse_pair(line: str) -> Dict:
+    original, _, modified = line.partition('\t')
+    if not modified:
+        raise click.BadParameter(f"expected 'original<TAB>modified', got {line!r}")
+    return {'original': original, 'modified': modified}
+
+
+@cli.command()
+@click.argument('pairs', type=click.File('r', encoding='utf-8'))
+@click.option('-o', '--output', default='-', show_default=True, help='JSONL results file')
+@click.option('-w', '--workers', type=int, default=lambda: get_setting('cli', 'workers', 4), show_default='cli.workers')
+@click.option('--force-refresh', is_flag=True, help='Ignore cached reports')
+@click.option('--benchmark-runtime', is_flag=True, help='Also time the functions both versions define, in a sandbox')
+@click.option('--project', is_flag=True, help='Pairs are project trees (directories or zip/tar archives), not single files')
+@click.option('--resume', is_flag=True, help='Append to --output, skipping ids it already holds')
+def analyze(pairs, output, workers, force_refresh, benchmark_runtime, project, resume):
+    """Analyze every pair in PAIRS (TSV lines or JSONL with `original`, `modified`, `id`, `benchmark_inputs`)"""
+    from Difference_Analyzer.analyzer import analyze_project_with_ast_workflow, analyze_with_ast_workflow
+    from Difference_Analyzer.analysis_pool import shutdown_analysis_pool
+
+    def handle_project(job: Dict) -> Dict:
+        result = analyze_project_with_ast_workflow(job['original'], job['modified'])
+        record = {'original': job['original'], 'modified': job['modified']}
+        if 'error' in result:
+            return {**record, 'error': result['error']}
+        if hasattr(result['final_report'], 'model_dump'):
+            result['final_report'] = result['final_report'].model_dump()
+        return {**record, 'report': result}
+
+    def handle(job: Dict) -> Dict:
+        report = analyze_with_ast_workflow(
+            job['original'], job['modified'], force_refresh=force_refresh,
+            benchmark_runtime=benchmark_runtime, benchmark_inputs=job.get('benchmark_inputs'),
+        )
+        record = {'original': job['original'], 'modified': job['modified']}
+        if isinstance(report, str):
+            # The workflow reports failures as strings
+            return {**record, 'error': report}
+        return {**record, 'report': report.model_dump()}
+
+    jobs = list(read_jobs(pairs, _parse_pair))
+    try:
+        failed = run_batch(jobs, handle_project if project else handle, output, workers, resume)
+    finally:
+        shutdown_analysis_pool()
+    sys.exit(1 if failed else 0)
+
+
+@cli.command()
+@click.argument('repo', type=click.Path(exists=True, file_okay=False))
+@click.option('--range', 'rev_range', help='Commit range, e.g. v1.0..HEAD (default: resume from the state file, else all of HEAD)')
+@click.option('-o', '--output', help='JSONL time series to append to (default: Generated/history/<repo>.jsonl)')
+@click.option('--state', help='Resume state file (default: next to the default output)')
+@click.option('--cache-size', type=int, default=4096, show_default=True, help='Parsed blobs kept in memory')
+def history(repo, rev_range, output, state, cache_size):
+    """Append one complexity/structure metrics row per commit of REPO's history (first-parent, oldest first)"""
+    from Difference_Analyzer.history_analyzer import analyze_git_history
+
+    start = time.perf_counter()
+    result = analyze_git_history(repo, rev_range, output_file=output, state_file=state, cache_size=cache_size)
+    if 'error' in result:
+        click.echo(result['error'], err=True)
+        sys.exit(1)
+    click.echo(f"{result['processed_commits']} commits written to {result['output_file']}, "
+               f"{result['skipped_commits']} already there ({time.perf_counter() - start:.1f}s)", err=True)
+
+
+if __name__ == '__main__':
+    cli()
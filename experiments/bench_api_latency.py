@@ -0,0 +1,160 @@
+"""
+API latency benchmark: parsing on request threads vs in the analysis pool.
+
+Serves the LLM-free stages of the report workflow (ast_parser_node and
+structure_analyzer_node) from a uvicorn subprocess, then fires a mix of
+small and large file pairs at it from concurrent clients and reports
+latency percentiles for each request size.
+
+    python experiments/bench_api_latency.py --requests 200 --large-every 10
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def make_source(functions: int, variant: int = 0) -> str:
+    block = (
+        "class Model_{i}:\n"
+        "    def __init__(self, items):\n"
+        "        self.items = items\n"
+        "    def total(self):\n"
+        "        result = 0\n"
+        "        for item in self.items:\n"
+        "            if item > {v}:\n"
+        "                result = result + item\n"
+        "        return result\n\n"
+    )
+    return "".join(block.format(i=i, v=variant) for i in range(functions))
+
+
+def create_app(use_pool: bool):
+    from fastapi import FastAPI
+    from Difference_Analyzer import analyzer
+    from Difference_Analyzer.analyzer import ast_parser_node, structure_analyzer_node
+    from Difference_Analyzer.ast_features import count_changes
+
+    if not use_pool:
+        # Same as "enabled": false in the analysis_pool config section
+        analyzer.get_analysis_pool = lambda: None
+
+    app = FastAPI()
+
+    @app.get("/analyze")
+    def analyze(original: str, modified: str):
+        state = {'original_file': original, 'modified_file': modified, 'structural_changes': {}}
+        state.update(ast_parser_node(state))
+        changes = structure_analyzer_node(state)['structural_changes']
+        return {'changes_detected': count_changes(changes)}
+
+    return app
+
+
+def serve(port: int, use_pool: bool):
+    import uvicorn
+    uvicorn.run(create_app(use_pool), host='127.0.0.1', port=port, log_level='warning')
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(port: int, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start')
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run_load(port: int, pairs, requests: int, large_every: int, concurrency: int):
+    import httpx
+
+    latencies = {'small': [], 'large': []}
+    errors = {'small': 0, 'large': 0}
+    lock = threading.Lock()
+    client = httpx.Client(base_url=f'http://127.0.0.1:{port}', timeout=600)
+
+    def one(i: int):
+        kind = 'large' if i % large_every == 0 else 'small'
+        original, modified = pairs[kind]
+        start = time.perf_counter()
+        response = client.get('/analyze', params={'original': original, 'modified': modified})
+        with lock:
+            if response.status_code == 200:
+                latencies[kind].append(time.perf_counter() - start)
+            else:
+                errors[kind] += 1
+
+    # Warm up the worker pool and caches before measuring
+    one(0)
+    one(1)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(requests)))
+    client.close()
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--large-every', type=int, default=10, help='Every Nth request uses the large pair')
+    parser.add_argument('--large-classes', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--serve', nargs=2, metavar=('PORT', 'POOL'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(int(args.serve[0]), args.serve[1] == 'on')
+        return
+
+    with tempfile.TemporaryDirectory(prefix='bench_api_') as root:
+        pairs = {}
+        for kind, classes in (('small', 20), ('large', args.large_classes)):
+            paths = []
+            for side, variant in (('original', 0), ('modified', 1)):
+                path = os.path.join(root, f'{kind}_{side}.py')
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(make_source(classes, variant))
+                paths.append(path)
+            pairs[kind] = tuple(paths)
+        print(f"large pair: {os.path.getsize(pairs['large'][0]) / 1e6:.1f} MB per file, "
+              f"small pair: {os.path.getsize(pairs['small'][0]) / 1e3:.1f} KB per file")
+
+        for label, pool in (('request thread', 'off'), ('analysis pool', 'on')):
+            port = free_port()
+            server = subprocess.Popen([sys.executable, __file__, '--serve', str(port), pool])
+            try:
+                wait_until_up(port)
+                latencies, errors = run_load(port, pairs, args.requests, args.large_every, args.concurrency)
+            finally:
+                server.terminate()
+                server.wait()
+            for kind, values in latencies.items():
+                if not values:
+                    print(f"{label:>14} {kind:>5}: all {errors[kind]} requests failed")
+                    continue
+                print(f"{label:>14} {kind:>5}: n={len(values):4d}  p50 {percentile(values, 0.5) * 1e3:8.1f} ms  "
+                      f"p99 {percentile(values, 0.99) * 1e3:8.1f} ms  errors {errors[kind]}")
+
+
+if __name__ == '__main__':
+    main()
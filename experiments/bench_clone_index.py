@@ -0,0 +1,66 @@
+"""
+Query latency of the MinHash/LSH clone index as the number of stored sessions grows.
+
+    python experiments/bench_clone_index.py --sizes 1000 10000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Difference_Analyzer.clone_detector import CloneIndex, fingerprint_code
+
+
+def make_source(rng: random.Random, functions: int) -> str:
+    ops = '+-*/%'
+    parts = []
+    for j in range(functions):
+        body = [f"def func_{j}(x, y):"]
+        for _ in range(rng.randrange(2, 6)):
+            kind = rng.randrange(3)
+            if kind == 0:
+                body.append(f"    x = x {rng.choice(ops)} y")
+            elif kind == 1:
+                body.append(f"    if x > {j}:\n        y = [i for i in range(x)]")
+            else:
+                body.append(f"    for i in range(y):\n        x {rng.choice(ops)}= i")
+        body.append("    return x")
+        parts.append("\n".join(body))
+    return "\n\n".join(parts) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory(prefix='bench_clones_') as root:
+        index = CloneIndex(os.path.join(root, 'clone_index.sqlite'))
+        stored, sources = 0, []
+        for size in sorted(args.sizes):
+            start = time.perf_counter()
+            while stored < size:
+                source = make_source(rng, rng.randrange(3, 15))
+                index.add(f"session-{stored}", fingerprint_code(source))
+                if len(sources) < args.queries:
+                    sources.append(source)
+                stored += 1
+            build = time.perf_counter() - start
+
+            # Query with lightly edited copies of stored submissions
+            queries = [fingerprint_code(s.replace('return x', 'return y', 1)) for s in sources]
+            start = time.perf_counter()
+            found = sum(bool(index.query(q, top_k=1)) for q in queries)
+            per_query = (time.perf_counter() - start) / len(queries)
+            print(f"{size:>9} sessions: query {per_query * 1e3:7.2f} ms  "
+                  f"near-duplicates found {found}/{len(queries)}  (indexing took {build:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
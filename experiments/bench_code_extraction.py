@@ -0,0 +1,132 @@
+"""
+Code extraction from LLM responses: the old fence stripping vs extract_code.
+
+For every response in the corpus, reports how often the extracted code
+parses, how often it is exactly the expected program (built-in corpus only)
+and whether clarifying questions were recognized, plus the time per response.
+
+The built-in corpus wraps a few programs in the response shapes Gemini
+produces: bare fences, prose before and after, several blocks (code, usage
+example, shell commands), untagged or tilde fences, CRLF line ends, fences
+indented in a list, truncated output and clarifying questions. Real
+responses can be captured during generation with llm_output.capture_responses
+(written to files.response_corpus) and measured with --corpus.
+
+    python experiments/bench_code_extraction.py
+    python experiments/bench_code_extraction.py --corpus Generated/llm_responses.jsonl
+"""
+import argparse
+import ast
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Agent.markdown_remover import extract_code
+
+PROGRAMS = [
+    "def reverse_words(text):\n    \"\"\"Reverse the order of words in text.\"\"\"\n    return ' '.join(text.split()[::-1])\n\n\n"
+    "if __name__ == '__main__':\n    print(reverse_words('hello big world'))",
+    "class BankAccount:\n    def __init__(self, balance=0):\n        self.balance = balance\n\n"
+    "    def deposit(self, amount):\n        if amount <= 0:\n            raise ValueError('Amount must be positive')\n"
+    "        self.balance += amount\n\n\naccount = BankAccount()\naccount.deposit(50)\nprint(account.balance)",
+    "import csv\n\n\ndef average_price(path):\n    with open(path, newline='') as f:\n"
+    "        prices = [float(row['price']) for row in csv.DictReader(f)]\n    return sum(prices) / len(prices) if prices else 0.0",
+]
+
+QUESTIONS = [
+    "To write this for you I need a bit more information:\n\n1. **Which website should be scraped?**\n"
+    "2. Should the links be saved to a file or printed?\n",
+    "Could you clarify what kind of sorting you need? For example, should it be ascending or descending?",
+    "* What should happen when the list is empty?\n* Do you want the result rounded?",
+]
+
+
+def shapes(program: str):
+    """(response, expected code) pairs for one program"""
+    yield f"```python\n{program}\n```", program
+    yield f"Here is a simple solution:\n\n```python\n{program}\n```\n\nThis keeps the code easy to follow.", program
+    yield f"```\n{program}\n```", program
+    yield f"~~~py\n{program}\n~~~", program
+    yield f"```python\r\n{program.replace(chr(10), chr(13) + chr(10))}\r\n```\r\n", program
+    yield (f"```python\n{program}\n```\n\n**Example usage:**\n```python\nprint('done')\n```\n\n"
+           f"Run it with:\n```bash\npython main.py\n```"), program
+    yield "1. Save this as `main.py`:\n   ```python\n" + '\n'.join('   ' + line if line else '' for line in program.split('\n')) + "\n   ```", program
+    yield f"Sure! Here's the code.\n{program}\n\nLet me know if you need changes.", program
+    yield program, program
+    yield f"```python\n{program}\n", program  # opening fence only: cut off before the closing one
+
+
+def builtin_corpus():
+    corpus = []
+    for program in PROGRAMS:
+        corpus += [{'response': response, 'expected': expected, 'kind': 'code'} for response, expected in shapes(program)]
+    corpus += [{'response': text, 'expected': '', 'kind': 'clarification'} for text in QUESTIONS]
+    return corpus
+
+
+def legacy_clean(code: str) -> str:
+    # clean_code_output before extract_code
+    if code.startswith('```python'):
+        code = code[9:]
+    elif code.startswith('```'):
+        code = code[3:]
+    if code.endswith('```'):
+        code = code[:-3]
+    return code.strip()
+
+
+def parses(code: str) -> bool:
+    try:
+        ast.parse(code)
+    except (SyntaxError, ValueError):
+        return False
+    return True
+
+
+def evaluate(corpus, extract, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [extract(item['response']) for item in corpus]
+    seconds = (time.perf_counter() - start) / (repeat * len(corpus))
+    coded = [(item, code) for item, (kind, code) in zip(corpus, results) if item.get('kind') != 'clarification']
+    asks = [kind for item, (kind, _) in zip(corpus, results) if item.get('kind') == 'clarification']
+    return {
+        'parses': sum(parses(code) for _, code in coded) / max(1, len(coded)),
+        'exact': sum(code == item['expected'].strip() for item, code in coded if 'expected' in item) / max(1, len(coded)),
+        'clarifications': f"{sum(kind == 'clarification' for kind in asks)}/{len(asks)}",
+        'us': seconds * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help='JSONL of captured responses ({"query", "response"} per line)')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding='utf-8') as f:
+            corpus = [json.loads(line) for line in f if line.strip()]
+    else:
+        corpus = builtin_corpus()
+
+    def new(text):
+        extraction = extract_code(text)
+        return extraction.kind, extraction.code
+
+    def old(text):
+        return 'code', legacy_clean(text)
+
+    print(f"{len(corpus)} responses{'' if args.corpus else ' (built-in corpus)'}")
+    print(f"{'extractor':<20} {'code parses':>12} {'exact match':>12} {'questions found':>16} {'us/response':>12}")
+    for name, extract in (('clean_code_output', old), ('extract_code', new)):
+        stats = evaluate(corpus, extract, args.repeat)
+        exact = f"{stats['exact']:.0%}" if not args.corpus else 'n/a'
+        print(f"{name:<20} {stats['parses']:>12.0%} {exact:>12} {stats['clarifications']:>16} {stats['us']:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Memory and diff-time benchmark: extract_features dicts vs FileFeatures.
+
+    python experiments/bench_file_features.py --functions 20000
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Difference_Analyzer.ast_features import FileFeatures, extract_features
+
+
+def make_source(functions: int, offset: int = 0) -> str:
+    block = (
+        "def func_{i}(items):\n"
+        "    total = 0\n"
+        "    count = 0\n"
+        "    for item in items:\n"
+        "        total = total + item\n"
+        "        count = count + 1\n"
+        "    result = total / max(count, 1)\n"
+        "    return result\n\n"
+    )
+    return "".join(block.format(i=i + offset) for i in range(functions))
+
+
+def dict_diff(original, modified):
+    # The set-based diff structure_analyzer_node used before FileFeatures
+    return {
+        category: {
+            'added': list(set(modified[category]) - set(original[category])),
+            'removed': list(set(original[category]) - set(modified[category])),
+            'common': list(set(original[category]) & set(modified[category])),
+        }
+        for category in ('functions', 'classes', 'imports')
+    }
+
+
+def retained_bytes(build):
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current
+
+
+def time_call(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--functions', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    original_features = extract_features(make_source(args.functions), 'original.py')
+    modified_features = extract_features(make_source(args.functions, offset=args.functions // 10), 'modified.py')
+
+    # Fresh containers over the same (compiler-interned) name strings, as in the real workflow
+    def rebuild(features):
+        return {k: (list(v) if isinstance(v, list) else dict(v)) for k, v in features.items()}
+
+    dict_form, dict_bytes = retained_bytes(lambda: (rebuild(original_features), rebuild(modified_features)))
+    compact_form, compact_bytes = retained_bytes(
+        lambda: (FileFeatures.from_features(rebuild(original_features)), FileFeatures.from_features(rebuild(modified_features)))
+    )
+
+    dict_time = time_call(lambda: dict_diff(*dict_form), args.repeat)
+    compact_time = time_call(lambda: compact_form[0].diff(compact_form[1]), args.repeat)
+
+    print(f"functions per file: {args.functions}, variable stores per file: {len(original_features['variables'])}")
+    print(f"retained memory  dict: {dict_bytes / 1e6:8.2f} MB   FileFeatures: {compact_bytes / 1e6:8.2f} MB")
+    print(f"diff time        dict: {dict_time * 1e3:8.2f} ms   FileFeatures: {compact_time * 1e3:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Lookup latency of the generation reuse index at large entry counts.
+
+Fills the index with synthetic queries (Zipf-distributed vocabulary) and
+times lookups of lightly reworded stored queries and of unrelated ones.
+
+    python experiments/bench_generation_index.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Agent.generation_index import GenerationIndex
+
+VOCABULARY = [f"term{i}" for i in range(20000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+CODES = [f"def solve_{i}(data):\n    return [x * {i} for x in data]\n" for i in range(50)]
+
+
+def make_query(rng: random.Random) -> str:
+    return ' '.join(rng.choices(VOCABULARY, WEIGHTS, k=rng.randrange(4, 10)))
+
+
+def reword(rng: random.Random, query: str) -> str:
+    words = query.split()
+    words[rng.randrange(len(words))] = 'please'  # drop one term (stopword)
+    return 'write a program to ' + ' '.join(words)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory(prefix='bench_generation_') as root:
+        index = GenerationIndex(os.path.join(root, 'generation_index.sqlite'))
+        stored, samples = 0, []
+        for size in sorted(args.sizes):
+            start = time.perf_counter()
+            while stored < size:
+                batch = [(make_query(rng), rng.choice(CODES)) for _ in range(min(10000, size - stored))]
+                index.add_many(batch)
+                samples.extend(query for query, _ in batch[:args.lookups])
+                stored += len(batch)
+            build = time.perf_counter() - start
+
+            for label, queries in (('reworded', [reword(rng, q) for q in rng.sample(samples, min(args.lookups, len(samples)))]),
+                                   ('unrelated', [make_query(rng) for _ in range(args.lookups)])):
+                timings, hits = [], 0
+                for query in queries:
+                    begin = time.perf_counter()
+                    hits += index.lookup(query, min_similarity=0.75) is not None
+                    timings.append(time.perf_counter() - begin)
+                timings.sort()
+                print(f"{size:>9} entries {label:>9}: p50 {timings[len(timings) // 2] * 1e3:6.2f} ms  "
+                      f"p99 {timings[int(len(timings) * 0.99)] * 1e3:6.2f} ms  hits {hits}/{len(queries)}")
+            print(f"{'':>9} (filling to {size} entries took {build:.0f}s)")
+
+
+if __name__ == '__main__':
+    main()
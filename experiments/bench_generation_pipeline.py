@@ -0,0 +1,116 @@
+"""
+Wall time per generation: sequential generate -> check vs the pipelined mode.
+
+Runs the real generation graph (checkpointing and sandbox verification as
+configured) with stub LLMs that sleep like the real ones: the generator
+streams its draft in chunks after a time-to-first-token delay, the checker
+answers after a fixed latency and accepts the draft of round `rounds`.
+With --syntax-error, the first draft of every generation has a syntax error
+(the pipelined mode sends it back without an LLM check).
+
+    python experiments/bench_generation_pipeline.py --repeat 3
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Config import load_config
+
+os.environ.setdefault('GEMINI_API_KEY', 'dummy')
+load_config().setdefault('refinement', {})['adaptive'] = False
+
+from langchain_core.messages import AIMessageChunk
+
+import Agent.generator as generator
+
+
+def draft(round_number: int, broken: bool) -> str:
+    header = "def total(values)\n" if broken else "def total(values):\n"
+    body = ''.join(f"    # step {i}\n" for i in range(20))
+    return (f"```python\nROUND = {round_number}\n\n{header}{body}    return sum(values)\n\n\n"
+            f"def main():\n    print(total([1, 2, 3]))\n\n\nif __name__ == '__main__':\n    main()\n```")
+
+
+class StubLLM:
+    def __init__(self, args):
+        self.args, self.round = args, 0
+
+    def _next(self) -> str:
+        self.round += 1
+        return draft(self.round, self.args.syntax_error and self.round == 1)
+
+    def invoke(self, messages):
+        time.sleep(self.args.ttft + self.args.stream_seconds)
+        return AIMessageChunk(content=self._next())
+
+    def stream(self, messages):
+        text = self._next()
+        time.sleep(self.args.ttft)
+        pieces = [text[i:i + 16] for i in range(0, len(text), 16)]
+        for piece in pieces:
+            time.sleep(self.args.stream_seconds / len(pieces))
+            yield AIMessageChunk(content=piece)
+
+
+class StubChecker:
+    def __init__(self, args, rounds):
+        self.args, self.rounds, self.calls = args, rounds, 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        time.sleep(self.args.check_seconds)
+        round_number = int(re.search(r'ROUND = (\d+)', messages[-1].content).group(1))
+        accepted = round_number >= self.rounds
+        return generator.CodeEvaluation(complexity_status='simple' if accepted else 'complex',
+                                        feedback='' if accepted else 'Use fewer comments.')
+
+
+def run_once(args, rounds: int, pipelined: bool):
+    load_config()['generation_pipeline']['enabled'] = pipelined
+    checker = StubChecker(args, rounds)
+    generator.google_llm, generator.structured_google_llm = StubLLM(args), checker
+    start = time.perf_counter()
+    state = generator.run_generation(generator.CodeGenerationState(
+        user_query='sum a list of numbers', generated_code='', complexity_status='complex', feedback='',
+        loop_count=0, conversation_history=[], final_code=None,
+    ), f"bench-{uuid.uuid4()}")
+    elapsed = time.perf_counter() - start
+    assert state['complexity_status'] == 'simple', state['refinement']
+    return elapsed, state['loop_count'], checker.calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, nargs='+', default=[1, 3])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--ttft', type=float, default=0.4, help='Seconds to the first generated token')
+    parser.add_argument('--stream-seconds', type=float, default=1.2, help='Seconds to stream one draft')
+    parser.add_argument('--check-seconds', type=float, default=1.0, help='Latency of one complexity check')
+    parser.add_argument('--syntax-error', action='store_true', help='First draft of each generation does not parse')
+    args = parser.parse_args()
+
+    generator.generation_index = None
+    generator.refinement_stats = None
+    run_once(args, 1, True)  # warm up the sandbox pool and lazy imports
+    print(f"verify_execution: {generator.VERIFY_EXECUTION}, checkpointing: {generator.checkpointer is not None}")
+    print(f"{'rounds':>6} {'mode':<11} {'loops':>6} {'LLM checks':>11} {'median s':>9} {'per loop s':>11}")
+    for rounds in args.rounds:
+        medians = {}
+        for pipelined in (False, True):
+            runs = [run_once(args, rounds, pipelined) for _ in range(args.repeat)]
+            medians[pipelined] = statistics.median(r[0] for r in runs)
+            loops, checks = runs[0][1], runs[0][2]
+            print(f"{rounds:>6} {'pipelined' if pipelined else 'sequential':<11} {loops:>6} {checks:>11} "
+                  f"{medians[pipelined]:>9.2f} {medians[pipelined] / loops:>11.2f}")
+        print(f"{'':>6} saved {medians[False] - medians[True]:.2f}s per generation "
+              f"({1 - medians[True] / medians[False]:.0%})")
+
+
+if __name__ == '__main__':
+    main()
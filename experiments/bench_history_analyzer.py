@@ -0,0 +1,116 @@
+"""
+Benchmark for git-history analysis on a synthetic 10k-commit repository.
+
+The repository is written with `git fast-import` (one commit per step, each
+editing a few of `--files` modules), then analyze_git_history() runs over the
+whole history, once more to check that the resumed run has nothing to do, and
+over an explicit range overlapping the first run to check that no rows are
+written twice.
+
+    python experiments/bench_history_analyzer.py --commits 10000 --files 200
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Difference_Analyzer.history_analyzer import analyze_git_history
+
+
+def make_module(rng: random.Random, index: int, version: int) -> str:
+    lines = ["import os", ""]
+    for f in range(rng.randint(3, 12)):
+        lines += [
+            f"def func_{index}_{f}_{version % 5}(items):",
+            "    total = 0",
+            "    for item in items:",
+            f"        if item % {rng.randint(2, 9)} == 0:",
+            "            total += item",
+            "    return total",
+            "",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def fast_import_stream(commits: int, files: int, seed: int = 0):
+    rng = random.Random(seed)
+    versions = [0] * files
+    for n in range(commits):
+        touched = range(files) if n == 0 else rng.sample(range(files), rng.randint(1, 3))
+        yield f"commit refs/heads/main\ncommitter Bench <bench@example.com> {1600000000 + n * 60} +0000\n"
+        message = f"commit {n}\n".encode()
+        yield f"data {len(message)}\n".encode() + message
+        for index in touched:
+            versions[index] += 1
+            body = make_module(rng, index, versions[index]).encode()
+            yield f"M 100644 inline pkg{index % 10}/module_{index}.py\ndata {len(body)}\n".encode() + body + b"\n"
+        yield "\n"
+
+
+def build_repo(root: str, commits: int, files: int) -> str:
+    repo = os.path.join(root, 'repo')
+    subprocess.run(['git', 'init', '-q', '-b', 'main', repo], check=True)
+    process = subprocess.Popen(['git', '-C', repo, 'fast-import', '--quiet'], stdin=subprocess.PIPE)
+    for chunk in fast_import_stream(commits, files):
+        process.stdin.write(chunk.encode() if isinstance(chunk, str) else chunk)
+    process.stdin.close()
+    if process.wait():
+        raise RuntimeError('git fast-import failed')
+    subprocess.run(['git', '-C', repo, 'checkout', '-q', 'main'], check=True)
+    return repo
+
+
+def count_rows(output_file: str) -> tuple:
+    with open(output_file, 'r', encoding='utf-8') as f:
+        commits = [json.loads(line)['commit'] for line in f]
+    return len(commits), len(set(commits))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--commits', type=int, default=10000)
+    parser.add_argument('--files', type=int, default=200)
+    parser.add_argument('--cache-size', type=int, default=4096)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='bench_history_')
+    try:
+        start = time.perf_counter()
+        repo = build_repo(root, args.commits, args.files)
+        print(f"    build: {time.perf_counter() - start:.1f}s  commits={args.commits} files={args.files}")
+        output, state = os.path.join(root, 'history.jsonl'), os.path.join(root, 'history.state.json')
+
+        runs = (
+            ('full', None),
+            ('resume', None),
+            ('overlap', f"main~{args.commits // 2}..main~{args.commits // 4}"),
+        )
+        for label, rev_range in runs:
+            start = time.perf_counter()
+            result = analyze_git_history(repo, rev_range, output_file=output, state_file=state,
+                                         cache_size=args.cache_size)
+            elapsed = time.perf_counter() - start
+            if 'error' in result:
+                print(f"{label:>9}: {result['error']}")
+                return
+            rate = result['processed_commits'] / elapsed if elapsed else 0
+            print(f"{label:>9}: {elapsed:.2f}s  written={result['processed_commits']} "
+                  f"skipped={result['skipped_commits']} ({rate:.0f} commits/s)")
+
+        rows, unique = count_rows(output)
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"     rows: {rows} ({unique} unique)  peak RSS {peak_mb:.0f} MB")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
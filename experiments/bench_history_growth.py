@@ -0,0 +1,78 @@
+"""
+Size of conversation_history per refinement loop under each history policy.
+
+Feeds the generator's history reducer one draft message (generated code) and
+one complexity-check message per loop, as the graph does, and after selected
+loops reports the message count, the checkpoint-serialized size (LangGraph's
+JsonPlusSerializer, what the SQLite checkpointer writes per step), the time to
+serialize it, and the traced memory the history holds.
+
+    python experiments/bench_history_growth.py --loops 50 --draft-lines 120
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.graph.message import add_messages
+
+import Storage.draft_store as draft_store
+from Agent.history_policy import HISTORY_POLICIES, apply_history_policy
+
+
+def make_draft(loop: int, lines: int) -> str:
+    body = ''.join(f"    total_{i} = sum(value * {loop + i} for value in items if value % {i + 2} == 0)\n"
+                   for i in range(lines))
+    return f"def solve_{loop}(items):\n{body}    return total_0\n"
+
+
+def measure(history, serializer, repeat: int = 20):
+    kind, data = serializer.dumps_typed(history)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        serializer.dumps_typed(history)
+    return len(history), len(data), (time.perf_counter() - start) / repeat
+
+
+def run_policy(policy: str, loops: int, draft_lines: int, checkpoints):
+    serializer = JsonPlusSerializer()
+    history, rows = [], []
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for loop in range(1, loops + 1):
+        for message in (HumanMessage(content=f"Generated Code (Loop {loop}):\n{make_draft(loop, draft_lines)}"),
+                        HumanMessage(content=f"Complexity Check: complex. Feedback: loop {loop} still nests too deep")):
+            history = apply_history_policy(add_messages(history, [message]), policy)
+        if loop in checkpoints:
+            held = tracemalloc.get_traced_memory()[0] - baseline
+            rows.append((loop, *measure(history, serializer), held))
+    tracemalloc.stop()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--loops', type=int, default=50)
+    parser.add_argument('--draft-lines', type=int, default=120)
+    args = parser.parse_args()
+    checkpoints = sorted({1, 5, 10, 25, args.loops} & set(range(1, args.loops + 1)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Referenced drafts go to a throwaway store
+        draft_store._draft_store = draft_store.DraftStore(root=tmp)
+        print(f"draft size ~{len(make_draft(1, args.draft_lines)) / 1024:.1f} KB, 2 messages per loop")
+        run_policy('keep_all', 2, args.draft_lines, [])  # warm up lazy imports and caches
+        print(f"{'policy':<10} {'loop':>5} {'messages':>9} {'serialized KB':>14} {'serialize ms':>13} {'held KB':>9}")
+        for policy in HISTORY_POLICIES:
+            for loop, count, size, seconds, held in run_policy(policy, args.loops, args.draft_lines, checkpoints):
+                print(f"{policy:<10} {loop:>5} {count:>9} {size / 1024:>14.1f} {seconds * 1e3:>13.2f} {held / 1024:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
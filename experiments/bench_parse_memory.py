@@ -0,0 +1,100 @@
+"""
+Peak-RSS benchmark for parsing large uploads.
+
+Compares the old flow (both sources read into memory and full feature dicts
+kept side by side) with the file-based flow used by ast_parser_node (one file
+parsed at a time, only compact summaries kept). Each measurement runs in a
+fresh subprocess so ru_maxrss is not polluted by earlier runs.
+
+    python experiments/bench_parse_memory.py --sizes 1 10 50
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def make_source(size_mb: float) -> str:
+    block = (
+        "def func_{i}(items):\n"
+        "    total = 0\n"
+        "    for item in items:\n"
+        "        if item > {i}:\n"
+        "            total = total + item\n"
+        "    return total\n\n"
+    )
+    target, parts, i, size = int(size_mb * 1024 * 1024), [], 0, 0
+    while size < target:
+        chunk = block.format(i=i)
+        parts.append(chunk)
+        size += len(chunk)
+        i += 1
+    return "".join(parts)
+
+
+def measure(mode: str, original: str, modified: str):
+    from Difference_Analyzer.ast_features import extract_features, extract_file_features, diff_features
+
+    start = time.perf_counter()
+    if mode == 'legacy':
+        with open(original, 'r', encoding='utf-8') as f:
+            original_code = f.read()
+        with open(modified, 'r', encoding='utf-8') as f:
+            modified_code = f.read()
+        state = {
+            'original_code': original_code,
+            'modified_code': modified_code,
+            'original_ast': extract_features(original_code, 'original.py'),
+            'modified_ast': extract_features(modified_code, 'modified.py'),
+        }
+    else:
+        state = {
+            'original_ast': extract_file_features(original, 'original.py'),
+            'modified_ast': extract_file_features(modified, 'modified.py'),
+        }
+    diff_features(state['original_ast'], state['modified_ast'])
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is KiB on Linux
+    print(json.dumps({'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 'seconds': elapsed}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 10, 50], help='Input sizes in MB')
+    parser.add_argument('--measure', nargs=3, metavar=('MODE', 'ORIGINAL', 'MODIFIED'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    with tempfile.TemporaryDirectory(prefix='bench_parse_') as root:
+        for size in args.sizes:
+            original, modified = os.path.join(root, 'original.py'), os.path.join(root, 'modified.py')
+            source = make_source(size)
+            with open(original, 'w', encoding='utf-8') as f:
+                f.write(source)
+            with open(modified, 'w', encoding='utf-8') as f:
+                f.write(source.replace('total = total + item', 'total += item'))
+            del source
+
+            for mode in ('legacy', 'streaming'):
+                completed = subprocess.run(
+                    [sys.executable, __file__, '--measure', mode, original, modified],
+                    capture_output=True, text=True,
+                )
+                if completed.returncode != 0:
+                    print(f"{size:>6.1f} MB  {mode:>9}: failed (exit {completed.returncode}, likely out of memory)")
+                    continue
+                result = json.loads(completed.stdout)
+                print(f"{size:>6.1f} MB  {mode:>9}: peak RSS {result['peak_rss_mb']:8.1f} MB  time {result['seconds']:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
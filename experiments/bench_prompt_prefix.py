@@ -0,0 +1,120 @@
+"""
+Input tokens and prompt-building time per generation: inline prompts vs cached prefixes.
+
+Runs the real generation graph with stub LLMs that accept the draft in round
+`--rounds` and reads the per-generation prompt_usage account (estimated
+tokens, see Agent.prompt_cache.estimate_tokens). Every generate/check call
+repeats one of two system prefixes; with prefix caching those tokens are
+billed at `--cached-rate` of the normal input price after the first call.
+Then times building the request the old way (an f-string around the whole
+system prompt) against the precompiled [system, user] pair.
+
+Provider-side latency saved by cache hits needs the real API and is not
+measured here.
+
+    python experiments/bench_prompt_prefix.py --rounds 1 3 5
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Config import load_config
+
+os.environ.setdefault('GEMINI_API_KEY', 'dummy')
+load_config().setdefault('sandbox', {})['enabled'] = False
+load_config().setdefault('refinement', {})['adaptive'] = False
+
+from langchain_core.messages import AIMessageChunk, HumanMessage
+
+import Agent.generator as generator
+from Agent.custom_prompt import SYSTEM_PROMPT, GENERATION_REQUEST
+
+QUERY = 'read a csv file and print the average of the price column'
+DRAFT = "def average_price(path):\n" + "    total = 0\n" * 20 + "    return total\n"
+
+
+class StubLLM:
+    def invoke(self, messages):
+        return type('Response', (), {'content': DRAFT, 'usage_metadata': None})()
+
+    def stream(self, messages):
+        yield AIMessageChunk(content=self.invoke(messages).content)
+
+
+class StubChecker:
+    def __init__(self, rounds):
+        self.rounds, self.calls = rounds, 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        accepted = self.calls >= self.rounds
+        return generator.CodeEvaluation(complexity_status='simple' if accepted else 'complex',
+                                        feedback='' if accepted else 'Split the loop into a helper function.')
+
+
+def usage_for(rounds: int) -> dict:
+    generator.google_llm, generator.structured_google_llm = StubLLM(), StubChecker(rounds)
+    state = generator.run_generation(generator.CodeGenerationState(
+        user_query=QUERY, generated_code='', complexity_status='complex', feedback='',
+        loop_count=0, conversation_history=[], final_code=None,
+    ), f"bench-{uuid.uuid4()}")
+    return state['prompt_usage']
+
+
+def time_per_call(fn, repeat: int = 20000) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, nargs='+', default=[1, 3, 5])
+    parser.add_argument('--cached-rate', type=float, default=0.25, help='Price of a cached input token relative to an uncached one')
+    args = parser.parse_args()
+
+    generator.generation_index = None
+    generator.refinement_stats = None
+    min_tokens = load_config().get('prompt_cache', {}).get('min_prefix_tokens', 1024)
+    for prefix in (generator.GENERATION_PREFIX, generator.COMPLEXITY_PREFIX):
+        eligible = 'cacheable' if prefix.tokens >= min_tokens else f'below the {min_tokens}-token cache minimum'
+        print(f"prefix {prefix.name}: ~{prefix.tokens} tokens ({eligible})")
+    print(f"{'rounds':>6} {'calls':>6} {'input tokens':>13} {'prefix share':>13} {'billed if cached':>17} {'saved':>7}")
+    for rounds in args.rounds:
+        usage = usage_for(rounds)
+        total = usage['prefix_tokens'] + usage['dynamic_tokens']
+        # The first call with each prefix writes the cache; later ones read it
+        distinct = min(usage['calls'], 2)
+        first_calls = generator.GENERATION_PREFIX.tokens + (generator.COMPLEXITY_PREFIX.tokens if distinct > 1 else 0)
+        cached = usage['prefix_tokens'] - first_calls
+        billed = total - cached * (1 - args.cached_rate)
+        print(f"{rounds:>6} {usage['calls']:>6} {total:>13} {usage['prefix_tokens'] / total:>12.0%} "
+              f"{billed:>17.0f} {1 - billed / total:>6.0%}")
+
+    feedback = 'Split the loop into a helper function.'
+
+    def inline():
+        prompt = f"""
+{SYSTEM_PROMPT}
+
+User Request: {QUERY}
+Previous Attempt Feedback: {feedback}
+
+Please generate improved, simpler code based on the feedback.
+"""
+        return [HumanMessage(content=prompt)]
+
+    def precompiled():
+        return generator.GENERATION_PREFIX.messages(GENERATION_REQUEST.format(query=QUERY))
+
+    print(f"request build: inline {time_per_call(inline) * 1e6:.1f} us, "
+          f"precompiled prefix {time_per_call(precompiled) * 1e6:.1f} us per call")
+
+
+if __name__ == '__main__':
+    main()
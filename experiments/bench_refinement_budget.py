@@ -0,0 +1,144 @@
+"""
+LLM calls per generation: fixed refinement cap vs adaptive loop budgets.
+
+Runs the real generation graph with stub LLMs that follow a convergence
+profile per query category:
+
+  string     accepted after 1-2 rounds
+  algorithm  accepted after 2-4 rounds, drafts get simpler each round
+  web        never accepted, drafts stop getting simpler after round 3
+  oop        accepted in round 5 a third of the time, else never
+
+The baseline ends only on 'simple' or max_refinement_loops; the adaptive
+run adds stall detection and per-category budgets learned from a warm-up
+phase (recorded in a temporary stats database).
+
+    python experiments/bench_refinement_budget.py --queries 40
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import uuid
+from collections import defaultdict
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Config import load_config
+
+os.environ.setdefault('GEMINI_API_KEY', 'dummy')
+# Execution checks and the generation index would hide the loop behaviour being measured
+load_config().setdefault('sandbox', {})['enabled'] = False
+
+from langchain_core.messages import AIMessageChunk
+
+import Agent.generator as generator
+from Agent.refinement_controller import RefinementStats
+
+QUERIES = {
+    'string': 'reverse every word in a string',
+    'algorithm': 'binary search in a sorted list',
+    'web': 'scrape all links from a website url',
+    'oop': 'bank account class with deposit and withdraw',
+}
+
+
+def converges_at(category: str, rng: random.Random):
+    """Round at which the checker accepts the draft, or None if it never does"""
+    if category == 'string':
+        return rng.choice([1, 1, 2])
+    if category == 'algorithm':
+        return rng.choice([2, 3, 3, 4])
+    if category == 'oop':
+        return 5 if rng.random() < 1 / 3 else None
+    return None
+
+
+def draft(category: str, round_number: int) -> str:
+    # Drafts shrink while refinement helps; 'web' plateaus after round 3
+    branches = max(1, 6 - round_number) if category != 'web' else max(3, 6 - round_number)
+    body = ''.join(f"    if x == {i}:\n        return {i}\n" for i in range(branches))
+    return f"def solve(x):\n{body}    return None\n"
+
+
+class StubLLM:
+    def __init__(self, counter, plan):
+        self.counter, self.plan = counter, plan
+
+    def invoke(self, messages):
+        self.counter['calls'] += 1
+        text = messages[-1].content
+        category = next(c for c, q in QUERIES.items() if q in text)
+        self.plan['round'][category] += 1
+        return type('Response', (), {'content': draft(category, self.plan['round'][category])})()
+
+    def stream(self, messages):
+        yield AIMessageChunk(content=self.invoke(messages).content)
+
+
+class StubChecker:
+    def __init__(self, counter, plan):
+        self.counter, self.plan = counter, plan
+
+    def invoke(self, messages):
+        self.counter['calls'] += 1
+        category = self.plan['current']
+        accepted = self.plan['target'] is not None and self.plan['round'][category] >= self.plan['target']
+        return generator.CodeEvaluation(complexity_status='simple' if accepted else 'complex',
+                                        feedback='' if accepted else 'Simplify the branching.')
+
+
+def run(categories, adaptive: bool, stats, seed: int):
+    load_config().setdefault('refinement', {})['adaptive'] = adaptive
+    generator.refinement_stats = stats
+    counter, plan = {'calls': 0}, {'round': defaultdict(int)}
+    generator.google_llm, generator.structured_google_llm = StubLLM(counter, plan), StubChecker(counter, plan)
+    rng = random.Random(seed)
+    calls, accepted = defaultdict(list), defaultdict(int)
+    for category in categories:
+        plan['current'], plan['target'] = category, converges_at(category, rng)
+        plan['round'][category] = 0
+        before = counter['calls']
+        state = generator.run_generation(generator.CodeGenerationState(
+            user_query=QUERIES[category], generated_code='', complexity_status='complex', feedback='',
+            loop_count=0, conversation_history=[], final_code=None,
+        ), f"bench-{uuid.uuid4()}")
+        calls[category].append(counter['calls'] - before)
+        accepted[category] += state['complexity_status'] == 'simple'
+    return calls, accepted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=40, help='Measured queries per category')
+    parser.add_argument('--warmup', type=int, default=10, help='Queries per category used to learn budgets')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    generator.generation_index = None
+    random.seed(args.seed)
+    workload = [c for c in QUERIES for _ in range(args.queries)]
+    random.Random(args.seed).shuffle(workload)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline_calls, baseline_ok = run(workload, False, None, args.seed)
+        stats = RefinementStats(os.path.join(tmp, 'stats.sqlite'))
+        run([c for c in QUERIES for _ in range(args.warmup)], True, stats, args.seed + 1)
+        adaptive_calls, adaptive_ok = run(workload, True, stats, args.seed)
+        budgets = {c: stats.summary(c) for c in QUERIES}
+
+    print(f"{'category':<10} {'fixed calls':>12} {'adaptive':>9} {'accepted fixed/adaptive':>25}")
+    for category in QUERIES:
+        fixed, adapt = baseline_calls[category], adaptive_calls[category]
+        print(f"{category:<10} {sum(fixed) / len(fixed):12.2f} {sum(adapt) / len(adapt):9.2f} "
+              f"{baseline_ok[category]:>12}/{adaptive_ok[category]:<12} "
+              f"(history: {budgets[category]['runs']} runs, {budgets[category]['convergence_rate']} converged)")
+    total_fixed = sum(map(sum, baseline_calls.values())) / len(workload)
+    total_adaptive = sum(map(sum, adaptive_calls.values())) / len(workload)
+    print(f"{'all':<10} {total_fixed:12.2f} {total_adaptive:9.2f}   "
+          f"({(1 - total_adaptive / total_fixed) * 100:.0f}% fewer LLM calls per generation)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Load test of `main.py --mode prod`: one worker against N workers.
+
+Starts the production server for each worker count, seeds sessions through
+SessionStore/CloneIndex, then drives GET /session/{id}/similar (fingerprint
+plus clone-index query: CPU and SQLite, no LLM) from concurrent client
+threads and reports throughput and latency. Finally checks that the shared
+rate limit is enforced once across all workers, not once per worker.
+
+    python experiments/bench_server_workers.py --workers 4 --requests 2000
+
+Throughput scales with worker count only up to the number of cores.
+"""
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Config import PROJECT_ROOT, get_setting
+from Difference_Analyzer.clone_detector import CloneIndex, fingerprint_code
+from Storage.session_store import SessionStore
+from Storage.shared_state import get_shared_state
+
+SAMPLE = '''
+def process_{i}(items):
+    seen = set()
+    result = []
+    for item in items:
+        if item % {m} == 0 and item not in seen:
+            seen.add(item)
+            result.append(item * {i})
+    return sorted(result)
+'''
+
+
+def seed_sessions(count: int) -> list:
+    store, index = SessionStore(), CloneIndex()
+    ids = []
+    for i in range(count):
+        session_id = f"bench-{uuid.uuid4()}"
+        code = SAMPLE.format(i=i, m=i % 7 + 2)
+        store.save(session_id, 'original', code)
+        index.add(session_id, fingerprint_code(code))
+        ids.append(session_id)
+    return ids
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    env = dict(os.environ, GEMINI_API_KEY=os.environ.get('GEMINI_API_KEY', 'dummy'))
+    proc = subprocess.Popen(
+        [sys.executable, 'main.py', '--mode', 'prod', '--workers', str(workers), '--host', '127.0.0.1', '--port', str(port)],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/')
+            if conn.getresponse().status == 200:
+                # Give the remaining workers a moment to finish booting
+                time.sleep(1 + 0.5 * workers)
+                return proc
+        except OSError:
+            time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError(f"server with {workers} workers did not start")
+
+
+def stop_server(proc: subprocess.Popen):
+    proc.terminate()
+    try:
+        proc.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def load(port: int, paths: list, concurrency: int) -> dict:
+    local = threading.local()
+
+    def request(path: str):
+        if not hasattr(local, 'conn'):
+            local.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        start = time.perf_counter()
+        local.conn.request('GET', path)
+        response = local.conn.getresponse()
+        response.read()
+        return time.perf_counter() - start, response.status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(request, paths))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'rps': len(paths) / elapsed,
+        'p50': statistics.median(latencies) * 1e3,
+        'p99': latencies[int(len(latencies) * 0.99) - 1] * 1e3,
+        'errors': sum(status != 200 for _, status in results),
+    }
+
+
+def check_rate_limit(port: int, concurrency: int) -> tuple:
+    """Send limit + extra requests spread over every worker; exactly `extra` must be refused"""
+    limit = get_setting('rate_limit', 'requests_per_window', 30)
+    extra = 10
+    state = get_shared_state()
+    state.conn.execute("DELETE FROM state WHERE key LIKE 'rate:%'")
+
+    def request(_):
+        # A fresh connection per request, so the kernel spreads them over the workers
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        conn.request('POST', '/ReportCreation', body='{}', headers={'Content-Type': 'application/json'})
+        status = conn.getresponse().status
+        conn.close()
+        return status
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        statuses = list(executor.map(request, range(limit + extra)))
+    return extra, statuses.count(429)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=get_setting('server', 'workers', 4))
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    ids = seed_sessions(args.sessions)
+    paths = [f"/session/{ids[i % len(ids)]}/similar" for i in range(args.requests)]
+    print(f"{os.cpu_count()} CPUs, {args.requests} requests, concurrency {args.concurrency}")
+
+    baseline = None
+    for workers in sorted({1, args.workers}):
+        proc = start_server(workers, args.port)
+        try:
+            load(args.port, paths[:100], args.concurrency)  # warm-up
+            result = load(args.port, paths, args.concurrency)
+            if workers == args.workers:
+                expected, refused = check_rate_limit(args.port, args.concurrency)
+        finally:
+            stop_server(proc)
+        baseline = baseline or result['rps']
+        print(f"workers={workers:<3} {result['rps']:8.1f} req/s  p50 {result['p50']:7.1f} ms  "
+              f"p99 {result['p99']:7.1f} ms  errors {result['errors']}  ({result['rps'] / baseline:.2f}x)")
+
+    verdict = 'ok' if refused == expected else 'MISMATCH'
+    print(f"rate limit across {args.workers} workers: {refused} of {expected} over-limit requests refused ({verdict})")
+
+    store, index = SessionStore(), CloneIndex()
+    for session_id in ids:
+        store.delete(session_id)
+        index.remove(session_id)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Regression check: the generation index must not conflate code of the same
+shape but different meaning (is_even vs is_odd, different string literals),
+while still storing reformatted copies of one program once.
+
+    python experiments/check_generation_index_identity.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Agent.generation_index import GenerationIndex
+
+SAME_SHAPE = [
+    ("check whether number is even", "def is_even(n):\n    return n % 2 == 0\n"),
+    ("check whether number is odd", "def is_odd(n):\n    return n % 2 == 1\n"),
+    ("print hello world greeting", 'print("hello world")\n'),
+    ("print goodbye moon farewell", 'print("goodbye moon")\n'),
+]
+
+
+def main():
+    with tempfile.TemporaryDirectory(prefix='check_generation_') as root:
+        index = GenerationIndex(os.path.join(root, 'generation_index.sqlite'))
+        for query, code in SAME_SHAPE:
+            index.add(query, code)
+
+        for query, code in SAME_SHAPE:
+            match = index.lookup(query)
+            assert match is not None, f"no match for {query!r}"
+            assert match['final_code'] == code, f"{query!r} returned {match['final_code']!r}"
+
+        even, odd = index.lookup(SAME_SHAPE[0][0]), index.lookup(SAME_SHAPE[1][0])
+        assert even['structure_hash'] == odd['structure_hash'], "same-shape code should share a structure_hash"
+        assert even['equivalent_generations'] == 2
+
+        # Formatting and comments alone don't make a new program
+        index.add("test if a number is even", "def is_even(n):  # parity\n    return (n % 2) == 0\n")
+        codes = index.conn.execute("SELECT COUNT(*) FROM codes").fetchone()[0]
+        assert codes == len(SAME_SHAPE), f"expected {len(SAME_SHAPE)} distinct programs, found {codes}"
+    print("ok")
+
+
+if __name__ == '__main__':
+    main()
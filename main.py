@@ -2,9 +2,9 @@ import os
 import sys
 import subprocess
 from pathlib import Path
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request, UploadFile, File, Form
 from pydantic import BaseModel, Field
-from typing import Annotated
+from typing import Annotated, Any, Dict, List, Optional
 from datetime import datetime
 from fastapi.responses import JSONResponse
 import uuid
@@ -13,15 +13,38 @@ import uuid
 sys.path.append(os.path.abspath('.'))
 
 # Import after path setup
-from Agent.generator import workflow, CodeGenerationState
-from Difference_Analyzer.analyzer import analyze_with_ast_workflow
+from Agent.generator import run_generation, CodeGenerationState
+from Difference_Analyzer.analyzer import analyze_project_with_ast_workflow, analyze_with_ast_workflow, load_cached_diff
+from Difference_Analyzer.analysis_pool import shutdown_analysis_pool
+from Difference_Analyzer.clone_detector import CloneIndex, fingerprint_file
+from Difference_Analyzer.history_analyzer import analyze_git_history
+from Storage.session_store import SessionStore, UploadTooLarge
+from Storage.shared_state import RateLimiter, get_shared_state
+from Config import get_setting
 
 # FastAPI app
 app = FastAPI(title="Code Generation & Analysis API", version="1.0.0")
 
-# Create a dedicated directory for generated files
-GENERATED_FILES_DIR = "generated_files"
-os.makedirs(GENERATED_FILES_DIR, exist_ok=True)
+# MinHash/LSH index of submitted (updated) code, for cross-session similarity queries
+clone_index = CloneIndex()
+# Sharded, TTL-aware storage for generated and updated session files; deleted or
+# expired sessions are dropped from the clone index too
+session_store = SessionStore(on_delete=clone_index.remove)
+MAX_UPLOAD_BYTES = int(get_setting('session_config', 'max_upload_mb', 64) * 1024 * 1024)
+# Per-client limit on the endpoints that call the LLM, shared by all worker processes
+rate_limiter = RateLimiter(
+    get_shared_state(),
+    limit=get_setting('rate_limit', 'requests_per_window', 30),
+    window_seconds=get_setting('rate_limit', 'window_seconds', 60),
+) if get_setting('rate_limit', 'enabled', True) else None
+
+def enforce_rate_limit(request: Request):
+    if rate_limiter is None:
+        return
+    retry_after = rate_limiter.hit(request.client.host if request.client else 'unknown')
+    if retry_after is not None:
+        raise HTTPException(status_code=429, detail="Rate limit exceeded, retry later",
+                            headers={'Retry-After': str(int(retry_after) + 1)})
 
 class UserInput(BaseModel):
     query: Annotated[str, Field(..., description='What you want to generate?')]
@@ -30,12 +53,25 @@ class UserInput(BaseModel):
 class ReportRequest(BaseModel):
     original_file: str = Field(..., description='Path to the original generated code file')
     updated_file: str = Field(..., description='Path to the updated code file')
+    force_refresh: bool = Field(default=False, description='Ignore any cached report and rerun the analysis')
+    benchmark_runtime: bool = Field(default=False, description='Also time the functions both versions define, in a sandbox')
+    benchmark_inputs: Optional[Dict[str, List[List[Any]]]] = Field(
+        default=None, description='Function name -> list of positional-argument lists to benchmark with'
+    )
+
+class ProjectReportRequest(BaseModel):
+    original_path: str = Field(..., description='Original project directory or zip/tar archive')
+    updated_path: str = Field(..., description='Updated project directory or zip/tar archive')
+
+class HistoryRequest(BaseModel):
+    repo_path: str = Field(..., description='Path to a local git repository')
+    rev_range: Optional[str] = Field(default=None, description='Commit range, e.g. v1.0..HEAD; omit to resume from the last run')
 
 class CodeUploadRequest(BaseModel):
     session_id: str = Field(..., description='Session ID from code generation')
     updated_code: str = Field(..., description='Updated code content')
 
-@app.post("/GenerateCode")
+@app.post("/GenerateCode", dependencies=[Depends(enforce_rate_limit)])
 def generate_code(Query: UserInput):
     """Generate Python code based on user query"""
     initial_state = CodeGenerationState(
@@ -48,19 +84,16 @@ def generate_code(Query: UserInput):
         final_code=None
     )
     try:
-        response = workflow.invoke(initial_state)
+        response = run_generation(initial_state, Query.session_id)
         final_code = response.get('final_code')
         
         if final_code:
-            # Generate a consistent filename using session ID
-            generated_filename = f"generated_code_{Query.session_id}.py"
-            output_file = os.path.join(GENERATED_FILES_DIR, generated_filename)
-            
             try:
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    f.write(final_code)
+                output_file = session_store.save(Query.session_id, 'original', final_code)['path']
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
             except IOError as e:
-                raise HTTPException(status_code=500, detail=f"Error saving file '{output_file}': {e}")
+                raise HTTPException(status_code=500, detail=f"Error saving generated code for session {Query.session_id}: {e}")
             except Exception as e:
                 raise HTTPException(status_code=500, detail=f"An unexpected error occurred during file saving: {e}")
             
@@ -68,8 +101,17 @@ def generate_code(Query: UserInput):
                 "session_id": Query.session_id,
                 "file_path": output_file,
                 "code": final_code,
+                "reused_generation": response.get('reused_generation'),
+                "execution_report": response.get('execution_report'),
                 "message": f"Code generated successfully and saved to {output_file}"
             }
+        elif response.get('clarification'):
+            # The LLM asked questions instead of writing code; the client should refine the query
+            return JSONResponse(status_code=200, content={
+                "session_id": Query.session_id,
+                "message": "The request is ambiguous; answer these questions in a more detailed query.",
+                "clarification": response['clarification'],
+            })
         else:
             return JSONResponse(status_code=200, content={
                 "session_id": Query.session_id,
@@ -79,6 +121,8 @@ def generate_code(Query: UserInput):
                     for msg in response.get('conversation_history', [])
                 ]
             })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred during code generation workflow: {e}")
 
@@ -87,58 +131,96 @@ def upload_updated_code(request: CodeUploadRequest):
     """Upload updated code for a specific session"""
     try:
         # Check if original generated file exists
-        original_file = os.path.join(GENERATED_FILES_DIR, f"generated_code_{request.session_id}.py")
-        if not os.path.exists(original_file):
+        original_info = session_store.file_info(request.session_id, 'original')
+        if original_info is None:
             raise HTTPException(status_code=404, detail=f"Original generated file not found for session {request.session_id}")
         
         # Save updated code
-        updated_filename = f"updated_code_{request.session_id}.py"
-        updated_file = os.path.join(GENERATED_FILES_DIR, updated_filename)
-        
-        with open(updated_file, 'w', encoding='utf-8') as f:
-            f.write(request.updated_code)
+        updated_info = session_store.save(request.session_id, 'updated', request.updated_code)
         
         return {
             "session_id": request.session_id,
-            "updated_file_path": updated_file,
-            "original_file_path": original_file,
+            "updated_file_path": updated_info['path'],
+            "original_file_path": original_info['path'],
             "message": "Updated code saved successfully"
         }
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving updated code: {e}")
 
-@app.post("/GenerateReport")
-def generate_report_by_session(session_id: str):
-    """Generate analysis report for a specific session"""
+@app.post("/UploadUpdatedCodeFile")
+def upload_updated_code_file(session_id: str = Form(..., description='Session ID from code generation'),
+                             updated_file: UploadFile = File(..., description='Updated Python file')):
+    """Upload updated code as a multipart file, streamed to disk in chunks (for large files)"""
     try:
-        # Construct file paths based on session ID
-        original_file = os.path.join(GENERATED_FILES_DIR, f"generated_code_{session_id}.py")
-        updated_file = os.path.join(GENERATED_FILES_DIR, f"updated_code_{session_id}.py")
+        original_info = session_store.file_info(session_id, 'original')
+        if original_info is None:
+            raise HTTPException(status_code=404, detail=f"Original generated file not found for session {session_id}")
         
-        # Check if files exist
-        if not os.path.exists(original_file):
+        try:
+            updated_info = session_store.save_stream(session_id, 'updated', updated_file.file, max_bytes=MAX_UPLOAD_BYTES)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        return {
+            "session_id": session_id,
+            "updated_file_path": updated_info['path'],
+            "original_file_path": original_info['path'],
+            "size": updated_info['size'],
+            "sha256": updated_info['sha256'],
+            "message": "Updated code saved successfully"
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error saving updated code: {e}")
+
+@app.post("/GenerateReport", dependencies=[Depends(enforce_rate_limit)])
+def generate_report_by_session(session_id: str, force_refresh: bool = False, benchmark_runtime: bool = False):
+    """Generate analysis report for a specific session (served from cache unless force_refresh is set)"""
+    try:
+        # Look up both session files
+        original_info = session_store.file_info(session_id, 'original')
+        updated_info = session_store.file_info(session_id, 'updated')
+        
+        if original_info is None:
             raise HTTPException(status_code=404, detail=f"Original generated file not found for session {session_id}")
-        if not os.path.exists(updated_file):
+        if updated_info is None:
             raise HTTPException(status_code=404, detail=f"Updated file not found for session {session_id}")
         
         # Generate report
-        report = analyze_with_ast_workflow(original_file, updated_file)
+        report = analyze_with_ast_workflow(original_info['path'], updated_info['path'], force_refresh=force_refresh,
+                                           benchmark_runtime=benchmark_runtime)
+        
+        # Index the submission so later submissions can be checked against it (once per submitted content)
+        if not clone_index.is_indexed(session_id, updated_info['sha256']):
+            fingerprint = fingerprint_file(updated_info['path'])
+            if not isinstance(fingerprint, dict):
+                clone_index.add(session_id, fingerprint, content_hash=updated_info['sha256'])
         
         return {
             "session_id": session_id,
             "report": report,
-            "original_file": original_file,
-            "updated_file": updated_file,
+            "original_file": original_info['path'],
+            "updated_file": updated_info['path'],
             "timestamp": datetime.now().isoformat()
         }
         
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error while generating report: {e}")
 
-@app.post("/ReportCreation")
+@app.post("/ReportCreation", dependencies=[Depends(enforce_rate_limit)])
 def report_creation(request: ReportRequest):
     """Generate analysis report comparing original and updated code (legacy endpoint)"""
     try:
@@ -149,7 +231,9 @@ def report_creation(request: ReportRequest):
             raise HTTPException(status_code=404, detail=f"Updated file '{request.updated_file}' not found")
         
         # Generate report
-        report = analyze_with_ast_workflow(request.original_file, request.updated_file)
+        report = analyze_with_ast_workflow(request.original_file, request.updated_file, force_refresh=request.force_refresh,
+                                           benchmark_runtime=request.benchmark_runtime,
+                                           benchmark_inputs=request.benchmark_inputs)
         
         return {
             "report": report,
@@ -163,41 +247,85 @@ def report_creation(request: ReportRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error while generating report: {e}")
 
+@app.post("/ProjectReport", dependencies=[Depends(enforce_rate_limit)])
+def project_report(request: ProjectReportRequest):
+    """Generate one analysis report from the per-file changes between two project trees"""
+    result = analyze_project_with_ast_workflow(request.original_path, request.updated_path)
+    if 'error' in result:
+        raise HTTPException(status_code=404 if 'does not exist' in result['error'] else 400, detail=result['error'])
+    return result
+
+@app.post("/HistoryAnalysis", dependencies=[Depends(enforce_rate_limit)])
+def history_analysis(request: HistoryRequest):
+    """Append per-commit complexity and structure metrics for a repository's history to Generated/history/<repo>.jsonl"""
+    # Output and state files always take their default place: clients don't pick server paths
+    result = analyze_git_history(request.repo_path, request.rev_range)
+    if 'error' in result:
+        raise HTTPException(status_code=404 if 'does not exist' in result['error'] else 422, detail=result['error'])
+    return result
+
 @app.get("/session/{session_id}/files")
 def get_session_files(session_id: str):
     """Get information about files for a specific session"""
-    original_file = os.path.join(GENERATED_FILES_DIR, f"generated_code_{session_id}.py")
-    updated_file = os.path.join(GENERATED_FILES_DIR, f"updated_code_{session_id}.py")
+    try:
+        files = session_store.describe(session_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {
         "session_id": session_id,
-        "files": {
-            "original": {
-                "path": original_file,
-                "exists": os.path.exists(original_file)
-            },
-            "updated": {
-                "path": updated_file,
-                "exists": os.path.exists(updated_file)
-            }
-        }
+        "files": files
+    }
+
+@app.get("/session/{session_id}/diff")
+def get_session_diff(session_id: str, compress: bool = False):
+    """Precomputed side-by-side diff (line mapping, changed spans per symbol, per-function metric deltas)"""
+    try:
+        original_info = session_store.file_info(session_id, 'original')
+        updated_info = session_store.file_info(session_id, 'updated')
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if original_info is None or updated_info is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} needs both original and updated code")
+    
+    diff = load_cached_diff(original_info['path'], updated_info['path'], compress=compress)
+    if diff is None or 'error' in diff:
+        raise HTTPException(status_code=422, detail=(diff or {}).get('error', 'Session files are missing'))
+    return {
+        "session_id": session_id,
+        "diff": diff
+    }
+
+@app.get("/session/{session_id}/similar")
+def get_similar_sessions(session_id: str, top_k: int = 5, min_similarity: float = 0.3):
+    """Find other sessions whose submitted code is similar to this session's (updated, else generated) code"""
+    try:
+        info = session_store.file_info(session_id, 'updated') or session_store.file_info(session_id, 'original')
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if info is None:
+        raise HTTPException(status_code=404, detail=f"No code found for session {session_id}")
+    
+    fingerprint = fingerprint_file(info['path'])
+    if isinstance(fingerprint, dict):
+        raise HTTPException(status_code=422, detail=fingerprint['error'])
+    
+    return {
+        "session_id": session_id,
+        # Sessions deleted before the index was cleaned up with them may still be listed; skip those
+        "similar_sessions": [
+            match for match in clone_index.query(fingerprint, top_k=top_k, min_similarity=min_similarity, exclude=session_id)
+            if session_store.file_info(match['session_id'], 'updated') is not None
+        ]
     }
 
 @app.delete("/session/{session_id}")
 def cleanup_session(session_id: str):
     """Clean up files for a specific session"""
-    original_file = os.path.join(GENERATED_FILES_DIR, f"generated_code_{session_id}.py")
-    updated_file = os.path.join(GENERATED_FILES_DIR, f"updated_code_{session_id}.py")
-    
-    removed_files = []
-    
     try:
-        if os.path.exists(original_file):
-            os.remove(original_file)
-            removed_files.append(original_file)
-        if os.path.exists(updated_file):
-            os.remove(updated_file)
-            removed_files.append(updated_file)
+        removed_files = session_store.delete(session_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error cleaning up session files: {e}")
     
@@ -207,6 +335,11 @@ def cleanup_session(session_id: str):
         "message": f"Cleaned up {len(removed_files)} files"
     }
 
+@app.on_event("shutdown")
+def stop_analysis_pool():
+    """Stop the parse worker processes with the server"""
+    shutdown_analysis_pool()
+
 @app.get("/")
 def root():
     """API root endpoint"""
@@ -216,9 +349,14 @@ def root():
         "endpoints": {
             "generate_code": "/GenerateCode",
             "upload_updated_code": "/UploadUpdatedCode",
+            "upload_updated_code_file": "/UploadUpdatedCodeFile",
             "generate_report_by_session": "/GenerateReport/{session_id}",
             "create_report": "/ReportCreation",
+            "project_report": "/ProjectReport",
+            "history_analysis": "/HistoryAnalysis",
             "get_session_files": "/session/{session_id}/files",
+            "session_diff": "/session/{session_id}/diff",
+            "similar_sessions": "/session/{session_id}/similar",
             "cleanup_session": "/session/{session_id}"
         }
     }
@@ -269,6 +407,89 @@ def run_fastapi_server():
     except Exception as e:
         print(f"❌ Error running FastAPI server: {e}")
 
+def run_production_server(workers: int, host: str, port: int):
+    """
+    Pre-fork production server: N uvicorn workers on one shared listening socket.
+
+    Everything expensive (LLM client, compiled LangGraph graphs, config) is
+    loaded once here before forking, so workers start warm and share those
+    pages copy-on-write. SQLite handles are reopened in each child (see
+    Storage/shared_state.reconnect_after_fork). SIGTERM/SIGINT stop accepting
+    connections and let in-flight requests, including LLM calls, finish for up
+    to server.graceful_shutdown_seconds. Crashed workers are restarted.
+    """
+    import signal
+    import socket
+    import time
+    import uvicorn
+    from Difference_Analyzer.analyzer import create_ast_analysis_workflow
+
+    if not hasattr(os, 'fork'):
+        print("Warning: fork is not available on this platform, starting a single-worker server")
+        return run_fastapi_server()
+
+    # Preload: compile every analysis graph variant before the workers exist
+    for benchmark_runtime in (False, True):
+        create_ast_analysis_workflow(benchmark_runtime=benchmark_runtime)
+    create_ast_analysis_workflow(skip_parsing=True)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    config = uvicorn.Config(
+        app, host=host, port=port, log_level='info',
+        timeout_graceful_shutdown=get_setting('server', 'graceful_shutdown_seconds', 120),
+    )
+    children, stopping = {}, False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            # uvicorn installs its own SIGINT/SIGTERM handlers for a graceful exit
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            code = 0
+            try:
+                uvicorn.Server(config).run(sockets=[sock])
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = time.time()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    print(f"🚀 Starting {workers} API workers on http://{host}:{port} (master pid {os.getpid()})")
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.waitpid(-1, 0)
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if not stopping and started is not None:
+            print(f"Warning: worker {pid} exited with status {status}, restarting")
+            # Don't spin if workers die right after starting
+            if time.time() - started < 1:
+                time.sleep(1)
+            spawn()
+    sock.close()
+    print("👋 All workers stopped")
+
 def show_help():
     """Show help information"""
     print("🚀 Code Generation & Analysis Tool")
@@ -276,10 +497,12 @@ def show_help():
     print("\nUsage:")
     print("  python main.py --mode ui     # Run Streamlit UI (default)")
     print("  python main.py --mode api    # Run FastAPI server")
+    print("  python main.py --mode prod   # Run multi-worker production API server")
     print("  python main.py --help        # Show this help")
     print("\nModes:")
     print("  ui   - Interactive web interface using Streamlit")
     print("  api  - REST API server using FastAPI")
+    print("  prod - REST API with N pre-forked workers and graceful shutdown")
     print("\nExamples:")
     print("  python main.py               # Start Streamlit UI")
     print("  python main.py --mode api    # Start API server")
@@ -294,14 +517,20 @@ if __name__ == "__main__":
 Examples:
   python main.py               # Start Streamlit UI
   python main.py --mode api    # Start API server
+  python main.py --mode prod --workers 4   # Production API server
+  python cli.py --help         # Batch generation/analysis without a server
         """
     )
     parser.add_argument(
         "--mode", 
-        choices=["ui", "api"], 
+        choices=["ui", "api", "prod"], 
         default="ui",
-        help="Choose mode: 'ui' for Streamlit interface, 'api' for FastAPI server"
+        help="Choose mode: 'ui' for Streamlit interface, 'api' for FastAPI server, 'prod' for the multi-worker API server"
     )
+    parser.add_argument("--workers", type=int, default=get_setting('server', 'workers', os.cpu_count() or 1),
+                        help="Worker processes in prod mode")
+    parser.add_argument("--host", default=get_setting('server', 'host', '0.0.0.0'), help="Bind address in prod mode")
+    parser.add_argument("--port", type=int, default=get_setting('server', 'port', 8000), help="Port in prod mode")
     
     args = parser.parse_args()
     
@@ -309,6 +538,8 @@ Examples:
         run_streamlit_app()
     elif args.mode == "api":
         run_fastapi_server()
+    elif args.mode == "prod":
+        run_production_server(args.workers, args.host, args.port)
     else:
         print("❌ Invalid mode. Use 'ui' or 'api'")
         show_help()